@@ -16,15 +16,24 @@
 # d- precio: precio del producto en pesos
 # e- cantidad: disponibilidad en stock
 
-import mysql.connector
-from mysql.connector import Error
-from decouple import config
-from datetime import datetime
+from datetime import datetime, date, timedelta
+from contextlib import contextmanager
+from collections import OrderedDict
 
 
-import json
+from almacen_json import AlmacenProductos
+from backends import crear_backend, config, huella_producto
+from vencimientos import IndiceVencimientos, EscanerVencimientos, convertir_fecha
+from indice_nombres import IndiceNombres
+
+import threading
+import time
+import warnings
 
 class Producto:
+    # Con __slots__ cada objeto guarda sus atributos en lugares fijos en vez de un diccionario propio (__dict__).
+    # Con catálogos de millones de productos en memoria el ahorro es grande.
+    __slots__ = ('__codigo', '__tipo', '__nombre', '__precio', '__cantidad')
 
     def __init__(self, codigo, tipo, nombre, precio, cantidad):
         self.__codigo = self.validar_codigo(codigo)
@@ -35,6 +44,29 @@ class Producto:
     
         # Al estar nuestros atributos protegidos, debemos crear los métodos para que puedan ser accedidos desde otra clase
 
+    # Constructor sin validaciones para las filas que leemos de nuestra propia base de datos,
+    # donde los datos ya fueron validados al guardarse. No usar con datos ingresados por el usuario.
+
+    @classmethod
+    def desde_fila(cls, codigo, tipo, nombre, precio, cantidad):
+        producto = cls.__new__(cls)
+        producto.__codigo = codigo
+        producto.__tipo = tipo
+        producto.__nombre = nombre
+        producto.__precio = float(precio)   # MySQL devuelve Decimal para los DECIMAL
+        producto.__cantidad = cantidad
+        return producto
+
+    def copia(self):
+        '''Copia independiente del producto, sin volver a validar'''
+        producto = type(self).__new__(type(self))
+        producto.__codigo = self.__codigo
+        producto.__tipo = self.__tipo
+        producto.__nombre = self.__nombre
+        producto.__precio = self.__precio
+        producto.__cantidad = self.__cantidad
+        return producto
+
     @property #Con property convertimos el atributo en una propiedad
     def codigo(self):
         return self.__codigo 
@@ -118,9 +150,22 @@ class Producto:
         return f"{self.tipo} {self.nombre}"
     
 class ProductoElectronico(Producto):
+    __slots__ = ('__añosGarantia',)
+
     def __init__(self, codigo, tipo, nombre, precio, cantidad, añosGarantia):
         super().__init__(codigo, tipo, nombre, precio, cantidad)
         self.__añosGarantia = self.validar_añosGarantia(añosGarantia)
+
+    @classmethod
+    def desde_fila(cls, codigo, tipo, nombre, precio, cantidad, añosGarantia):
+        producto = super().desde_fila(codigo, tipo, nombre, precio, cantidad)
+        producto.__añosGarantia = añosGarantia
+        return producto
+
+    def copia(self):
+        producto = super().copia()
+        producto.__añosGarantia = self.__añosGarantia
+        return producto
     
     @property
     def añosGarantia (self):
@@ -144,15 +189,40 @@ class ProductoElectronico(Producto):
         return f'{super().__str__()} - añosGarantia: {self.añosGarantia}'
 
 class ProductoAlimenticio(Producto):
+    __slots__ = ('__fechaVencimiento',)
+
     def __init__(self, codigo, tipo, nombre, precio, cantidad, fechaVencimiento):
         super().__init__(codigo, tipo, nombre, precio, cantidad)
         self.__fechaVencimiento = self.validar_fecha_vencimiento(fechaVencimiento)
+
+    @classmethod
+    def desde_fila(cls, codigo, tipo, nombre, precio, cantidad, fechaVencimiento):
+        producto = super().desde_fila(codigo, tipo, nombre, precio, cantidad)
+        if isinstance(fechaVencimiento, date):
+            fechaVencimiento = fechaVencimiento.strftime('%Y-%m-%d')
+        producto.__fechaVencimiento = fechaVencimiento
+        return producto
+
+    def copia(self):
+        producto = super().copia()
+        producto.__fechaVencimiento = self.__fechaVencimiento
+        return producto
     
     
     @property
     def fechaVencimiento (self):
         return self.__fechaVencimiento
     
+    # La base de datos devuelve un objeto date, el archivo JSON un texto AAAA-MM-DD.
+    # Guardamos siempre el texto para que to_dict se pueda serializar.
+
+    def validar_fecha_vencimiento(self, fechaVencimiento):
+        if isinstance(fechaVencimiento, (datetime, date)):
+            return fechaVencimiento.strftime('%Y-%m-%d')
+        try:
+            return datetime.strptime(str(fechaVencimiento), '%Y-%m-%d').strftime('%Y-%m-%d')
+        except ValueError:
+            raise ValueError('La fecha de vencimiento debe tener el formato AAAA-MM-DD')
         
     def to_dict(self):
         data = super().to_dict()
@@ -162,42 +232,371 @@ class ProductoAlimenticio(Producto):
     def __str__(self):
         return f'{super().__str__()} - fechaVencimiento: {self.fechaVencimiento}'
 
+# Construir un producto a partir de un diccionario con las mismas claves que to_dict
+# (por ejemplo una entrada de productos_store.json o una fila de un archivo CSV/JSONL).
+# El subtipo se deduce igual que en la base de datos: por la presencia de añosGarantia o fechaVencimiento.
+
+def producto_desde_dict(datos):
+    datos = {clave: valor for clave, valor in datos.items() if valor not in (None, '')}
+    campos = {clave: datos[clave] for clave in ('codigo', 'tipo', 'nombre', 'precio', 'cantidad') if clave in datos}
+    faltantes = {'codigo', 'tipo', 'nombre', 'precio', 'cantidad'} - set(campos)
+    if faltantes:
+        raise ValueError(f'Faltan los campos: {", ".join(sorted(faltantes))}')
+    if 'añosGarantia' in datos:
+        return ProductoElectronico(**campos, añosGarantia=datos['añosGarantia'])
+    if 'fechaVencimiento' in datos:
+        return ProductoAlimenticio(**campos, fechaVencimiento=datos['fechaVencimiento'])
+    raise ValueError('El producto debe tener añosGarantia (electronico) o fechaVencimiento (alimenticio)')
+
+# Un producto alimenticio nuevo tiene que vencer después de hoy. No es una validación de la clase porque
+# los productos ya guardados (la base, productos_store.json) pueden estar vencidos y se tienen que poder leer:
+# la usan las altas del menú y del modo por lotes; validacion_masiva hace la misma comparación con NumPy.
+
+VENCIMIENTO_PASADO = 'La fecha de vencimiento debe ser mayor a la fecha actual'
+
+def validar_vencimiento_futuro(fechaVencimiento, hoy=None):
+    '''Devolver la fecha como texto AAAA-MM-DD, o ValueError si no tiene ese formato o no es posterior a hoy'''
+    try:
+        fecha = convertir_fecha(fechaVencimiento)
+    except ValueError:
+        raise ValueError('La fecha de vencimiento debe tener el formato AAAA-MM-DD')
+    if fecha <= convertir_fecha(hoy or date.today()):
+        raise ValueError(VENCIMIENTO_PASADO)
+    return fecha.strftime('%Y-%m-%d')
+
+# Cache de productos
+# buscar_producto es la consulta más frecuente (los mismos códigos se escanean una y otra vez en la caja).
+# Guardamos en memoria los productos ya construidos, con tamaño máximo (se descarta el menos usado: LRU)
+# y un tiempo de vida por entrada (TTL). También se guardan los códigos inexistentes (entradas negativas).
+
+# El cache guarda una copia de cada producto y entrega otra copia en cada lectura: así, modificar
+# el objeto que se pasó a crear_producto o el que devolvió buscar_producto no cambia lo que está
+# guardado (los cambios llegan al cache solo a través de la base de datos).
+
+class CacheProductos:
+    NO_EXISTE = object()    # marca para los códigos que no existen en la base de datos
+
+    def __init__(self, tamaño=10000, ttl=60.0, ttl_negativo=5.0):
+        self.tamaño = int(tamaño)
+        self.ttl = float(ttl)
+        self.ttl_negativo = float(ttl_negativo)
+        self.__entradas = OrderedDict()     # codigo -> (producto, vence)
+        self.__lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self.expirados = 0
+
+    def obtener(self, codigo):
+        '''Devolver el producto guardado, NO_EXISTE si se sabe que no existe, o None si no está en el cache'''
+        with self.__lock:
+            entrada = self.__entradas.get(codigo)
+            if entrada is None:
+                self.fallos += 1
+                return None
+            producto, vence = entrada
+            if vence < time.monotonic():
+                del self.__entradas[codigo]
+                self.expirados += 1
+                self.fallos += 1
+                return None
+            self.__entradas.move_to_end(codigo)
+            self.aciertos += 1
+        return producto if producto is self.NO_EXISTE else producto.copia()
+
+    def guardar(self, codigo, producto):
+        '''Guardar un producto (o None para registrar que el código no existe)'''
+        if self.tamaño < 1:
+            return
+        if producto is None:
+            producto, ttl = self.NO_EXISTE, self.ttl_negativo
+        else:
+            producto, ttl = producto.copia(), self.ttl
+        with self.__lock:
+            self.__entradas[codigo] = (producto, time.monotonic() + ttl)
+            self.__entradas.move_to_end(codigo)
+            while len(self.__entradas) > self.tamaño:
+                self.__entradas.popitem(last=False)
+                self.desalojos += 1
+
+    def invalidar(self, codigo):
+        with self.__lock:
+            self.__entradas.pop(codigo, None)
+
+    def limpiar(self):
+        with self.__lock:
+            self.__entradas.clear()
+
+    def productos(self):
+        '''Productos vigentes del cache (sin las entradas negativas), del menos al más usado. Son los objetos guardados: solo lectura'''
+        ahora = time.monotonic()
+        with self.__lock:
+            return [producto for producto, vence in self.__entradas.values()
+                    if vence >= ahora and producto is not self.NO_EXISTE]
+
+    def estadisticas(self):
+        with self.__lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'entradas': len(self.__entradas),
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'desalojos': self.desalojos,
+                'expirados': self.expirados,
+                'tasa_aciertos': self.aciertos / consultas if consultas else 0.0
+            }
+
+
+class ConexionPrestada:
+    '''Conexión de GestionProducto.connect(): close() la devuelve a la sesión en lugar de cerrarla; el resto se delega'''
+
+    def __init__(self, connection, sesion):
+        self.__connection = connection
+        self.__sesion = sesion
+
+    def __getattr__(self, nombre):
+        return getattr(self.__connection, nombre)
+
+    def close(self):
+        sesion, self.__sesion = self.__sesion, None
+        if sesion is not None:
+            sesion.__exit__(None, None, None)
+
+
+def clave_codigo(codigo):
+    '''Normalizar el código para usarlo como clave (desde el menú llega como texto)'''
+    try:
+        return int(codigo)
+    except (TypeError, ValueError):
+        return codigo
+
+
 class GestionProducto():
-    def __init__(self):
-        self.host = config ('Db_Host')
-        self.database = config ('Db_Name')
-        self.user = config ('Db_User')
-        self.password = config ('Db_Password') 
-        self.port = config ('Db_port')
-    
-    def connect(self):
-        '''Establecer una conexión con la base de datos'''
+    # La configuración y la conexión se resuelven recién en el primer uso (ver las propiedades de abajo):
+    # crear un GestionProducto para usar solo el modelo o el almacén local no carga el driver de la base
+    # ni lee las opciones Db_*, y los procesos de corta vida no pagan ese costo si no lo necesitan.
+
+    def __init__(self, backend=None):
+        '''backend: BackendMySQL, BackendSQLite u otro con la misma interfaz (por defecto, según Db_backend)'''
+        self.__backend = backend
+        self.__esquema_verificado = False
+        self.__tamaño_lote = None
+        self.__archivo = None
+        self.__cache = None
+        self.__lock = threading.Lock()
+        self.__al_cerrar = []       # funciones que se llaman antes de cerrar (por ejemplo, vaciar un BufferEscrituras)
+        self.almacen = None
+        self.vencimientos = None    # IndiceVencimientos, se arma con activar_indice_vencimientos()
+        self.nombres = None         # IndiceNombres, se arma con activar_indice_nombres()
+        self.instrumentacion = None # Instrumentacion, se arma con activar_instrumentacion() o con Metrics_enabled
+
+    @property
+    def backend(self):
+        '''El backend se crea, y se verifica el esquema, la primera vez que se usa la base de datos'''
+        if not self.__esquema_verificado:
+            with self.__lock:
+                if self.__backend is None:
+                    self.__backend = crear_backend()
+                    if self.instrumentacion is not None:
+                        self.instrumentacion.instrumentar_backend(self.__backend)
+                    elif config('Metrics_enabled', default=False, cast=bool):
+                        self.__activar_instrumentacion(None)
+                if not self.__esquema_verificado:
+                    self.__migrar(self.__backend)
+                    self.__esquema_verificado = True
+        return self.__backend
+
+    @property
+    def tamaño_lote(self):
+        if self.__tamaño_lote is None:
+            self.__tamaño_lote = config('Db_batch_size', default=1000, cast=int)
+        return self.__tamaño_lote
+
+    @tamaño_lote.setter
+    def tamaño_lote(self, tamaño):
+        self.__tamaño_lote = tamaño
+
+    @property
+    def archivo(self):
+        if self.__archivo is None:
+            self.__archivo = config('Store_file', default='productos_store.json')
+        return self.__archivo
+
+    @archivo.setter
+    def archivo(self, archivo):
+        self.__archivo = archivo
+
+    @property
+    def cache(self):
+        if self.__cache is None:
+            with self.__lock:
+                if self.__cache is None:
+                    self.__cache = CacheProductos(
+                        tamaño= config('Cache_size', default=10000, cast=int),
+                        ttl= config('Cache_ttl', default=60.0, cast=float),
+                        ttl_negativo= config('Cache_negative_ttl', default=5.0, cast=float)
+                    )
+        return self.__cache
+
+    # Foto del cache (ver foto_binaria.py)
+    # Al cerrar se guardan los productos del cache en una foto binaria y al arrancar se vuelven a cargar,
+    # así el proceso nuevo no empieza con el cache vacío. Se activa con la opción Cache_snapshot_file.
+
+    def ruta_foto_cache(self):
+        return config('Cache_snapshot_file', default='') or None
+
+    def guardar_foto_cache(self, ruta=None):
+        '''Guardar los productos vigentes del cache. Devuelve la cantidad guardada (None si no hay ruta o hubo un error)'''
+        ruta = ruta or self.ruta_foto_cache()
+        if ruta is None or self.__cache is None:
+            return None
         try:
-            connection = mysql.connector.connect(
-                host= self.host,
-                database= self.database,
-                user= self.user,
-                password= self.password,
-                port= self.port
-            )
+            from foto_binaria import escribir_foto
+            return escribir_foto(ruta, self.cache.productos())
+        except Exception as error:
+            print(f'Error al guardar la foto del cache en {ruta}: {error}')
+
+    def cargar_foto_cache(self, ruta=None, verificar=True):
+        '''
+        Precargar el cache con una foto binaria. Con verificar, las huellas de los productos de la foto se
+        comparan con las de la base (una consulta por lote) y solo se cargan los que no cambiaron.
+        Devuelve la cantidad de productos cargados
+        '''
+        ruta = ruta or self.ruta_foto_cache()
+        if ruta is None:
+            return 0
+        try:
+            from foto_binaria import leer_foto
+            _, productos = leer_foto(ruta)
+            if verificar:
+                vigentes = []
+                for inicio in range(0, len(productos), self.tamaño_lote):
+                    lote = productos[inicio:inicio + self.tamaño_lote]
+                    huellas = self.backend.huellas_codigos([producto.codigo for producto in lote])
+                    vigentes.extend(producto for producto in lote
+                                    if huellas.get(producto.codigo) == huella_producto(**producto.to_dict()))
+                productos = vigentes
+        except FileNotFoundError:
+            return 0
+        except Exception as error:
+            print(f'Error al cargar la foto del cache {ruta}: {error}')
+            return 0
+        for producto in productos:
+            self.cache.guardar(producto.codigo, producto)
+        return len(productos)
+
+    # Instrumentación (ver instrumentacion.py)
+    # Desactivada no cuesta nada: los métodos se reemplazan por versiones que miden recién al activarla.
+
+    def activar_instrumentacion(self, instrumentacion=None):
+        '''Medir desde ahora los métodos, las consultas y la espera de conexiones. Devuelve la Instrumentacion'''
+        with self.__lock:
+            return self.__activar_instrumentacion(instrumentacion)
+
+    def __activar_instrumentacion(self, instrumentacion):
+        if self.instrumentacion is None:
+            from instrumentacion import Instrumentacion
+            self.instrumentacion = instrumentacion or Instrumentacion()
+            self.instrumentacion.instrumentar_gestion(self)
+            if self.__backend is not None:
+                self.instrumentacion.instrumentar_backend(self.__backend)
+        return self.instrumentacion
+
+    def desactivar_instrumentacion(self):
+        '''Volver a los métodos sin medir. Devuelve la Instrumentacion con lo registrado hasta ahora'''
+        from instrumentacion import desinstrumentar
+        with self.__lock:
+            instrumentacion, self.instrumentacion = self.instrumentacion, None
+            if instrumentacion is not None:
+                desinstrumentar(self)
+                if self.__backend is not None:
+                    desinstrumentar(self.__backend)
+            return instrumentacion
+
+    def estadisticas(self):
+        '''Métricas de la instrumentación (si está activa) y del cache'''
+        estadisticas = self.instrumentacion.estadisticas() if self.instrumentacion is not None else {}
+        estadisticas['cache'] = self.cache.estadisticas()
+        return estadisticas
+
+    def verificar_esquema(self):
+        '''Verificar el esquema de la base (y aplicar las migraciones pendientes si Db_auto_migrate). Devuelve la versión'''
+        return self.__migrar(self.backend)
+
+    def __migrar(self, backend):
+        # Si el esquema no está en la versión necesaria no se sigue: eliminar_producto, por ejemplo,
+        # depende del ON DELETE CASCADE de la versión 2. La verificación se repite en el próximo uso.
+        # Las migraciones se aplican solo a pedido: la 2 borra las filas huérfanas de los subtipos.
+        try:
+            return backend.migrar(aplicar= config('Db_auto_migrate', default=False, cast=bool))
+        except Exception as error:
+            raise RuntimeError(f'Error al verificar el esquema de la base de datos: {error}') from error
+
+    @property
+    def pool(self):
+        '''Pool de conexiones del backend (None en los backends sin pool)'''
+        return getattr(self.backend, 'pool', None)
 
-            if connection.is_connected():
-                return connection
+    @contextmanager
+    def sesion(self, timeout=None):
+        '''Obtener una conexión del backend para usarla dentro de un bloque with'''
+        with self.backend.sesion(timeout) as connection:
+            yield connection
 
-        except Error as e:
+    def connect(self):
+        '''Obsoleto: usar "with gestion.sesion() as connection". Devuelve una conexión prestada (close() la devuelve)'''
+        warnings.warn('GestionProducto.connect() es obsoleto: usar "with gestion.sesion() as connection"',
+                      DeprecationWarning, stacklevel=2)
+        sesion = self.sesion()
+        try:
+            return ConexionPrestada(sesion.__enter__(), sesion)
+        except Exception as e:
             print(f'Error al conectar a la base de datos: {e}')
             return None
+
+    def registrar_al_cerrar(self, funcion):
+        '''Llamar a funcion al principio de cerrar(), mientras la base y el almacén todavía están abiertos'''
+        with self.__lock:
+            self.__al_cerrar.append(funcion)
+
+    def desregistrar_al_cerrar(self, funcion):
+        with self.__lock:
+            if funcion in self.__al_cerrar:
+                self.__al_cerrar.remove(funcion)
+
+    def cerrar(self):
+        '''Vaciar los buffers registrados y cerrar las conexiones del backend (si se llegó a crear) y el almacén local'''
+        with self.__lock:
+            al_cerrar, self.__al_cerrar = self.__al_cerrar, []
+        for funcion in reversed(al_cerrar):     # el último registrado se cierra primero
+            funcion()
+        if self.__backend is not None:
+            self.__backend.cerrar()
+        if self.almacen is not None:
+            self.almacen.cerrar()
+            self.almacen = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
             
 
 
+    # Los datos locales se guardan en un AlmacenProductos (ver almacen_json.py): cada cambio se agrega
+    # a un journal en lugar de reescribir todo productos_store.json. El almacén se abre recién al usarlo.
+
+    def obtener_almacen(self):
+        if self.almacen is None:
+            self.almacen = AlmacenProductos(self.archivo)
+        return self.almacen
+
     # Este método lo único que hace es leer los datos del archivo
-    # Con open(self.archivo) accedemos al archivo en modo lectura ('r')
 
     def leer_datos(self):
         try:
-            with open(self.archivo, 'r') as file:
-                datos = json.load(file) #leemos el archivo json y lo disponibilizamos en un 
-                                        # objeto (datos) para poder manejarlo desde python
+            datos = self.obtener_almacen().leer_todo()
         except FileNotFoundError:
             return {}
         except Exception as error:
@@ -205,205 +604,406 @@ class GestionProducto():
         else:
             return datos
         
-        # Con este método guardamos los datos
+        # Con este método guardamos los datos. Solo se escriben en el journal los productos que cambiaron
 
     def guardar_datos(self, datos):
         try:
-            with open(self.archivo, 'w') as file:
-                json.dump(datos, file, indent=4) #ident=4 son los espacios que se dejan desde el margen izquierdo
-                                                #facilita la lectura. 4 es un valor estandard
+            self.obtener_almacen().reemplazar(datos)
         except IOError as error:
-            print(f'Error al intentar guardar los datos en {self.archivo}: (error)')
+            print(f'Error al intentar guardar los datos en {self.archivo}: {error}')
             print()
         except Exception as error:
             print(f'Error inesperado: {error}')
             print()
 
     def crear_producto(self,producto):
+        '''Devuelve True si se creó, False si el código ya existía y None si hubo un error'''
         try:
-            connection = self.connect()
-            if connection:
-                with connection.cursor() as cursor:
-                    # Se verifica si el producto ya existe a través de su código
-                    cursor. execute('select codigo from producto where codigo = %s', (producto.codigo,))
-                    if cursor.fetchone():
-                        print(f'Error: ya existe un producto con codigo {producto.codigo}')
-                        return
-                    # Crear producto según su tipo (Alimenticio/Electrónico)
-                    if isinstance(producto, ProductoElectronico):
-                        query = '''
-                        INSERT INTO producto (codigo, tipo, nombre, precio, cantidad)
-                        VALUES (%s, %s, %s, %s, %s)
-                        '''
-                        cursor.execute(query, (producto.codigo, producto.tipo, producto.nombre, producto.precio, producto.cantidad))
-                        
-                        query = '''
-                        INSERT INTO productoelectronico (codigo, añosGarantia)
-                        VALUES (%s, %s)
-                        '''
-                        cursor.execute(query, (producto.codigo, producto.añosGarantia))
-                    
-                    elif isinstance(producto, ProductoAlimenticio):
-
-                        query = '''
-                        INSERT INTO producto (codigo, tipo, nombre, precio, cantidad)
-                        VALUES (%s, %s, %s, %s, %s)
-                        '''
-                        cursor.execute(query, (producto.codigo, producto.tipo, producto.nombre, producto.precio, producto.cantidad))
-
-                        query = '''
-                        INSERT INTO productoalimenticio (codigo, fechaVencimiento)
-                        VALUES (%s, %s)
-                        '''
-                        cursor.execute(query, (producto.codigo, producto.fechaVencimiento))
-                    
-                    connection.commit()
-                    print()
-                    print(f'Producto tipo {producto.tipo} : -> {producto.nombre} creado exitosamente')
+            # Crear producto según su tipo (Alimenticio/Electrónico)
+            fila = (producto.codigo, producto.tipo, producto.nombre, producto.precio, producto.cantidad)
+            if isinstance(producto, ProductoElectronico):
+                creado = self.backend.insertar(fila, 'productoelectronico', (producto.codigo, producto.añosGarantia))
+            elif isinstance(producto, ProductoAlimenticio):
+                creado = self.backend.insertar(fila, 'productoalimenticio', (producto.codigo, producto.fechaVencimiento))
+            else:
+                creado = self.backend.insertar(fila, None, None)
+
+            # Se verifica si el producto ya existe a través de su código
+            if not creado:
+                print(f'Error: ya existe un producto con codigo {producto.codigo}')
+                return False
+
+            self.cache.guardar(producto.codigo, producto)
+            if self.vencimientos is not None and isinstance(producto, ProductoAlimenticio):
+                self.vencimientos.agregar(producto.codigo, producto.fechaVencimiento)
+            if self.nombres is not None:
+                self.nombres.agregar(producto.codigo, producto.nombre)
+            print()
+            print(f'Producto tipo {producto.tipo} : -> {producto.nombre} creado exitosamente')
+            return True
 
-            
         except Exception as error:
             print (f'Error inesperado al crear producto: {error}')
             print()
 
-    def buscar_producto(self, codigo):
+    # Carga masiva
+    # En lugar de un SELECT y uno o dos INSERT por producto, se agrupan los productos en lotes
+    # y cada tabla recibe un único INSERT de varias filas por lote, dentro de una transacción por lote.
+    # Los códigos repetidos se resuelven con un upsert (ver backend.upsert_lote).
+
+    def guardar_lote(self, numero, lote, rechazados):
+        '''Guardar un lote de productos en una transacción y devolver el reporte del lote'''
+        por_codigo = {}
+        for producto in lote:
+            por_codigo[producto.codigo] = producto  # si un código se repite en el lote, gana el último
+        codigos = list(por_codigo)
+        repetidos = len(lote) - len(codigos)
+
         try:
-            connection = self.connect()
-            if connection:
-                with connection.cursor(dictionary=True) as cursor:
-                    cursor.execute('SELECT * FROM producto WHERE codigo = %s', (codigo,))
-                    producto_data = cursor.fetchone()
-                    
-                    if producto_data:
-                        cursor.execute('SELECT añosGarantia FROM productoelectronico WHERE codigo = %s', (codigo,))
-                        añosGarantia = cursor.fetchone()
+            existentes = self.backend.upsert_lote(
+                [(p.codigo, p.tipo, p.nombre, p.precio, p.cantidad) for p in por_codigo.values()],
+                [(p.codigo, p.añosGarantia) for p in por_codigo.values() if isinstance(p, ProductoElectronico)],
+                [(p.codigo, p.fechaVencimiento) for p in por_codigo.values() if isinstance(p, ProductoAlimenticio)]
+            )
+        except Exception as error:
+            rechazados = rechazados + [{'codigo': codigo, 'error': str(error)} for codigo in codigos]
+            return {'lote': numero, 'insertados': 0, 'actualizados': 0, 'rechazados': rechazados}
+
+        for codigo in codigos:
+            self.cache.invalidar(codigo)
+        if self.vencimientos is not None:
+            for producto in por_codigo.values():
+                if isinstance(producto, ProductoAlimenticio):
+                    self.vencimientos.agregar(producto.codigo, producto.fechaVencimiento)
+                else:
+                    self.vencimientos.quitar(producto.codigo)
+        if self.nombres is not None:
+            for producto in por_codigo.values():
+                self.nombres.agregar(producto.codigo, producto.nombre)
+        insertados = len(set(codigos) - existentes)
+        return {
+            'lote': numero,
+            'insertados': insertados,
+            'actualizados': len(codigos) - insertados + repetidos,
+            'rechazados': rechazados
+        }
 
-                        if añosGarantia:
-                            producto_data['añosGarantia'] = añosGarantia['añosGarantia']
-                            producto = ProductoElectronico(**producto_data)
-                        
-                        else:
-                            cursor.execute('SELECT fechaVencimiento FROM productoalimenticio WHERE codigo = %s', (codigo,))
-                            fechaVencimiento = cursor.fetchone()
-
-                            if fechaVencimiento:
-                                producto_data['fechaVencimiento'] = fechaVencimiento['fechaVencimiento']
-                                producto = ProductoAlimenticio(**producto_data)
-                            
-                            else:
-                                producto = Producto(**producto_data)
-                        
-                        print()
-                        print(f'Producto encontrado: -> {producto} Código: -> {codigo}')
-                    
-                    else:
-                        print()
-                        print(f'No se encontró Producto con Código: -> {codigo}')
-            
+    def crear_productos(self, productos, batch_size=None):
+        '''
+        Crear o actualizar muchos productos de una vez.
+        productos: iterable de objetos Producto o de diccionarios con las claves de to_dict
+                   (un ValueError en lugar de una fila se informa como rechazado)
+        Devuelve una lista con un reporte por lote: insertados, actualizados y rechazados (con el motivo)
+        '''
+        batch_size = batch_size or self.tamaño_lote
+        reporte = []
+        lote = []
+        rechazados = []
+
+        for fila, item in enumerate(productos, start=1):
+            try:
+                if isinstance(item, Exception):
+                    raise item      # fila que el lector no pudo interpretar (ver importacion.py)
+                producto = item if isinstance(item, Producto) else producto_desde_dict(item)
+                if not isinstance(producto, (ProductoElectronico, ProductoAlimenticio)):
+                    raise ValueError('El producto debe ser electronico o alimenticio')
+            except (ValueError, TypeError, AttributeError) as error:
+                codigo = item.get('codigo') if isinstance(item, dict) else getattr(item, 'codigo', None)
+                rechazados.append({'fila': fila, 'codigo': codigo, 'error': str(error)})
+                continue
+
+            lote.append(producto)
+            if len(lote) >= batch_size:
+                reporte.append(self.guardar_lote(len(reporte) + 1, lote, rechazados))
+                lote = []
+                rechazados = []
+
+        if lote:
+            reporte.append(self.guardar_lote(len(reporte) + 1, lote, rechazados))
+        elif rechazados:
+            reporte.append({'lote': len(reporte) + 1, 'insertados': 0, 'actualizados': 0, 'rechazados': rechazados})
+
+        return reporte
+
+    def eliminar_productos(self, codigos, batch_size=None):
+        '''
+        Eliminar muchos productos, con un DELETE y una transacción por lote.
+        Devuelve un resumen con la cantidad de eliminados y la lista de códigos que no existían
+        '''
+        batch_size = batch_size or self.tamaño_lote
+        codigos = list(dict.fromkeys(int(codigo) for codigo in codigos))
+        resumen = {'eliminados': 0, 'no_encontrados': []}
+        for inicio in range(0, len(codigos), batch_size):
+            lote = codigos[inicio:inicio + batch_size]
+            existentes = self.backend.eliminar_lote(lote)
+            for codigo in lote:
+                self.cache.guardar(codigo, None)
+                if self.vencimientos is not None:
+                    self.vencimientos.quitar(codigo)
+                if self.nombres is not None:
+                    self.nombres.quitar(codigo)
+            resumen['eliminados'] += len(existentes)
+            resumen['no_encontrados'].extend(codigo for codigo in lote if codigo not in existentes)
+        return resumen
+
+    def buscar_producto(self, codigo):
+        '''Buscar un producto por código (primero en el cache). Devuelve el producto o None si no existe'''
+        clave = clave_codigo(codigo)
+        producto = self.cache.obtener(clave)
+        try:
+            if producto is None:
+                # Una sola consulta con el JOIN de los subtipos en lugar de hasta tres SELECT seguidos
+                producto_data = self.backend.buscar(codigo)
+                producto = self.hidratar_producto(producto_data) if producto_data else None
+                self.cache.guardar(clave, producto)
+            elif producto is CacheProductos.NO_EXISTE:
+                producto = None
+
+            if producto:
+                print()
+                print(f'Producto encontrado: -> {producto} Código: -> {codigo}')
+            else:
+                print()
+                print(f'No se encontró Producto con Código: -> {codigo}')
+            return producto
         
-        except Error as e:
-            print('Error al buscar producto: {e}')
-        finally:
-            if connection.is_connected():
-                connection.close()
+        except Exception as e:
+            print(f'Error al buscar producto: {e}')
 
     def actualizar_precio(self, codigo, nuevo_precio):
-        '''Actualizar el precio de un producto en la base de datos'''
+        '''Actualizar el precio de un producto en la base de datos (True si existía, None si hubo un error)'''
         try:
-            connection = self.connect()
-            if connection:
-                with connection.cursor() as cursor:
-                    # Verificar si el código del producto existe
-                    cursor.execute('SELECT * FROM producto WHERE codigo = %s', (codigo,))
-                    if not cursor.fetchone():
-                        print()
-                        print(f'No se encuentra producto con código -> {codigo}')
-                        return
-                    
-                    # Si el código del producto existe en la base de datos, procedemos a actualizar su precio
-                    cursor.execute('UPDATE producto SET precio = %s WHERE codigo = %s', (nuevo_precio, codigo))
-
-                    if cursor.rowcount > 0:
-                        connection.commit()
-                        print()
-                        print(f'El precio fue actualizado correctamente al valor -> $ {nuevo_precio}')
-                    else:
-                        print()
-                        print(f'No se encontró producto con código -> {codigo}')
+            if self.backend.actualizar_precio(codigo, nuevo_precio):
+                self.cache.invalidar(clave_codigo(codigo))
+                print()
+                print(f'El precio fue actualizado correctamente al valor -> $ {nuevo_precio}')
+                return True
+            else:
+                print()
+                print(f'No se encuentra producto con código -> {codigo}')
+                return False
                     
         except Exception as e:
             print(f'Error al actualizar precio: {e}')
-        finally:
-            if connection.is_connected():
-                connection.close()
                 
     def eliminar_producto(self, codigo):
+        '''Devuelve True si se eliminó, False si no existía y None si hubo un error'''
         try:
-            connection = self.connect()
-            if connection:
-                with connection.cursor() as cursor:
-                    # Verificar si el código del producto existe
-                    cursor.execute('SELECT * FROM producto WHERE codigo = %s', (codigo,))
-                    if not cursor.fetchone():
-                        print()
-                        print(f'No se encuentra producto con codigo -> {codigo}')
-                        return
-                    
-                    # Si el producto existe, eliminamos dicho producto
-                    cursor.execute('DELETE FROM productoelectronico WHERE codigo = %s', (codigo,))
-                    cursor.execute('DELETE FROM productoalimenticio WHERE codigo = %s', (codigo,))
-                    cursor.execute('DELETE FROM producto WHERE codigo = %s', (codigo,))
-                    if cursor.rowcount > 0:
-                        connection.commit()
-                        print()
-                        print(f'El producto con código -> {codigo} fue eliminado de la base de datos')
-                    else:
-                        print()
-                        print(f'No se encontró producto con código -> {codigo}')
+            if self.backend.eliminar(codigo):
+                self.cache.guardar(clave_codigo(codigo), None)
+                if self.vencimientos is not None:
+                    self.vencimientos.quitar(codigo)
+                if self.nombres is not None:
+                    self.nombres.quitar(codigo)
+                print()
+                print(f'El producto con código -> {codigo} fue eliminado de la base de datos')
+                return True
+            else:
+                print()
+                print(f'No se encuentra producto con codigo -> {codigo}')
+                return False
                         
         except Exception as e:
             print(f'Error al eliminar producto: {e}')
-        
-        finally:
-            if connection.is_connected():
-                connection.close()
+
+    # Actualizaciones masivas (por ejemplo, la actualización mensual de precios por inflación)
+    # Se resuelven con UPDATE sobre conjuntos de filas, una transacción por lote,
+    # en lugar de una transacción por código. Devuelven un resumen con las filas afectadas.
+
+    def ajustar_precios(self, porcentaje, tipo=None):
+        '''Subir (o bajar, con un porcentaje negativo) los precios de todos los productos o de un tipo'''
+        resumen = self.backend.ajustar_precios_porcentaje(1 + float(porcentaje) / 100, tipo)
+        self.cache.limpiar()
+        return resumen
+
+    def actualizar_precios(self, precios, batch_size=None):
+        '''Aplicar un diccionario codigo -> nuevo precio'''
+        return self.aplicar_por_lotes(self.backend.actualizar_precios, precios.items(), batch_size, sumar=False)
+
+    def ajustar_stock(self, diferencias, batch_size=None):
+        '''Aplicar un diccionario codigo -> diferencia de cantidad (positiva o negativa)'''
+        return self.aplicar_por_lotes(self.backend.ajustar_stock, diferencias.items(), batch_size, sumar=True)
+
+    def aplicar_por_lotes(self, operacion, pares, batch_size, sumar):
+        batch_size = batch_size or self.tamaño_lote
+        resumen = {'actualizados': 0, 'rechazados': 0, 'no_encontrados': 0, 'invalidos': []}
+        valores = {}
+        for codigo, valor in pares:
+            try:
+                codigo, valor = int(codigo), (int(valor) if sumar else float(valor))
+            except (TypeError, ValueError):
+                resumen['invalidos'].append(codigo)
+                continue
+            # Un código repetido suma sus diferencias de stock; para el precio gana el último valor
+            valores[codigo] = valores.get(codigo, 0) + valor if sumar else valor
+
+        lote = []
+        for par in valores.items():
+            lote.append(par)
+            if len(lote) >= batch_size:
+                self.aplicar_lote(operacion, lote, resumen)
+                lote = []
+        if lote:
+            self.aplicar_lote(operacion, lote, resumen)
+        return resumen
+
+    def aplicar_lote(self, operacion, lote, resumen):
+        for clave, cantidad in operacion(lote).items():
+            resumen[clave] += cantidad
+        for codigo, _ in lote:
+            self.cache.invalidar(codigo)
+
+    # Reservas de stock para pedidos
+    # El descuento se hace directamente en la base con un UPDATE condicional, nunca leyendo
+    # la cantidad y escribiéndola después, para que dos vendedores a la vez no vendan lo que no hay.
+
+    def validar_lineas(self, lineas):
+        '''Normalizar las líneas de un pedido: suma los códigos repetidos y ordena por código'''
+        if isinstance(lineas, dict):
+            lineas = lineas.items()
+        cantidades = {}
+        for codigo, cantidad in lineas:
+            cantidad = int(cantidad)
+            if cantidad <= 0:
+                raise ValueError('La cantidad a reservar debe ser mayor a cero')
+            cantidades[int(codigo)] = cantidades.get(int(codigo), 0) + cantidad
+        return sorted(cantidades.items())
+
+    def reservar_stock(self, codigo, cantidad):
+        '''Descontar cantidad del stock si alcanza. Devuelve True si se reservó'''
+        [(codigo, cantidad)] = self.validar_lineas([(codigo, cantidad)])
+        reservado = self.backend.reservar(codigo, cantidad)
+        if reservado:
+            self.cache.invalidar(codigo)
+        return reservado
+
+    def liberar_stock(self, codigo, cantidad):
+        '''Devolver al stock una cantidad reservada. Devuelve False si el código no existe'''
+        [(codigo, cantidad)] = self.validar_lineas([(codigo, cantidad)])
+        liberado = self.backend.liberar(codigo, cantidad)
+        self.cache.invalidar(codigo)
+        return liberado
+
+    def reservar_pedido(self, lineas):
+        '''
+        Reservar todas las líneas de un pedido (diccionario o lista de codigo, cantidad) o ninguna.
+        Devuelve None si se reservó todo, o el primer código sin stock suficiente.
+        '''
+        lineas = self.validar_lineas(lineas)
+        faltante = self.backend.reservar_lineas(lineas)
+        if faltante is None:
+            for codigo, _ in lineas:
+                self.cache.invalidar(codigo)
+        return faltante
+
+    def liberar_pedido(self, lineas):
+        '''Devolver al stock todas las líneas de un pedido reservado'''
+        lineas = self.validar_lineas(lineas)
+        self.backend.liberar_lineas(lineas)
+        for codigo, _ in lineas:
+            self.cache.invalidar(codigo)
+
+    # Listado paginado
+    # El cursor de cada página es el último código de la anterior (None para empezar).
+
+    def listar_pagina(self, despues_de=None, tamaño=20, tipo=None, precio_min=None, precio_max=None):
+        '''Devolver (productos, cursor de la página siguiente). El cursor es None en la última página'''
+        filas = self.backend.pagina_filas(-1 if despues_de is None else int(despues_de), tamaño, tipo, precio_min, precio_max)
+        productos = [self.hidratar_producto(fila) for fila in filas]
+        siguiente = productos[-1].codigo if len(productos) == tamaño else None
+        return productos, siguiente
+
+    def iter_paginas(self, tamaño=20, tipo=None, precio_min=None, precio_max=None):
+        '''Recorrer el catálogo de a una página (lista de productos) por vez'''
+        cursor = None
+        while True:
+            productos, cursor = self.listar_pagina(cursor, tamaño, tipo, precio_min, precio_max)
+            if productos:
+                yield productos
+            if cursor is None:
+                return
+
+    # Búsqueda por nombre (ver indice_nombres.py)
+
+    def activar_indice_nombres(self):
+        '''Armar el índice en memoria de nombres; desde ahora se mantiene en las altas y bajas'''
+        self.nombres = IndiceNombres(self.backend.iter_nombres(self.tamaño_lote))
+        return self.nombres
+
+    def buscar_por_nombre(self, texto, limite=10):
+        '''
+        Los productos que mejor coinciden con el texto (prefijo o parte del nombre, sin importar
+        mayúsculas ni acentos). Sin el índice activo se hace una consulta por prefijo en la base.
+        '''
+        if self.nombres is not None:
+            codigos = [codigo for codigo, _ in self.nombres.buscar(texto, limite)]
+            encontrados = {codigo: self.cache.obtener(codigo) for codigo in codigos}
+            # Los que no están en el cache se piden todos juntos, en una sola consulta
+            faltantes = [codigo for codigo, producto in encontrados.items() if producto is None]
+            if faltantes:
+                for producto_data in self.backend.buscar_lote(faltantes):
+                    producto = self.hidratar_producto(producto_data)
+                    encontrados[producto.codigo] = producto
+                for codigo in faltantes:
+                    self.cache.guardar(codigo, encontrados[codigo])
+            return [encontrados[codigo] for codigo in codigos
+                    if encontrados[codigo] is not None and encontrados[codigo] is not CacheProductos.NO_EXISTE]
+        texto = ' '.join(str(texto).split()).capitalize()
+        if not texto:
+            return []
+        return [self.hidratar_producto(fila) for fila in self.backend.buscar_por_prefijo(texto, limite)]
+
+    # Vencimientos de los productos alimenticios (ver vencimientos.py)
+
+    def activar_indice_vencimientos(self):
+        '''Armar el índice en memoria de vencimientos; desde ahora se mantiene en las altas y bajas'''
+        self.vencimientos = IndiceVencimientos.desde_filas(self.backend.buscar_vencimientos(date.min, date.max))
+        return self.vencimientos
+
+    def vencimientos_entre(self, desde, hasta):
+        '''Lista de (fecha, codigo) que vencen entre dos fechas: con el índice si está activo, si no en la base'''
+        if self.vencimientos is not None:
+            return self.vencimientos.vencen_entre(desde, hasta)
+        filas = self.backend.buscar_vencimientos(convertir_fecha(desde), convertir_fecha(hasta))
+        return [(convertir_fecha(fila['fechaVencimiento']), fila['codigo']) for fila in filas]
+
+    def productos_por_vencer(self, dias, hoy=None):
+        '''Productos alimenticios que vencen entre hoy y dentro de N días, con una consulta indexada'''
+        hoy = convertir_fecha(hoy or date.today())
+        filas = self.backend.buscar_vencimientos(hoy, hoy + timedelta(days=dias))
+        return [self.hidratar_producto(fila) for fila in filas]
+
+    def escaner_vencimientos(self, dias=7, intervalo=3600.0, al_encontrar=None):
+        '''Crear un EscanerVencimientos sobre este catálogo (llamar a iniciar() para que corra solo)'''
+        return EscanerVencimientos(self.vencimientos_entre, dias, intervalo, al_encontrar, indice=self.vencimientos)
+
+    def hidratar_producto(self, producto_data):
+        '''Construir el objeto correspondiente a partir de una fila del JOIN de producto con sus subtipos'''
+        # Las filas vienen de nuestra base de datos: usamos el constructor sin validaciones
+        añosGarantia = producto_data.pop('añosGarantia', None)
+        fechaVencimiento = producto_data.pop('fechaVencimiento', None)
+        if añosGarantia is not None:
+            return ProductoElectronico.desde_fila(**producto_data, añosGarantia=añosGarantia)
+        if fechaVencimiento is not None:
+            return ProductoAlimenticio.desde_fila(**producto_data, fechaVencimiento=fechaVencimiento)
+        return Producto.desde_fila(**producto_data)
+
+    def iter_lotes_filas(self, tamaño_lote=None):
+        '''Recorrer el catálogo en lotes de filas (diccionarios) sin cargarlo completo en memoria'''
+        return self.backend.iter_lotes_filas(tamaño_lote or self.tamaño_lote)
+
+    def iter_productos(self, tamaño_lote=None):
+        '''Recorrer todos los productos de a uno, a medida que llegan de la base de datos'''
+        for filas in self.iter_lotes_filas(tamaño_lote):
+            for producto_data in filas:
+                yield self.hidratar_producto(producto_data)
 
     def leer_todos_los_productos(self):
         try:
-            connection = self.connect()
-            if connection:
-                with connection.cursor(dictionary = True) as cursor:
-                    cursor.execute('SELECT * FROM producto')
-                    productos_data = cursor.fetchall()
-
-                    productos = []
-                    for producto_data in productos_data:
-                        codigo = producto_data['codigo']
-
-                        cursor.execute('SELECT añosGarantia FROM productoelectronico WHERE codigo = %s', (codigo,))
-                        añosgarantia = cursor.fetchone()
-
-                        if añosgarantia:
-                            producto_data['añosGarantia'] = añosgarantia['añosGarantia']
-                            producto = ProductoElectronico(**producto_data)
-                        
-                        else:
-                            cursor.execute('SELECT fechaVencimiento FROM productoalimenticio WHERE codigo = %s', (codigo,))
-                            fechavencimiento = cursor.fetchone()
-                            producto_data['fechaVencimiento'] = fechavencimiento['fechaVencimiento']
-                            producto = ProductoAlimenticio(**producto_data)
-
-                        productos.append(producto)
+            productos = list(self.iter_productos())
                         
         except Exception as e:
             print(f'Error al mostrar todos los productos: {e}')
         
         else:
             return productos
-        
-        finally:
-            if connection.is_connected():
-                connection.close()
-        
-
-
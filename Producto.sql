@@ -0,0 +1,35 @@
+-- Esquema de la base de datos de productos (MySQL)
+-- Es la última versión del esquema de esquema.py. GestionProducto lo crea o actualiza solo al
+-- iniciar (opción Db_auto_migrate); este archivo sirve para crearlo a mano.
+-- Se puede ejecutar más de una vez: los índices se declaran dentro de cada CREATE TABLE IF NOT EXISTS
+-- (MySQL no tiene CREATE INDEX IF NOT EXISTS). En tablas creadas antes, los agrega esquema.py.
+
+CREATE TABLE IF NOT EXISTS producto (
+    codigo INT NOT NULL PRIMARY KEY,
+    tipo VARCHAR(20) NOT NULL,
+    nombre VARCHAR(100) NOT NULL,
+    precio DECIMAL(14, 2) NOT NULL CHECK (precio >= 0),
+    cantidad INT NOT NULL CHECK (cantidad >= 0),
+    INDEX idx_producto_tipo (tipo),
+    INDEX idx_producto_nombre (nombre)
+) ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS productoelectronico (
+    codigo INT NOT NULL PRIMARY KEY,
+    añosGarantia INT NOT NULL,
+    CONSTRAINT fk_productoelectronico_producto
+        FOREIGN KEY (codigo) REFERENCES producto (codigo) ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS productoalimenticio (
+    codigo INT NOT NULL PRIMARY KEY,
+    fechaVencimiento DATE NOT NULL,
+    INDEX idx_productoalimenticio_vencimiento (fechaVencimiento),
+    CONSTRAINT fk_productoalimenticio_producto
+        FOREIGN KEY (codigo) REFERENCES producto (codigo) ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS esquema_version (
+    version INT NOT NULL PRIMARY KEY
+);
+INSERT IGNORE INTO esquema_version (version) VALUES (1), (2);
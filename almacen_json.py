@@ -0,0 +1,368 @@
+# Almacén local de productos con journal
+# guardar_datos reescribía todo productos_store.json en cada cambio: un cambio de precio costaba
+# leer y serializar el catálogo completo, y un corte durante json.dump dejaba el archivo truncado.
+#
+# Este almacén usa dos archivos junto al archivo original:
+#   <archivo>.datos    foto compacta del catálogo, una línea por producto: "<codigo>\t<json>"
+#   <archivo>.journal  cambios agregados al final (altas/modificaciones y bajas), uno por línea
+# Al abrir se arma un índice codigo -> posición dentro de .datos (sin parsear el JSON de cada línea)
+# y se reaplica el journal. Cada tanto el journal se compacta en segundo plano en una nueva foto,
+# que reemplaza a la anterior con un rename atómico.
+# Si solo existe el productos_store.json original, se importa automáticamente la primera vez.
+# Después de cada compactación y al cerrar, productos_store.json se vuelve a escribir (exportar) para
+# los programas que leen ese archivo directamente (importacion, inventario_columnar, validacion_masiva).
+# Entre una exportación y la siguiente ese archivo puede estar atrasado: los datos vigentes son .datos
+# más .journal (exportar() lo pone al día a pedido).
+#
+# La fecha de modificación y el tamaño de cada exportación se anotan en <archivo>.exportado. Si al abrir
+# productos_store.json no coincide (se editó a mano o se restauró un respaldo), se vuelve a importar:
+# el almacén queda igual al archivo. Si cambia mientras el almacén está abierto, la próxima exportación
+# no lo pisa sin más: la versión externa se conserva como <archivo>.externo.
+
+import json
+import os
+import threading
+import time
+
+
+class AlmacenProductos:
+    def __init__(self, archivo, fsync_cada=100, fsync_intervalo=1.0, compactar_cada=10000):
+        '''
+        archivo: ruta del productos_store.json (se usan <archivo>.datos y <archivo>.journal)
+        fsync_cada / fsync_intervalo: el journal se fuerza a disco cada N cambios o cada X segundos
+        compactar_cada: cantidad de cambios en el journal que dispara una compactación
+        '''
+        self.archivo = archivo
+        self.ruta_datos = archivo + '.datos'
+        self.ruta_journal = archivo + '.journal'
+        self.ruta_journal_anterior = archivo + '.journal.compactando'
+        self.ruta_exportado = archivo + '.exportado'
+        self.fsync_cada = fsync_cada
+        self.fsync_intervalo = fsync_intervalo
+        self.compactar_cada = compactar_cada
+
+        self.__lock = threading.RLock()
+        self.__indice = {}          # codigo -> (posición, largo) de la línea en .datos
+        self.__cambios = {}         # codigo -> datos (o None si fue eliminado) todavía no compactados
+        self.__sin_fsync = 0
+        self.__ultimo_fsync = time.monotonic()
+        self.__compactando = None   # hilo de la compactación en curso
+        self.__temporizador = None  # fsync programado para los cambios que quedan sin forzar a disco
+
+        importado = not os.path.exists(self.ruta_datos)
+        if importado:
+            self.__importar_archivo_original()
+        self.__lector = open(self.ruta_datos, 'rb')
+        self.__construir_indice()
+        for ruta in (self.ruta_journal_anterior, self.ruta_journal):
+            self.__reaplicar_journal(ruta)
+        if os.path.exists(self.ruta_journal_anterior):
+            # Quedó una compactación sin terminar: se completa ahora, antes de aceptar cambios nuevos
+            self.__escribir_compactacion(dict(self.__cambios))
+        self.__journal = open(self.ruta_journal, 'a', encoding='utf-8')
+        self.__sin_exportar = bool(self.__cambios)
+        if not importado and self.__cambio_afuera():
+            # productos_store.json cambió después de la última exportación: se importan solo las diferencias
+            datos = self.__leer_archivo_original()
+            self.__anotar_exportacion()
+            self.reemplazar(datos)
+
+    # Apertura
+
+    def __leer_archivo_original(self):
+        if not os.path.exists(self.archivo):
+            return {}
+        with open(self.archivo, 'r', encoding='utf-8') as file:
+            contenido = file.read().strip()
+        return json.loads(contenido) if contenido else {}
+
+    def __importar_archivo_original(self):
+        '''Crear la foto compacta a partir del productos_store.json de siempre (si existe)'''
+        datos = self.__leer_archivo_original()
+        self.__escribir_foto(self.ruta_datos, ((str(codigo), producto) for codigo, producto in datos.items()))
+        self.__anotar_exportacion()
+
+    def __estado_archivo(self):
+        try:
+            estado = os.stat(self.archivo)
+        except FileNotFoundError:
+            return None
+        return [estado.st_mtime_ns, estado.st_size]
+
+    def __anotar_exportacion(self):
+        with open(self.ruta_exportado, 'w', encoding='utf-8') as file:
+            json.dump(self.__estado_archivo(), file)
+
+    def __cambio_afuera(self):
+        '''True si productos_store.json no es el que escribió la última exportación'''
+        try:
+            with open(self.ruta_exportado, 'r', encoding='utf-8') as file:
+                anotado = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False    # sin anotación (almacén de una versión anterior): no hay con qué comparar
+        actual = self.__estado_archivo()
+        return actual is not None and actual != anotado
+
+    def __construir_indice(self):
+        self.__indice = {}
+        self.__lector.seek(0)
+        posicion = 0
+        for linea in self.__lector:
+            codigo, _, _ = linea.partition(b'\t')
+            self.__indice[codigo.decode('utf-8')] = (posicion, len(linea))
+            posicion += len(linea)
+
+    def __reaplicar_journal(self, ruta):
+        if not os.path.exists(ruta):
+            return
+        with open(ruta, 'rb+') as file:
+            valido = 0
+            for linea in file:
+                try:
+                    cambio = json.loads(linea)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    # Última línea a medio escribir por un corte: se descarta y se recorta el archivo
+                    # para que los cambios nuevos no queden pegados a ella
+                    file.truncate(valido)
+                    break
+                self.__cambios[str(cambio['codigo'])] = cambio.get('datos')
+                valido += len(linea)
+
+    # Lectura
+
+    def obtener(self, codigo):
+        '''Leer un producto (diccionario) sin parsear el resto del archivo. None si no existe'''
+        codigo = str(codigo)
+        with self.__lock:
+            if codigo in self.__cambios:
+                return self.__cambios[codigo]
+            ubicacion = self.__indice.get(codigo)
+            if ubicacion is None:
+                return None
+            self.__lector.seek(ubicacion[0])
+            linea = self.__lector.read(ubicacion[1])
+        return json.loads(linea.partition(b'\t')[2])
+
+    def __contains__(self, codigo):
+        codigo = str(codigo)
+        with self.__lock:
+            if codigo in self.__cambios:
+                return self.__cambios[codigo] is not None
+            return codigo in self.__indice
+
+    def codigos(self):
+        with self.__lock:
+            codigos = set(self.__indice)
+            for codigo, datos in self.__cambios.items():
+                if datos is None:
+                    codigos.discard(codigo)
+                else:
+                    codigos.add(codigo)
+        return codigos
+
+    def __len__(self):
+        return len(self.codigos())
+
+    def leer_todo(self):
+        '''Devolver todo el catálogo como diccionario codigo -> datos (igual que productos_store.json)'''
+        with self.__lock:
+            self.__lector.seek(0)
+            datos = {}
+            for linea in self.__lector:
+                codigo, _, contenido = linea.partition(b'\t')
+                datos[codigo.decode('utf-8')] = json.loads(contenido)
+            for codigo, producto in self.__cambios.items():
+                if producto is None:
+                    datos.pop(codigo, None)
+                else:
+                    datos[codigo] = producto
+        return datos
+
+    # Escritura
+
+    def guardar(self, datos):
+        '''Agregar o reemplazar un producto (diccionario con las claves de to_dict)'''
+        self.__registrar(str(datos['codigo']), datos)
+
+    def eliminar(self, codigo):
+        codigo = str(codigo)
+        if codigo not in self:
+            return False
+        self.__registrar(codigo, None)
+        return True
+
+    def reemplazar(self, datos):
+        '''
+        Dejar el almacén igual a un diccionario completo, escribiendo solo las diferencias.
+        No se parsea el catálogo guardado: cada producto se serializa y se compara con su línea de la foto
+        (o con el journal, si cambió después de la última compactación)
+        '''
+        nuevos = {str(codigo): producto for codigo, producto in datos.items()}
+        for codigo in self.codigos() - nuevos.keys():
+            self.__registrar(codigo, None)
+        for codigo, producto in nuevos.items():
+            if not self.__es_igual(codigo, producto):
+                self.__registrar(codigo, producto)
+
+    def __es_igual(self, codigo, producto):
+        with self.__lock:
+            if codigo in self.__cambios:
+                return self.__cambios[codigo] == producto
+            ubicacion = self.__indice.get(codigo)
+            if ubicacion is None:
+                return False
+            self.__lector.seek(ubicacion[0])
+            guardada = self.__lector.read(ubicacion[1])
+        return guardada == self.__linea(codigo, producto)
+
+    def __registrar(self, codigo, datos):
+        with self.__lock:
+            self.__journal.write(json.dumps({'codigo': codigo, 'datos': datos}, ensure_ascii=False) + '\n')
+            self.__cambios[codigo] = datos
+            self.__sin_exportar = True
+            self.__sin_fsync += 1
+            if self.__sin_fsync >= self.fsync_cada or time.monotonic() - self.__ultimo_fsync >= self.fsync_intervalo:
+                self.sincronizar()
+            elif self.__temporizador is None:
+                # Si no llegan más cambios, igual se fuerzan a disco pasado fsync_intervalo
+                self.__temporizador = threading.Timer(self.fsync_intervalo, self.__sincronizar_pendientes)
+                self.__temporizador.daemon = True
+                self.__temporizador.start()
+            if len(self.__cambios) >= self.compactar_cada:
+                self.compactar(en_segundo_plano=True)
+
+    def __sincronizar_pendientes(self):
+        with self.__lock:
+            self.__temporizador = None
+            if self.__sin_fsync and not self.__journal.closed:
+                self.sincronizar()
+
+    def sincronizar(self):
+        '''Forzar a disco los cambios pendientes del journal'''
+        with self.__lock:
+            if self.__temporizador is not None:
+                self.__temporizador.cancel()
+                self.__temporizador = None
+            self.__journal.flush()
+            os.fsync(self.__journal.fileno())
+            self.__sin_fsync = 0
+            self.__ultimo_fsync = time.monotonic()
+
+    # Compactación
+
+    def compactar(self, en_segundo_plano=False):
+        '''Reescribir la foto con los cambios del journal y vaciar el journal'''
+        while True:
+            with self.__lock:
+                hilo = self.__compactando
+                if hilo is None or not hilo.is_alive():
+                    hilo = self.__iniciar_compactacion()
+                    break
+                if en_segundo_plano:
+                    return
+            hilo.join()     # hay otra compactación en curso: se espera fuera del lock y se vuelve a intentar
+        if not en_segundo_plano:
+            hilo.join()
+
+    def __iniciar_compactacion(self):
+        # Se cierra el journal actual y se empieza uno nuevo: los cambios que lleguen
+        # mientras se escribe la foto nueva quedan en el journal nuevo
+        self.sincronizar()
+        self.__journal.close()
+        os.replace(self.ruta_journal, self.ruta_journal_anterior)
+        self.__journal = open(self.ruta_journal, 'a', encoding='utf-8')
+        hilo = threading.Thread(target=self.__escribir_compactacion, args=(dict(self.__cambios),), daemon=True)
+        self.__compactando = hilo
+        hilo.start()
+        return hilo
+
+    def __escribir_compactacion(self, cambios):
+        temporal = self.ruta_datos + '.tmp'
+        with open(self.ruta_datos, 'rb') as anterior:
+            def lineas():
+                for linea in anterior:
+                    codigo = linea.partition(b'\t')[0].decode('utf-8')
+                    if codigo not in cambios:
+                        yield linea
+                for codigo, datos in cambios.items():
+                    if datos is not None:
+                        yield self.__linea(codigo, datos)
+            self.__escribir_foto(temporal, lineas(), crudas=True)
+
+        with self.__lock:
+            os.replace(temporal, self.ruta_datos)
+            self.__lector.close()
+            self.__lector = open(self.ruta_datos, 'rb')
+            self.__construir_indice()
+            for codigo, datos in cambios.items():
+                if self.__cambios.get(codigo, ...) is datos:   # no cambió de nuevo durante la compactación
+                    del self.__cambios[codigo]
+            os.remove(self.ruta_journal_anterior)
+        self.exportar()
+
+    def __linea(self, codigo, datos):
+        return f'{codigo}\t{json.dumps(datos, ensure_ascii=False)}\n'.encode('utf-8')
+
+    def __escribir_foto(self, ruta, entradas, crudas=False):
+        '''Escribir una foto completa en un archivo temporal y renombrarla de forma atómica'''
+        temporal = ruta + '.parcial'
+        with open(temporal, 'wb') as file:
+            for entrada in entradas:
+                file.write(entrada if crudas else self.__linea(*entrada))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporal, ruta)
+
+    # Exportación y cierre
+
+    def exportar(self, ruta=None):
+        '''
+        Escribir el catálogo con el formato de productos_store.json (rename atómico).
+        Las líneas de la foto se copian como están, sin parsear cada producto
+        '''
+        ruta = ruta or self.archivo
+        with self.__lock:
+            cambios = dict(self.__cambios)
+            foto = open(self.ruta_datos, 'rb')     # si una compactación la reemplaza, este archivo sigue abierto
+            self.__sin_exportar = False
+        temporal = ruta + '.tmp'
+        with foto, open(temporal, 'wb') as file:
+            separador = b'{\n'
+            for linea in foto:
+                codigo, _, contenido = linea.partition(b'\t')
+                if codigo.decode('utf-8') in cambios:
+                    continue
+                file.write(separador + b'    ' + json.dumps(codigo.decode('utf-8')).encode('utf-8') + b': ' + contenido.rstrip(b'\n'))
+                separador = b',\n'
+            for codigo, datos in cambios.items():
+                if datos is not None:
+                    file.write(separador + f'    {json.dumps(codigo)}: {json.dumps(datos, ensure_ascii=False)}'.encode('utf-8'))
+                    separador = b',\n'
+            file.write(b'{}\n' if separador == b'{\n' else b'\n}\n')
+            file.flush()
+            os.fsync(file.fileno())
+        if ruta != self.archivo:
+            os.replace(temporal, ruta)
+            return
+        if self.__cambio_afuera():
+            os.replace(ruta, ruta + '.externo')
+        os.replace(temporal, ruta)
+        self.__anotar_exportacion()
+
+    def cerrar(self):
+        with self.__lock:
+            hilo = self.__compactando
+        if hilo is not None:
+            hilo.join()
+        if self.__sin_exportar:
+            self.exportar()
+        with self.__lock:
+            self.sincronizar()
+            self.__journal.close()
+            self.__lector.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
@@ -0,0 +1,800 @@
+# Backends de almacenamiento para GestionProducto
+# Todo el SQL de las operaciones de productos está acá, detrás de una misma interfaz.
+# BackendSQL tiene las consultas comunes (escritas con marcadores %s) y cada subclase
+# resuelve lo propio de su motor: cómo se obtiene la conexión, los cursores y el upsert.
+#   BackendMySQL:  servidor MySQL con pool de conexiones (configuración Db_*)
+#   BackendSQLite: base embebida en un archivo, con una sola conexión de larga vida en modo WAL
+# El backend se elige con la opción Db_backend (mysql por defecto).
+
+# mysql.connector, sqlite3 y decouple se importan recién cuando se usan: importar este módulo
+# (o Laboratorio_1 para usar solo las clases del modelo) no carga el driver ni lee el .env.
+
+import queue
+import threading
+import time
+import zlib
+from contextlib import closing, contextmanager
+from decimal import Decimal, ROUND_HALF_UP
+
+from esquema import MIGRACIONES_MYSQL, MIGRACIONES_SQLITE
+
+CENTAVOS = Decimal('0.01')
+
+
+def config(*args, **kwargs):
+    '''decouple.config, importado la primera vez que se lee una opción'''
+    from decouple import config as leer_opcion
+    return leer_opcion(*args, **kwargs)
+
+
+# Huella de un producto (ver sincronizacion.py)
+# CRC32 de un texto canónico con todos los campos. La misma huella se calcula en SQL (expresion_huella
+# de cada backend) y en Python sobre productos_store.json, así que las dos definiciones tienen que
+# cambiar juntas. El nombre va en minúsculas porque to_dict lo devuelve capitalizado. El formato del
+# precio (2 decimales, redondeo hacia arriba en el medio) y de la fecha (AAAA-MM-DD) es explícito en los
+# dos lados, para que no dependa de cómo esté declarada la columna (FLOAT, DECIMAL, DATE o DATETIME).
+
+def huella_producto(codigo, tipo, nombre, precio, cantidad, añosGarantia=None, fechaVencimiento=None):
+    precio = Decimal(str(precio)).quantize(CENTAVOS, ROUND_HALF_UP)
+    if fechaVencimiento is not None:
+        fechaVencimiento = fechaVencimiento.strftime('%Y-%m-%d') if hasattr(fechaVencimiento, 'strftime') else str(fechaVencimiento)[:10]
+    texto = '|'.join((
+        str(codigo), tipo, nombre.lower(), str(precio), str(cantidad),
+        '' if añosGarantia is None else str(añosGarantia),
+        '' if fechaVencimiento is None else fechaVencimiento
+    ))
+    return zlib.crc32(texto.encode('utf-8'))
+
+
+# Pool de conexiones
+# Abrir una conexión nueva por cada operación implica un handshake TCP y de autenticación completo.
+# El pool mantiene unas pocas conexiones "calientes" y las reutiliza entre operaciones.
+
+class PoolConexiones:
+    def __init__(self, fabrica, tamaño=5, timeout=10.0, intervalo_verificacion=30.0):
+        '''
+        fabrica: función sin argumentos que devuelve una conexión nueva
+        tamaño: cantidad máxima de conexiones abiertas al mismo tiempo
+        timeout: segundos máximos de espera para obtener una conexión
+        intervalo_verificacion: segundos de inactividad a partir de los cuales se verifica la conexión antes de entregarla
+        '''
+        if int(tamaño) < 1:
+            raise ValueError('El tamaño del pool debe ser de al menos una conexión')
+        self.fabrica = fabrica
+        self.tamaño = int(tamaño)
+        self.timeout = float(timeout)
+        self.intervalo_verificacion = float(intervalo_verificacion)
+        self.__libres = queue.LifoQueue()   # LIFO: se reutiliza primero la conexión usada más recientemente
+        self.__cupos = threading.BoundedSemaphore(self.tamaño)
+        self.__cerrado = False
+
+    def adquirir(self, timeout=None):
+        '''Obtener una conexión del pool. Lanza TimeoutError si no hay una disponible a tiempo'''
+        if self.__cerrado:
+            raise RuntimeError('El pool de conexiones está cerrado')
+        espera = self.timeout if timeout is None else timeout
+        if not self.__cupos.acquire(timeout=espera):
+            raise TimeoutError(f'No se obtuvo una conexión del pool en {espera} segundos')
+        try:
+            while True:
+                try:
+                    conexion, ultimo_uso = self.__libres.get_nowait()
+                except queue.Empty:
+                    return self.fabrica()
+                # Solo verificamos las conexiones que estuvieron inactivas un tiempo, para no hacer un ping por operación
+                if time.monotonic() - ultimo_uso < self.intervalo_verificacion or self.__esta_sana(conexion):
+                    return conexion
+                self.__cerrar_conexion(conexion)
+        except BaseException:
+            self.__cupos.release()
+            raise
+
+    def liberar(self, conexion, descartar=False):
+        '''Devolver una conexión al pool. Si está rota o se pide descartarla, se cierra'''
+        try:
+            if descartar or self.__cerrado:
+                self.__cerrar_conexion(conexion)
+                return
+            try:
+                if getattr(conexion, 'in_transaction', False):
+                    conexion.rollback()     # No devolvemos al pool transacciones a medio terminar
+            except Exception:
+                self.__cerrar_conexion(conexion)
+                return
+            self.__libres.put((conexion, time.monotonic()))
+        finally:
+            self.__cupos.release()
+
+    @contextmanager
+    def conexion(self, timeout=None):
+        '''Context manager que adquiere una conexión y la devuelve al pool al salir'''
+        conexion = self.adquirir(timeout)
+        descartar = False
+        try:
+            yield conexion
+        except BaseException:
+            try:
+                conexion.rollback()
+            except Exception:
+                descartar = True
+            raise
+        finally:
+            self.liberar(conexion, descartar)
+
+    def cerrar(self):
+        '''Cerrar todas las conexiones libres. Las que estén en uso se cierran al liberarse'''
+        self.__cerrado = True
+        while True:
+            try:
+                conexion, _ = self.__libres.get_nowait()
+            except queue.Empty:
+                break
+            self.__cerrar_conexion(conexion)
+
+    def __esta_sana(self, conexion):
+        try:
+            return conexion.is_connected()     # is_connected() hace un ping al servidor
+        except Exception:
+            return False
+
+    def __cerrar_conexion(self, conexion):
+        try:
+            conexion.close()
+        except Exception:
+            pass
+
+
+class BackendSQL:
+    marcador = '%s'
+    concurrencia = 1    # operaciones que el backend puede atender realmente a la vez
+
+    # Consulta única con un LEFT JOIN por subtipo en lugar de una o dos consultas por fila
+    CONSULTA_PRODUCTOS = '''
+    SELECT p.codigo, p.tipo, p.nombre, p.precio, p.cantidad, pe.añosGarantia, pa.fechaVencimiento
+    FROM producto p
+    LEFT JOIN productoelectronico pe ON pe.codigo = p.codigo
+    LEFT JOIN productoalimenticio pa ON pa.codigo = p.codigo
+    '''
+
+    MIGRACIONES = {}    # versión -> pasos (ver esquema.py)
+
+    # Lo que cada motor tiene que implementar
+
+    @contextmanager
+    def sesion(self, timeout=None):
+        '''Obtener una conexión para usarla dentro de un bloque with'''
+        raise NotImplementedError
+
+    def abrir_cursor(self, connection, sin_buffer=False):
+        '''Cursor que devuelve las filas como diccionarios'''
+        raise NotImplementedError
+
+    def descartar_resultados(self, connection):
+        '''Descartar las filas no leídas de un recorrido abandonado'''
+
+    def sentencia_upsert(self, tabla, columnas, cantidad_filas):
+        '''INSERT de varias filas que actualiza las que ya existen por código'''
+        raise NotImplementedError
+
+    def crear_staging(self, cursor):
+        '''Crear (si no existe) la tabla temporal ajuste_staging (codigo, valor) de la conexión'''
+        raise NotImplementedError
+
+    def sentencia_actualizar_desde_staging(self, columna, expresion, condicion):
+        '''UPDATE de producto (alias p) cruzado con ajuste_staging (alias s)'''
+        raise NotImplementedError
+
+    def expresion_huella(self):
+        '''Expresión SQL con la huella (huella_producto) de una fila del JOIN de CONSULTA_PRODUCTOS'''
+        raise NotImplementedError
+
+    def expresion_division_entera(self, dividendo, divisor):
+        raise NotImplementedError
+
+    def cerrar(self):
+        raise NotImplementedError
+
+    # Utilidades comunes
+
+    def sql(self, query):
+        '''Adaptar los marcadores %s al estilo del motor'''
+        return query if self.marcador == '%s' else query.replace('%s', self.marcador)
+
+    def lista_marcadores(self, cantidad):
+        return ', '.join([self.marcador] * cantidad)
+
+    @contextmanager
+    def cursor(self, connection, sin_buffer=False):
+        with closing(self.abrir_cursor(connection, sin_buffer)) as cursor:
+            yield cursor
+
+    # Esquema
+
+    def migrar(self, aplicar=True):
+        '''
+        Verificar la versión del esquema y aplicar las migraciones que falten.
+        Con aplicar=False solo verifica, y lanza RuntimeError si el esquema está desactualizado.
+        Una base vacía (sin la tabla producto) se crea igual: no hay datos que las migraciones puedan tocar.
+        Devuelve la versión final.
+        '''
+        with self.sesion() as connection:
+            with self.cursor(connection) as cursor:
+                cursor.execute('CREATE TABLE IF NOT EXISTS esquema_version (version INTEGER NOT NULL PRIMARY KEY)')
+                cursor.execute('SELECT MAX(version) AS version FROM esquema_version')
+                version = cursor.fetchone()['version'] or 0
+                pendientes = [numero for numero in sorted(self.MIGRACIONES) if numero > version]
+                if pendientes and not aplicar and (version or self.existe_tabla(cursor, 'producto')):
+                    raise RuntimeError(f'El esquema de la base está en la versión {version} y se necesita la {pendientes[-1]}. '
+                                       'Aplicar las migraciones con python esquema.py --aplicar (o Db_auto_migrate=True)')
+                for numero in pendientes:
+                    for paso in self.MIGRACIONES[numero]:
+                        if callable(paso):
+                            paso(cursor)
+                        else:
+                            cursor.execute(paso)
+                    cursor.execute(self.sql('INSERT INTO esquema_version (version) VALUES (%s)'), (numero,))
+                    connection.commit()
+                    version = numero
+        return version
+
+    def existe_tabla(self, cursor, tabla):
+        try:
+            cursor.execute(f'SELECT 1 FROM {tabla} LIMIT 1')
+            cursor.fetchall()
+            return True
+        except Exception:
+            return False
+
+    # Operaciones
+
+    def insertar(self, fila_producto, tabla_subtipo, fila_subtipo):
+        '''Insertar un producto con su fila de subtipo. Devuelve False si el código ya existe'''
+        with self.sesion() as connection:
+            with self.cursor(connection) as cursor:
+                cursor.execute(self.sql('SELECT codigo FROM producto WHERE codigo = %s'), (fila_producto[0],))
+                if cursor.fetchone():
+                    return False
+                cursor.execute(self.sql('''
+                INSERT INTO producto (codigo, tipo, nombre, precio, cantidad)
+                VALUES (%s, %s, %s, %s, %s)
+                '''), fila_producto)
+                if tabla_subtipo == 'productoelectronico':
+                    cursor.execute(self.sql('INSERT INTO productoelectronico (codigo, añosGarantia) VALUES (%s, %s)'), fila_subtipo)
+                elif tabla_subtipo == 'productoalimenticio':
+                    cursor.execute(self.sql('INSERT INTO productoalimenticio (codigo, fechaVencimiento) VALUES (%s, %s)'), fila_subtipo)
+            connection.commit()
+        return True
+
+    def buscar(self, codigo):
+        '''Fila del JOIN de producto con sus subtipos, o None si no existe'''
+        with self.sesion() as connection:
+            with self.cursor(connection) as cursor:
+                cursor.execute(self.sql(self.CONSULTA_PRODUCTOS + ' WHERE p.codigo = %s'), (codigo,))
+                return cursor.fetchone()
+
+    def actualizar_precio(self, codigo, nuevo_precio):
+        '''Devuelve False si el código no existe'''
+        with self.sesion() as connection:
+            with self.cursor(connection) as cursor:
+                # El UPDATE informa cuántas filas encontró: no hace falta un SELECT previo
+                cursor.execute(self.sql('UPDATE producto SET precio = %s WHERE codigo = %s'), (nuevo_precio, codigo))
+                encontrado = cursor.rowcount > 0
+            connection.commit()
+        return encontrado
+
+    def eliminar(self, codigo):
+        '''Devuelve False si el código no existe'''
+        with self.sesion() as connection:
+            with self.cursor(connection) as cursor:
+                # Las filas de productoelectronico / productoalimenticio se borran solas (ON DELETE CASCADE)
+                cursor.execute(self.sql('DELETE FROM producto WHERE codigo = %s'), (codigo,))
+                encontrado = cursor.rowcount > 0
+            connection.commit()
+        return encontrado
+
+    def pagina_filas(self, despues_de, limite, tipo=None, precio_min=None, precio_max=None):
+        '''
+        Una página del catálogo ordenada por código (paginación por clave, no por OFFSET):
+        cada página arranca con un WHERE codigo > último código visto sobre la clave primaria,
+        así cuesta lo mismo la primera página que la número mil.
+        '''
+        condiciones = ['p.codigo > %s']
+        parametros = [despues_de]
+        if tipo is not None:
+            condiciones.append('p.tipo = %s')
+            parametros.append(tipo)
+        if precio_min is not None:
+            condiciones.append('p.precio >= %s')
+            parametros.append(precio_min)
+        if precio_max is not None:
+            condiciones.append('p.precio <= %s')
+            parametros.append(precio_max)
+        with self.sesion() as connection:
+            with self.cursor(connection) as cursor:
+                cursor.execute(self.sql(self.CONSULTA_PRODUCTOS + f'''
+                WHERE {' AND '.join(condiciones)}
+                ORDER BY p.codigo
+                LIMIT %s
+                '''), parametros + [limite])
+                return cursor.fetchall()
+
+    def buscar_por_prefijo(self, prefijo, limite):
+        '''
+        Productos cuyo nombre empieza con el prefijo, ordenados por nombre.
+        Se pide como rango (nombre >= prefijo AND nombre < siguiente) para que use idx_producto_nombre:
+        un LIKE con comodín al principio recorrería la tabla completa.
+        '''
+        siguiente = prefijo[:-1] + chr(ord(prefijo[-1]) + 1)
+        with self.sesion() as connection:
+            with self.cursor(connection) as cursor:
+                cursor.execute(self.sql(self.CONSULTA_PRODUCTOS + '''
+                WHERE p.nombre >= %s AND p.nombre < %s
+                ORDER BY p.nombre, p.codigo
+                LIMIT %s
+                '''), (prefijo, siguiente, limite))
+                return cursor.fetchall()
+
+    def iter_nombres(self, tamaño_lote):
+        '''Pares (codigo, nombre) de todo el catálogo, leídos en lotes con un cursor sin buffer'''
+        with self.sesion() as connection:
+            with self.cursor(connection, sin_buffer=True) as cursor:
+                agotado = False
+                try:
+                    cursor.execute('SELECT codigo, nombre FROM producto')
+                    while True:
+                        filas = cursor.fetchmany(tamaño_lote)
+                        if not filas:
+                            agotado = True
+                            break
+                        for fila in filas:
+                            yield fila['codigo'], fila['nombre']
+                finally:
+                    if not agotado:
+                        try:
+                            self.descartar_resultados(connection)
+                        except Exception:
+                            pass
+
+    # Sincronización por rangos de códigos (ver sincronizacion.py)
+    # Los rangos son intervalos [inicio, fin) y se piden de a muchos por consulta, unidos con OR:
+    # cada uno es un recorrido por rango sobre la clave primaria.
+
+    RANGOS_POR_CONSULTA = 500
+
+    def condicion_rangos(self, rangos):
+        return ' OR '.join(['(p.codigo >= %s AND p.codigo < %s)'] * len(rangos)), [valor for rango in rangos for valor in rango]
+
+    def resumen_rangos(self, ancho, rangos=None):
+        '''
+        Cantidad de productos y suma de sus huellas por rango de ancho fijo: el rango de un código es codigo // ancho.
+        rangos: intervalos [inicio, fin) a los que se limita la consulta (None: todo el catálogo).
+        Devuelve un diccionario rango -> (cantidad, suma)
+        '''
+        rango = self.expresion_division_entera('p.codigo', int(ancho))
+        consulta = f'''
+        SELECT {rango} AS rango, COUNT(*) AS cantidad, SUM({self.expresion_huella()}) AS suma
+        FROM producto p
+        LEFT JOIN productoelectronico pe ON pe.codigo = p.codigo
+        LEFT JOIN productoalimenticio pa ON pa.codigo = p.codigo
+        '''
+        resumen = {}
+        with self.sesion() as connection:
+            with self.cursor(connection) as cursor:
+                grupos = [None] if rangos is None else [rangos[i:i + self.RANGOS_POR_CONSULTA]
+                                                        for i in range(0, len(rangos), self.RANGOS_POR_CONSULTA)]
+                for grupo in grupos:
+                    condicion, parametros = ('1 = 1', []) if grupo is None else self.condicion_rangos(grupo)
+                    cursor.execute(self.sql(f'{consulta} WHERE {condicion} GROUP BY {rango}'), parametros)
+                    for fila in cursor.fetchall():
+                        resumen[int(fila['rango'])] = (int(fila['cantidad']), int(fila['suma']))
+        return resumen
+
+    def huellas_rangos(self, rangos):
+        '''Pares (codigo, huella) de los productos de los intervalos [inicio, fin), ordenados por código'''
+        huellas = []
+        with self.sesion() as connection:
+            with self.cursor(connection) as cursor:
+                for i in range(0, len(rangos), self.RANGOS_POR_CONSULTA):
+                    condicion, parametros = self.condicion_rangos(rangos[i:i + self.RANGOS_POR_CONSULTA])
+                    cursor.execute(self.sql(f'''
+                    SELECT p.codigo, {self.expresion_huella()} AS huella
+                    FROM producto p
+                    LEFT JOIN productoelectronico pe ON pe.codigo = p.codigo
+                    LEFT JOIN productoalimenticio pa ON pa.codigo = p.codigo
+                    WHERE {condicion}
+                    '''), parametros)
+                    huellas.extend((fila['codigo'], int(fila['huella'])) for fila in cursor.fetchall())
+        huellas.sort()
+        return huellas
+
+    def huellas_codigos(self, codigos):
+        '''Diccionario codigo -> huella de los códigos que existen'''
+        with self.sesion() as connection:
+            with self.cursor(connection) as cursor:
+                cursor.execute(f'''
+                SELECT p.codigo, {self.expresion_huella()} AS huella
+                FROM producto p
+                LEFT JOIN productoelectronico pe ON pe.codigo = p.codigo
+                LEFT JOIN productoalimenticio pa ON pa.codigo = p.codigo
+                WHERE p.codigo IN ({self.lista_marcadores(len(codigos))})
+                ''', list(codigos))
+                return {fila['codigo']: int(fila['huella']) for fila in cursor.fetchall()}
+
+    def buscar_lote(self, codigos):
+        '''Filas del JOIN de producto con sus subtipos para una lista de códigos (los que existen)'''
+        with self.sesion() as connection:
+            with self.cursor(connection) as cursor:
+                cursor.execute(self.CONSULTA_PRODUCTOS + f' WHERE p.codigo IN ({self.lista_marcadores(len(codigos))})', list(codigos))
+                return cursor.fetchall()
+
+    def eliminar_lote(self, codigos):
+        '''Eliminar varios productos en una transacción. Devuelve el conjunto de códigos que existían'''
+        with self.sesion() as connection:
+            try:
+                with self.cursor(connection) as cursor:
+                    marcadores = self.lista_marcadores(len(codigos))
+                    cursor.execute(f'SELECT codigo FROM producto WHERE codigo IN ({marcadores})', list(codigos))
+                    existentes = {fila['codigo'] for fila in cursor.fetchall()}
+                    cursor.execute(f'DELETE FROM producto WHERE codigo IN ({marcadores})', list(codigos))
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+        return existentes
+
+    def buscar_vencimientos(self, desde, hasta):
+        '''Filas de los productos que vencen entre dos fechas (inclusive), usando el índice sobre fechaVencimiento'''
+        with self.sesion() as connection:
+            with self.cursor(connection) as cursor:
+                cursor.execute(self.sql(self.CONSULTA_PRODUCTOS + '''
+                WHERE pa.fechaVencimiento BETWEEN %s AND %s
+                ORDER BY pa.fechaVencimiento, p.codigo
+                '''), (desde.isoformat(), hasta.isoformat()))
+                return cursor.fetchall()
+
+    def iter_lotes_filas(self, tamaño_lote):
+        '''
+        Recorrer el catálogo en lotes de filas (diccionarios), leyendo con un cursor sin buffer.
+        La memoria no crece con el tamaño del catálogo y el primer lote llega sin esperar al resto.
+        La conexión queda tomada hasta que se termina (o se cierra) el generador.
+        '''
+        with self.sesion() as connection:
+            with self.cursor(connection, sin_buffer=True) as cursor:
+                agotado = False
+                try:
+                    cursor.execute(self.CONSULTA_PRODUCTOS + ' ORDER BY p.codigo')
+                    while True:
+                        filas = cursor.fetchmany(tamaño_lote)
+                        if not filas:
+                            agotado = True
+                            break
+                        yield filas
+                finally:
+                    if not agotado:
+                        # Si se abandona el recorrido, hay que descartar las filas pendientes antes de reutilizar la conexión
+                        try:
+                            self.descartar_resultados(connection)
+                        except Exception:
+                            pass
+
+    def upsert_lote(self, filas_producto, filas_electronico, filas_alimenticio):
+        '''
+        Guardar un lote en una sola transacción: un INSERT de varias filas por tabla.
+        Devuelve el conjunto de códigos que ya existían. Si algo falla se deshace el lote completo.
+        '''
+        codigos = [fila[0] for fila in filas_producto]
+        with self.sesion() as connection:
+            try:
+                with self.cursor(connection) as cursor:
+                    # Una sola consulta por lote para saber cuáles códigos ya existían (solo para el reporte)
+                    cursor.execute(f'SELECT codigo FROM producto WHERE codigo IN ({self.lista_marcadores(len(codigos))})', codigos)
+                    existentes = {fila['codigo'] for fila in cursor.fetchall()}
+
+                    self.upsert_filas(cursor, 'producto', ('codigo', 'tipo', 'nombre', 'precio', 'cantidad'), filas_producto)
+                    for tabla, columna, filas, otra_tabla in (
+                        ('productoelectronico', 'añosGarantia', filas_electronico, 'productoalimenticio'),
+                        ('productoalimenticio', 'fechaVencimiento', filas_alimenticio, 'productoelectronico')
+                    ):
+                        if not filas:
+                            continue
+                        self.upsert_filas(cursor, tabla, ('codigo', columna), filas)
+                        # Si el producto antes era de otro tipo, se borra su fila anterior
+                        codigos_tipo = [fila[0] for fila in filas]
+                        cursor.execute(f'DELETE FROM {otra_tabla} WHERE codigo IN ({self.lista_marcadores(len(codigos_tipo))})', codigos_tipo)
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+        return existentes
+
+    # Operaciones masivas sobre conjuntos de filas
+    # Las validaciones del modelo (precio y cantidad no negativos) se controlan en el propio SQL,
+    # sin construir los objetos: las filas que no las cumplen no se modifican y se cuentan como rechazadas.
+
+    def ajustar_precios_porcentaje(self, factor, tipo=None):
+        '''Multiplicar los precios (de todos los productos o de un tipo) por un factor con un único UPDATE'''
+        # actualizados sale del rowcount del UPDATE (filas que cumplieron la condición, aunque el valor
+        # no cambie: FOUND_ROWS en MySQL); el resto de los encontrados son los rechazados
+        filtro = ' AND tipo = %s' if tipo else ''
+        parametros = (tipo,) if tipo else ()
+        with self.sesion() as connection:
+            with self.cursor(connection) as cursor:
+                cursor.execute(self.sql(f'SELECT COUNT(*) AS encontrados FROM producto WHERE 1 = 1{filtro}'), parametros)
+                encontrados = int(cursor.fetchone()['encontrados'])
+                cursor.execute(self.sql(f'UPDATE producto SET precio = ROUND(precio * %s, 2) WHERE precio * %s >= 0{filtro}'),
+                               (factor, factor) + parametros)
+                actualizados = cursor.rowcount
+            connection.commit()
+        return {'actualizados': actualizados, 'rechazados': max(encontrados - actualizados, 0), 'no_encontrados': 0}
+
+    def aplicar_valores(self, columna, expresion, condicion, pares):
+        '''
+        Aplicar valores por código en una transacción: los pares (codigo, valor) se cargan con un
+        INSERT de varias filas en una tabla temporal y se aplican con un único UPDATE cruzado.
+        expresion y condicion usan p.<columna> (valor actual) y s.valor (valor recibido).
+        '''
+        with self.sesion() as connection:
+            try:
+                with self.cursor(connection) as cursor:
+                    self.crear_staging(cursor)
+                    cursor.execute('DELETE FROM ajuste_staging')
+                    cursor.execute(f'''
+                    INSERT INTO ajuste_staging (codigo, valor)
+                    VALUES {', '.join(['(' + self.lista_marcadores(2) + ')'] * len(pares))}
+                    ''', [valor for par in pares for valor in par])
+                    cursor.execute('SELECT COUNT(*) AS encontrados FROM ajuste_staging s JOIN producto p ON p.codigo = s.codigo')
+                    encontrados = int(cursor.fetchone()['encontrados'])
+                    cursor.execute(self.sentencia_actualizar_desde_staging(columna, expresion, condicion))
+                    actualizados = cursor.rowcount      # como en ajustar_precios_porcentaje
+                    cursor.execute('DELETE FROM ajuste_staging')
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+        return {'actualizados': actualizados, 'rechazados': max(encontrados - actualizados, 0), 'no_encontrados': len(pares) - encontrados}
+
+    def actualizar_precios(self, pares):
+        '''pares: lista de (codigo, nuevo precio)'''
+        return self.aplicar_valores('precio', 's.valor', 's.valor >= 0', pares)
+
+    def ajustar_stock(self, pares):
+        '''pares: lista de (codigo, diferencia de cantidad), positiva o negativa'''
+        return self.aplicar_valores('cantidad', 'p.cantidad + s.valor', 'p.cantidad + s.valor >= 0', pares)
+
+    # Reservas de stock
+    # Cada reserva es un único UPDATE condicional (cantidad >= n) sobre la clave primaria:
+    # la base bloquea solo esa fila y nunca puede quedar stock negativo, aunque haya muchos
+    # procesos vendiendo el mismo producto a la vez (no hay lectura previa que pueda quedar vieja).
+
+    def reservar(self, codigo, cantidad):
+        '''Descontar cantidad si hay stock suficiente. Devuelve False si no alcanza o no existe'''
+        with self.sesion() as connection:
+            with self.cursor(connection) as cursor:
+                cursor.execute(self.sql('UPDATE producto SET cantidad = cantidad - %s WHERE codigo = %s AND cantidad >= %s'),
+                               (cantidad, codigo, cantidad))
+                reservado = cursor.rowcount > 0
+            connection.commit()
+        return reservado
+
+    def liberar(self, codigo, cantidad):
+        '''Devolver cantidad al stock. Devuelve False si el código no existe'''
+        with self.sesion() as connection:
+            with self.cursor(connection) as cursor:
+                cursor.execute(self.sql('UPDATE producto SET cantidad = cantidad + %s WHERE codigo = %s'), (cantidad, codigo))
+                liberado = cursor.rowcount > 0
+            connection.commit()
+        return liberado
+
+    def reservar_lineas(self, lineas):
+        '''
+        Reservar todas las líneas de un pedido o ninguna, en una transacción corta.
+        lineas: lista de (codigo, cantidad) ordenada por código, así todos los procesos bloquean
+        las filas en el mismo orden y no pueden quedar esperándose entre sí (deadlock).
+        Devuelve None si se reservó todo, o el código que no tenía stock suficiente.
+        '''
+        with self.sesion() as connection:
+            try:
+                with self.cursor(connection) as cursor:
+                    for codigo, cantidad in lineas:
+                        cursor.execute(self.sql('UPDATE producto SET cantidad = cantidad - %s WHERE codigo = %s AND cantidad >= %s'),
+                                       (cantidad, codigo, cantidad))
+                        if cursor.rowcount == 0:
+                            connection.rollback()
+                            return codigo
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+        return None
+
+    def liberar_lineas(self, lineas):
+        '''Devolver al stock todas las líneas de un pedido en una transacción (mismo orden que reservar_lineas)'''
+        with self.sesion() as connection:
+            try:
+                with self.cursor(connection) as cursor:
+                    for codigo, cantidad in lineas:
+                        cursor.execute(self.sql('UPDATE producto SET cantidad = cantidad + %s WHERE codigo = %s'), (cantidad, codigo))
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+
+    def upsert_filas(self, cursor, tabla, columnas, filas):
+        '''Insertar (o actualizar si el código ya existe) varias filas con una sola sentencia'''
+        cursor.execute(self.sentencia_upsert(tabla, columnas, len(filas)), [valor for fila in filas for valor in fila])
+
+
+class BackendMySQL(BackendSQL):
+    MIGRACIONES = MIGRACIONES_MYSQL
+
+    def __init__(self):
+        self.host = config ('Db_Host')
+        self.database = config ('Db_Name')
+        self.user = config ('Db_User')
+        self.password = config ('Db_Password')
+        self.port = config ('Db_port')
+        self.pool = PoolConexiones(
+            self.crear_conexion,
+            tamaño= config('Db_pool_size', default=5, cast=int),
+            timeout= config('Db_pool_timeout', default=10.0, cast=float),
+            intervalo_verificacion= config('Db_pool_ping_interval', default=30.0, cast=float)
+        )
+        self.concurrencia = self.pool.tamaño
+
+    def crear_conexion(self):
+        '''Abrir una conexión nueva con la base de datos. Lanza mysql.connector.Error si no es posible'''
+        import mysql.connector
+        from mysql.connector.constants import ClientFlag
+        return mysql.connector.connect(
+            host= self.host,
+            database= self.database,
+            user= self.user,
+            password= self.password,
+            port= self.port,
+            # rowcount informa las filas encontradas (no solo las modificadas) en los UPDATE
+            client_flags= [ClientFlag.FOUND_ROWS]
+        )
+
+    @contextmanager
+    def sesion(self, timeout=None):
+        with self.pool.conexion(timeout) as connection:
+            yield connection
+
+    def abrir_cursor(self, connection, sin_buffer=False):
+        return connection.cursor(dictionary=True, buffered=not sin_buffer)
+
+    def descartar_resultados(self, connection):
+        connection.consume_results()
+
+    def sentencia_upsert(self, tabla, columnas, cantidad_filas):
+        marcadores = '(' + self.lista_marcadores(len(columnas)) + ')'
+        actualizar = ', '.join(f'{columna} = VALUES({columna})' for columna in columnas if columna != 'codigo')
+        return f'''
+        INSERT INTO {tabla} ({', '.join(columnas)})
+        VALUES {', '.join([marcadores] * cantidad_filas)}
+        ON DUPLICATE KEY UPDATE {actualizar}
+        '''
+
+    def crear_staging(self, cursor):
+        # Las tablas temporales son propias de cada conexión y no provocan un commit implícito
+        cursor.execute('CREATE TEMPORARY TABLE IF NOT EXISTS ajuste_staging (codigo BIGINT PRIMARY KEY, valor DOUBLE NOT NULL)')
+
+    def sentencia_actualizar_desde_staging(self, columna, expresion, condicion):
+        return f'''
+        UPDATE producto p JOIN ajuste_staging s ON s.codigo = p.codigo
+        SET p.{columna} = {expresion}
+        WHERE {condicion}
+        '''
+
+    def expresion_huella(self):
+        # Mismo texto que huella_producto: el precio con 2 decimales y la fecha como AAAA-MM-DD, aunque las
+        # columnas sean FLOAT o DATETIME (tablas creadas a mano). mysql.connector solo reemplaza los %s,
+        # así que el formato de DATE_FORMAT no se confunde con un marcador.
+        # CONVERT asegura que el CRC32 se calcule sobre los bytes UTF-8, sea cual sea el charset de la tabla
+        return '''CRC32(CONVERT(CONCAT_WS('|', p.codigo, p.tipo, LOWER(p.nombre), CAST(p.precio AS DECIMAL(14, 2)), p.cantidad,
+                  IFNULL(pe.añosGarantia, ''), IFNULL(DATE_FORMAT(pa.fechaVencimiento, '%Y-%m-%d'), '')) USING utf8mb4))'''
+
+    def expresion_division_entera(self, dividendo, divisor):
+        return f'{dividendo} DIV {divisor}'
+
+    def cerrar(self):
+        self.pool.cerrar()
+
+
+# Backend embebido
+# Para pruebas y para locales con una sola terminal no hace falta un servidor MySQL:
+# una única conexión de larga vida a un archivo SQLite en modo WAL (lecturas sin bloquear escrituras).
+# sqlite3 reutiliza las sentencias ya preparadas mientras el texto SQL sea el mismo (cached_statements).
+
+class BackendSQLite(BackendSQL):
+    marcador = '?'
+
+    MIGRACIONES = MIGRACIONES_SQLITE
+
+    def __init__(self, ruta=None):
+        self.ruta = ruta or config('Db_sqlite_path', default='productos.db')
+        self.__connection = None    # se abre en el primer uso
+        self.__lock = threading.RLock()
+
+    @property
+    def connection(self):
+        if self.__connection is None:
+            with self.__lock:
+                if self.__connection is None:
+                    self.__connection = self.__abrir()
+        return self.__connection
+
+    def __abrir(self):
+        import sqlite3
+        # check_same_thread=False: la conexión se comparte entre hilos, protegida por el lock
+        # timeout: cuánto espera una escritura si otro proceso tiene la base bloqueada
+        connection = sqlite3.connect(self.ruta, timeout=config('Db_sqlite_timeout', default=30.0, cast=float),
+                                     check_same_thread=False, cached_statements=256)
+        connection.row_factory = lambda cursor, fila: {columna[0]: valor for columna, valor in zip(cursor.description, fila)}
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute('PRAGMA foreign_keys=ON')   # necesario para ON DELETE CASCADE
+        # SQLite no tiene CRC32: la huella se calcula con la misma función de Python
+        connection.create_function('huella_producto', 7, huella_producto, deterministic=True)
+        return connection
+
+    @contextmanager
+    def sesion(self, timeout=None):
+        if not self.__lock.acquire(timeout=-1 if timeout is None else timeout):
+            raise TimeoutError(f'No se obtuvo la conexión SQLite en {timeout} segundos')
+        try:
+            yield self.connection
+        except BaseException:
+            self.connection.rollback()
+            raise
+        finally:
+            self.__lock.release()
+
+    def abrir_cursor(self, connection, sin_buffer=False):
+        return connection.cursor()     # los cursores de sqlite3 ya leen las filas a medida que se piden
+
+    def sentencia_upsert(self, tabla, columnas, cantidad_filas):
+        marcadores = '(' + self.lista_marcadores(len(columnas)) + ')'
+        actualizar = ', '.join(f'{columna} = excluded.{columna}' for columna in columnas if columna != 'codigo')
+        return f'''
+        INSERT INTO {tabla} ({', '.join(columnas)})
+        VALUES {', '.join([marcadores] * cantidad_filas)}
+        ON CONFLICT (codigo) DO UPDATE SET {actualizar}
+        '''
+
+    def crear_staging(self, cursor):
+        cursor.execute('CREATE TEMP TABLE IF NOT EXISTS ajuste_staging (codigo INTEGER PRIMARY KEY, valor REAL NOT NULL)')
+
+    def sentencia_actualizar_desde_staging(self, columna, expresion, condicion):
+        # UPDATE ... FROM está disponible desde SQLite 3.33
+        return f'''
+        UPDATE producto AS p SET {columna} = {expresion}
+        FROM ajuste_staging AS s
+        WHERE s.codigo = p.codigo AND {condicion}
+        '''
+
+    def expresion_huella(self):
+        return 'huella_producto(p.codigo, p.tipo, p.nombre, p.precio, p.cantidad, pe.añosGarantia, pa.fechaVencimiento)'
+
+    def expresion_division_entera(self, dividendo, divisor):
+        return f'{dividendo} / {divisor}'     # entre enteros, / ya es división entera
+
+    def cerrar(self):
+        with self.__lock:
+            if self.__connection is not None:
+                self.__connection.close()
+                self.__connection = None
+
+
+BACKENDS = {
+    'mysql': BackendMySQL,
+    'sqlite': BackendSQLite
+}
+
+
+def crear_backend(nombre=None):
+    '''Crear el backend indicado (o el de la opción Db_backend)'''
+    nombre = (nombre or config('Db_backend', default='mysql')).lower()
+    if nombre not in BACKENDS:
+        raise ValueError(f'Backend desconocido: {nombre}. Opciones: {", ".join(BACKENDS)}')
+    return BACKENDS[nombre]()
@@ -0,0 +1,86 @@
+# Benchmark de arranque en frío
+# Cada medición corre en un proceso nuevo (como una invocación corta de main.py o un proceso
+# trabajador) y mide, dentro del proceso, cuánto tarda cada escenario desde cero:
+#   interprete:         python sin importar nada (referencia)
+#   modelo:             importar Laboratorio_1 para usar solo las clases del modelo
+#   main:               importar main.py
+#   gestion:            crear un GestionProducto (sin usar la base de datos)
+#   primera_operacion:  crear un GestionProducto y hacer la primera búsqueda por código
+# También informa qué módulos pesados quedaron cargados (mysql.connector, decouple, sqlite3).
+# Por defecto la primera operación usa una base SQLite temporal; con --backend mysql usa la configuración Db_*.
+#
+# Uso: python benchmark_arranque.py [--repeticiones 15] [--backend sqlite] [--salida arranque.json]
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ESCENARIOS = {
+    'interprete': 'pass',
+    'modelo': 'from Laboratorio_1 import ProductoElectronico, ProductoAlimenticio',
+    'main': 'import main',
+    'gestion': 'import Laboratorio_1; Laboratorio_1.GestionProducto()',
+    'primera_operacion': 'import Laboratorio_1; Laboratorio_1.GestionProducto().buscar_producto(11111111)',
+}
+
+MODULOS_PESADOS = ('mysql.connector', 'decouple', 'sqlite3')
+
+# Código que corre en el proceso hijo: mide el escenario y devuelve el resultado como JSON
+PROCESO_HIJO = '''
+import contextlib, io, json, sys, time
+inicio = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    exec(sys.argv[1])
+segundos = time.perf_counter() - inicio
+print(json.dumps({'segundos': segundos, 'modulos': [m for m in sys.argv[2:] if m in sys.modules]}))
+'''
+
+
+def medir(codigo, repeticiones, entorno):
+    tiempos = []
+    modulos = []
+    for _ in range(repeticiones):
+        salida = subprocess.run(
+            [sys.executable, '-c', PROCESO_HIJO, codigo, *MODULOS_PESADOS],
+            capture_output=True, text=True, env=entorno, cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        )
+        resultado = json.loads(salida.stdout.strip().splitlines()[-1])
+        tiempos.append(resultado['segundos'])
+        modulos = resultado['modulos']
+    return {
+        'mediana_ms': round(statistics.median(tiempos) * 1000, 2),
+        'minimo_ms': round(min(tiempos) * 1000, 2),
+        'modulos': modulos
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de arranque en frío (importación y primera operación)')
+    parser.add_argument('--repeticiones', type=int, default=15, help='procesos nuevos por escenario')
+    parser.add_argument('--backend', default='sqlite', help='sqlite (base temporal) o mysql')
+    parser.add_argument('--salida', help='guardar los resultados en un archivo JSON')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        entorno = dict(os.environ, Db_backend=args.backend)
+        if args.backend == 'sqlite':
+            entorno['Db_sqlite_path'] = os.path.join(directorio, 'arranque.db')
+
+        resultados = {}
+        print(f"{'Escenario':<20} {'mediana':>10} {'mínimo':>10}  módulos cargados")
+        for nombre, codigo in ESCENARIOS.items():
+            resultados[nombre] = medir(codigo, args.repeticiones, entorno)
+            print(f"{nombre:<20} {resultados[nombre]['mediana_ms']:>8.2f}ms {resultados[nombre]['minimo_ms']:>8.2f}ms"
+                  f"  {', '.join(resultados[nombre]['modulos']) or '-'}")
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as file:
+            json.dump(resultados, file, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# Benchmark de memoria y velocidad del modelo de productos
+# Compara las clases actuales (con __slots__) contra la versión anterior, que guardaba
+# los atributos en un __dict__ por objeto, y el constructor validado contra desde_fila.
+#
+# Uso: python benchmark_modelo.py [--cantidad 1000000]
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+from Laboratorio_1 import Producto, ProductoElectronico, ProductoAlimenticio
+
+
+# Copia de referencia de las clases anteriores (atributos en __dict__ y validación en cada construcción)
+
+class ProductoConDict:
+    def __init__(self, codigo, tipo, nombre, precio, cantidad):
+        self.__codigo = Producto.validar_codigo(self, codigo)
+        self.__tipo = tipo
+        self.__nombre = nombre
+        self.__precio = Producto.validar_precio(self, precio)
+        self.__cantidad = Producto.validar_cantidad(self, cantidad)
+
+
+class ProductoElectronicoConDict(ProductoConDict):
+    def __init__(self, codigo, tipo, nombre, precio, cantidad, añosGarantia):
+        super().__init__(codigo, tipo, nombre, precio, cantidad)
+        self.__añosGarantia = ProductoElectronico.validar_añosGarantia(self, añosGarantia)
+
+
+class ProductoAlimenticioConDict(ProductoConDict):
+    def __init__(self, codigo, tipo, nombre, precio, cantidad, fechaVencimiento):
+        super().__init__(codigo, tipo, nombre, precio, cantidad)
+        self.__fechaVencimiento = ProductoAlimenticio.validar_fecha_vencimiento(self, fechaVencimiento)
+
+
+def generar_filas(cantidad):
+    '''Filas sintéticas mitad electrónicas, mitad alimenticias'''
+    filas = []
+    for i in range(cantidad):
+        codigo = 10000000 + i
+        if i % 2:
+            filas.append((ProductoElectronico, ProductoElectronicoConDict,
+                          (codigo, 'electronico', f'producto{i}', 100.0 + i % 997, i % 50, 1 + i % 3)))
+        else:
+            filas.append((ProductoAlimenticio, ProductoAlimenticioConDict,
+                          (codigo, 'alimenticio', f'producto{i}', 10.0 + i % 89, i % 200, '2030-01-01')))
+    return filas
+
+
+def medir(nombre, construir, filas):
+    '''Construir todos los objetos midiendo tiempo y, en una segunda pasada, la memoria retenida'''
+    # tracemalloc hace mucho más lenta la construcción, por eso el tiempo se mide sin él
+    gc.collect()
+    inicio = time.perf_counter()
+    objetos = [construir(fila) for fila in filas]
+    duracion = time.perf_counter() - inicio
+    del objetos
+
+    gc.collect()
+    tracemalloc.start()
+    objetos = [construir(fila) for fila in filas]
+    memoria, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    cantidad = len(objetos)
+    del objetos
+    print(f'{nombre:<40} {duracion:8.2f} s  {cantidad / duracion:12,.0f} obj/s  {memoria / 2**20:9.1f} MiB  {memoria / cantidad:7.0f} B/obj')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del modelo de productos')
+    parser.add_argument('--cantidad', type=int, default=1_000_000, help='cantidad de productos a construir')
+    args = parser.parse_args()
+
+    filas = generar_filas(args.cantidad)
+    print(f'Construyendo {args.cantidad:,} productos')
+    print()
+    medir('Clases anteriores (__dict__, validando)', lambda f: f[1](*f[2]), filas)
+    medir('Clases con __slots__ (validando)', lambda f: f[0](*f[2]), filas)
+    medir('Clases con __slots__ (desde_fila)', lambda f: f[0].desde_fila(*f[2]), filas)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+# Suite de benchmarks de las operaciones de GestionProducto
+# Genera catálogos sintéticos (mitad electrónicos, mitad alimenticios) de distintos tamaños y mide,
+# contra una base SQLite local en un directorio temporal (no necesita servidor), las operaciones:
+#   crear_producto, buscar_producto, actualizar_precio, eliminar_producto   (una llamada por código)
+#   leer_todos_los_productos, guardar_datos, leer_datos                      (catálogo completo)
+#   construccion y to_dict                                                  (modelo, sin base)
+# Para cada una informa operaciones por segundo, latencias p50/p99 y el pico de memoria.
+# El pico se mide en una segunda pasada con tracemalloc, que hace todo más lento.
+# Los resultados se guardan en JSON y dos corridas se comparan con --comparar.
+#
+# Uso: python benchmark_suite.py [--tamaños 10000,100000,1000000] [--operaciones 2000] [--salida resultados.json]
+#      python benchmark_suite.py --comparar anterior.json nuevo.json [--umbral 10]
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+from Laboratorio_1 import GestionProducto, ProductoElectronico, ProductoAlimenticio, producto_desde_dict
+from backends import BackendSQLite
+
+VERSION_RESULTADOS = 1
+
+
+# Datos sintéticos
+
+def generar_catalogo(cantidad, semilla=1, primer_codigo=10000000):
+    '''Diccionarios con las claves de to_dict, reproducibles para la misma semilla'''
+    azar = random.Random(semilla)
+    vencimiento = date.today() + timedelta(days=365)
+    catalogo = []
+    for i in range(cantidad):
+        codigo = primer_codigo + i
+        if azar.random() < 0.5:
+            catalogo.append({'codigo': codigo, 'tipo': 'electronico', 'nombre': f'electronico {i}',
+                             'precio': round(azar.uniform(1000, 500000), 2), 'cantidad': azar.randint(0, 500),
+                             'añosGarantia': azar.randint(1, 5)})
+        else:
+            catalogo.append({'codigo': codigo, 'tipo': 'alimenticio', 'nombre': f'alimento {i}',
+                             'precio': round(azar.uniform(100, 20000), 2), 'cantidad': azar.randint(0, 5000),
+                             'fechaVencimiento': (vencimiento + timedelta(days=azar.randint(0, 700))).isoformat()})
+    return catalogo
+
+
+# Mediciones
+
+def percentil(ordenados, p):
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def resumir(latencias, cantidad, memoria):
+    '''latencias: segundos de cada llamada; cantidad: elementos procesados en total'''
+    ordenados = sorted(latencias)
+    total = sum(latencias)
+    return {
+        'operaciones': cantidad,
+        'segundos': round(total, 4),
+        'por_segundo': round(cantidad / total, 1) if total else None,
+        'p50_us': round(percentil(ordenados, 0.50) * 1e6, 1),
+        'p99_us': round(percentil(ordenados, 0.99) * 1e6, 1),
+        'memoria_pico_kib': round(memoria / 1024, 1)
+    }
+
+
+def pico_de_memoria(funcion):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        funcion()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def medir_llamadas(operacion, argumentos, argumentos_memoria):
+    '''Una llamada por argumento, midiendo cada una; la memoria se mide con otros argumentos'''
+    latencias = []
+    for argumento in argumentos:
+        inicio = time.perf_counter()
+        operacion(argumento)
+        latencias.append(time.perf_counter() - inicio)
+    memoria = pico_de_memoria(lambda: [operacion(argumento) for argumento in argumentos_memoria])
+    return resumir(latencias, len(argumentos), memoria)
+
+
+def medir_una_vez(funcion, cantidad, repeticiones=3, preparar=None):
+    '''
+    Operaciones sobre el catálogo completo: se repiten unas pocas veces (cantidad: elementos por vez).
+    preparar: función que se llama (sin medirla) antes de cada vez, para que todas hagan el mismo trabajo
+    '''
+    latencias = []
+    for _ in range(repeticiones):
+        if preparar:
+            preparar()
+        gc.collect()
+        inicio = time.perf_counter()
+        funcion()
+        latencias.append(time.perf_counter() - inicio)
+    if preparar:
+        preparar()
+    memoria = pico_de_memoria(funcion)
+    return resumir(latencias, cantidad * repeticiones, memoria)
+
+
+# Escenarios
+
+def construir(datos):
+    if 'añosGarantia' in datos:
+        return ProductoElectronico(datos['codigo'], datos['tipo'], datos['nombre'], datos['precio'], datos['cantidad'], datos['añosGarantia'])
+    return ProductoAlimenticio(datos['codigo'], datos['tipo'], datos['nombre'], datos['precio'], datos['cantidad'], datos['fechaVencimiento'])
+
+
+def medir_tamaño(tamaño, operaciones, directorio, semilla):
+    catalogo = generar_catalogo(tamaño, semilla)
+    azar = random.Random(semilla)
+    resultados = {}
+
+    # Modelo (sin base de datos)
+    resultados['construccion'] = medir_una_vez(lambda: [construir(datos) for datos in catalogo], tamaño, 1)
+    productos = [construir(datos) for datos in catalogo]
+    resultados['to_dict'] = medir_una_vez(lambda: [producto.to_dict() for producto in productos], tamaño, 1)
+    del productos
+
+    gestion = GestionProducto(BackendSQLite(os.path.join(directorio, f'bench_{tamaño}.db')))
+    # Los métodos imprimen un mensaje por operación: no se mide la consola
+    with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+        gestion.crear_productos(catalogo)
+        gestion.cache.limpiar()
+
+        # Códigos nuevos para las altas; los existentes se toman al azar sin repetir para que el cache no ayude
+        nuevos = [producto_desde_dict(datos) for datos in generar_catalogo(operaciones * 2, semilla + 1, primer_codigo=90000000)]
+        existentes = azar.sample([datos['codigo'] for datos in catalogo], min(tamaño, operaciones * 2))
+        mitad = len(existentes) // 2
+        tiempos, memoria = existentes[:mitad], existentes[mitad:mitad + max(1, mitad // 10)]
+
+        resultados['crear_producto'] = medir_llamadas(gestion.crear_producto, nuevos[:operaciones], nuevos[operaciones:operaciones + operaciones // 10])
+        resultados['buscar_producto'] = medir_llamadas(gestion.buscar_producto, tiempos, memoria)
+        resultados['actualizar_precio'] = medir_llamadas(lambda codigo: gestion.actualizar_precio(codigo, 123.45), tiempos, memoria)
+        resultados['eliminar_producto'] = medir_llamadas(gestion.eliminar_producto, tiempos, memoria)
+
+        restantes = tamaño + operaciones + operaciones // 10 - len(tiempos) - len(memoria)
+        resultados['leer_todos_los_productos'] = medir_una_vez(gestion.leer_todos_los_productos, restantes)
+
+        datos = {str(producto['codigo']): producto for producto in catalogo}
+        archivos = iter(range(1000))
+
+        def almacen_vacio():
+            # El almacén se crea antes de medir: guardar_datos mide solo la escritura
+            if gestion.almacen is not None:
+                gestion.almacen.cerrar()
+                gestion.almacen = None
+            gestion.archivo = os.path.join(directorio, f'bench_{tamaño}_{next(archivos)}.json')
+            gestion.obtener_almacen()
+
+        def almacen_en_disco():
+            # Compactar y reabrir: si no, leer_datos copiaría los cambios que el almacén tiene en memoria
+            gestion.almacen.compactar()
+            gestion.almacen.cerrar()
+            gestion.almacen = None
+            gestion.obtener_almacen()
+
+        def cambiar_un_porciento():
+            # Solo se escriben en el journal los productos que cambiaron
+            for producto in azar.sample(catalogo, max(1, tamaño // 100)):
+                datos[str(producto['codigo'])] = dict(producto, precio=round(azar.uniform(100, 500000), 2))
+
+        resultados['guardar_datos'] = medir_una_vez(lambda: gestion.guardar_datos(datos), tamaño, 1, almacen_vacio)
+        resultados['guardar_datos_1pct'] = medir_una_vez(lambda: gestion.guardar_datos(datos), max(1, tamaño // 100), 3, cambiar_un_porciento)
+        resultados['leer_datos'] = medir_una_vez(gestion.leer_datos, tamaño, 3, almacen_en_disco)
+    gestion.cerrar()
+    return resultados
+
+
+# Reporte y comparación
+
+def imprimir(tamaño, resultados):
+    print()
+    print(f'Catálogo de {tamaño:,} productos')
+    print(f"{'operación':<26} {'op/s':>14} {'p50 µs':>12} {'p99 µs':>12} {'pico KiB':>12}")
+    for nombre, medida in resultados.items():
+        print(f"{nombre:<26} {medida['por_segundo'] or 0:>14,.1f} {medida['p50_us']:>12,.1f} {medida['p99_us']:>12,.1f} {medida['memoria_pico_kib']:>12,.1f}")
+
+
+def comparar(anterior, nuevo, umbral):
+    '''Comparar dos archivos de resultados. Devuelve la cantidad de regresiones mayores al umbral (%)'''
+    with open(anterior, encoding='utf-8') as file:
+        base = json.load(file)
+    with open(nuevo, encoding='utf-8') as file:
+        actual = json.load(file)
+
+    regresiones = 0
+    print(f"{'tamaño':>10} {'operación':<26} {'op/s':>10} {'p99':>10} {'memoria':>10}")
+    for tamaño, operaciones in actual['resultados'].items():
+        for nombre, medida in operaciones.items():
+            referencia = base['resultados'].get(tamaño, {}).get(nombre)
+            if not referencia:
+                continue
+            # Cambio en %: positivo es mejor para op/s y peor para latencia y memoria
+            cambios = {
+                'op/s': variacion(referencia['por_segundo'], medida['por_segundo']),
+                'p99': 0.0 - variacion(referencia['p99_us'], medida['p99_us']),
+                'memoria': 0.0 - variacion(referencia['memoria_pico_kib'], medida['memoria_pico_kib'])
+            }
+            peor = min(cambios.values())
+            marca = '  <-- regresión' if peor < -umbral else ''
+            regresiones += bool(marca)
+            print(f"{tamaño:>10} {nombre:<26} {cambios['op/s']:>+9.1f}% {cambios['p99']:>+9.1f}% {cambios['memoria']:>+9.1f}%{marca}")
+    print()
+    print(f'{regresiones} regresiones de más del {umbral}%')
+    return regresiones
+
+
+def variacion(anterior, nuevo):
+    if not anterior or nuevo is None:
+        return 0.0
+    return (nuevo - anterior) / anterior * 100
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks de GestionProducto con catálogos sintéticos')
+    parser.add_argument('--tamaños', default='10000,100000,1000000', help='tamaños de catálogo separados por coma')
+    parser.add_argument('--operaciones', type=int, default=2000, help='llamadas medidas por operación individual')
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--salida', help='guardar los resultados en un archivo JSON')
+    parser.add_argument('--comparar', nargs=2, metavar=('ANTERIOR', 'NUEVO'), help='comparar dos archivos de resultados')
+    parser.add_argument('--umbral', type=float, default=10.0, help='%% de empeoramiento que se informa como regresión')
+    args = parser.parse_args()
+
+    if args.comparar:
+        sys.exit(1 if comparar(*args.comparar, args.umbral) else 0)
+
+    resultados = {
+        'version': VERSION_RESULTADOS,
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'parametros': {'operaciones': args.operaciones, 'semilla': args.semilla},
+        'resultados': {}
+    }
+    with tempfile.TemporaryDirectory() as directorio:
+        for tamaño in (int(valor) for valor in args.tamaños.split(',')):
+            resultados['resultados'][str(tamaño)] = medir_tamaño(tamaño, args.operaciones, directorio, args.semilla)
+            imprimir(tamaño, resultados['resultados'][str(tamaño)])
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as file:
+            json.dump(resultados, file, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+# Escritura diferida (write-behind) de precios y stock
+# En las horas pico llegan ráfagas de cambios chicos sobre los mismos productos y cada uno pagaba
+# su propio commit. Este buffer junta los cambios en memoria por código (para el precio gana el
+# último valor, las diferencias de stock se suman) y un hilo en segundo plano los escribe en lote
+# con GestionProducto.actualizar_precios / ajustar_stock cuando se juntan suficientes o pasa un tiempo.
+# Los cambios pendientes todavía no se ven en buscar_producto hasta que se vacía el buffer.
+# El buffer se registra en GestionProducto: gestion.cerrar() lo vacía y lo cierra antes de cerrar el pool,
+# así que con "with GestionProducto() as gestion: BufferEscrituras(gestion)" no se pierden cambios.
+
+import atexit
+import threading
+import time
+from collections import deque
+
+from backends import config
+
+
+class BufferEscrituras:
+    def __init__(self, gestion, max_pendientes=None, intervalo=None, registrar_salida=True):
+        '''
+        gestion: GestionProducto sobre el que se escriben los cambios
+        max_pendientes: cantidad de códigos pendientes que dispara un vaciado inmediato
+        intervalo: segundos máximos que un cambio espera en el buffer
+        registrar_salida: vaciar automáticamente al terminar el programa (atexit)
+        Siempre se vacía y se cierra también con gestion.cerrar()
+        '''
+        self.gestion = gestion
+        self.max_pendientes = max_pendientes or config('WriteBehind_max_pending', default=1000, cast=int)
+        self.intervalo = intervalo or config('WriteBehind_interval', default=0.5, cast=float)
+
+        self.__precios = {}         # codigo -> último precio
+        self.__stock = {}           # codigo -> suma de diferencias
+        self.__lock = threading.Lock()
+        self.__vaciando = threading.Lock()  # un solo vaciado a la vez
+        self.__hay_trabajo = threading.Event()
+        self.__cerrado = False
+
+        self.operaciones = 0
+        self.vaciados = 0
+        self.filas_escritas = 0
+        self.errores = 0
+        self.rechazados = 0         # cambios que no cumplían las validaciones (por ejemplo stock negativo)
+        self.no_encontrados = 0     # cambios sobre códigos que no existen
+        self.__latencias = deque(maxlen=1000)   # segundos de los últimos vaciados
+        self.__tamaños = deque(maxlen=1000)     # filas de los últimos vaciados
+
+        self.__hilo = threading.Thread(target=self.__trabajar, name='escritura-diferida', daemon=True)
+        self.__hilo.start()
+        self.__registrado = registrar_salida
+        if registrar_salida:
+            atexit.register(self.cerrar)
+        gestion.registrar_al_cerrar(self.cerrar)
+
+    # Cambios
+
+    def actualizar_precio(self, codigo, nuevo_precio):
+        nuevo_precio = float(nuevo_precio)
+        if nuevo_precio < 0:
+            raise ValueError('El precio debe ser un numero positivo')
+        self.__agregar(self.__precios, int(codigo), nuevo_precio, sumar=False)
+
+    def ajustar_stock(self, codigo, diferencia):
+        self.__agregar(self.__stock, int(codigo), int(diferencia), sumar=True)
+
+    def __agregar(self, pendientes, codigo, valor, sumar):
+        with self.__lock:
+            if self.__cerrado:
+                raise RuntimeError('El buffer de escrituras está cerrado')
+            pendientes[codigo] = pendientes.get(codigo, 0) + valor if sumar else valor
+            self.operaciones += 1
+            lleno = len(self.__precios) + len(self.__stock) >= self.max_pendientes
+        if lleno:
+            self.__hay_trabajo.set()
+
+    def pendientes(self):
+        with self.__lock:
+            return len(self.__precios) + len(self.__stock)
+
+    # Vaciado
+
+    def __trabajar(self):
+        while True:
+            self.__hay_trabajo.wait(self.intervalo)
+            self.__hay_trabajo.clear()
+            if self.__cerrado:
+                return
+            self.flush()
+
+    def flush(self):
+        '''
+        Escribir ahora todos los cambios pendientes, de a un lote (una transacción) por vez.
+        Si un lote falla, vuelven al buffer solo ese lote y los siguientes: los anteriores ya quedaron confirmados
+        '''
+        with self.__vaciando:
+            with self.__lock:
+                precios, self.__precios = self.__precios, {}
+                stock, self.__stock = self.__stock, {}
+            if not precios and not stock:
+                return
+
+            inicio = time.perf_counter()
+            tamaño = self.gestion.tamaño_lote
+            lotes = [(False, dict(list(precios.items())[i:i + tamaño])) for i in range(0, len(precios), tamaño)]
+            lotes += [(True, dict(list(stock.items())[i:i + tamaño])) for i in range(0, len(stock), tamaño)]
+            escritas = 0
+            for numero, (es_stock, lote) in enumerate(lotes):
+                operacion = self.gestion.ajustar_stock if es_stock else self.gestion.actualizar_precios
+                try:
+                    resumen = operacion(lote, len(lote))
+                except Exception as error:
+                    self.errores += 1
+                    self.__devolver(lotes[numero:])
+                    print(f'Error al vaciar el buffer de escrituras: {error}')
+                    break
+                escritas += resumen['actualizados']
+                self.__registrar_descartes(resumen, 'stock' if es_stock else 'precio')
+
+            self.__latencias.append(time.perf_counter() - inicio)
+            self.__tamaños.append(escritas)
+            self.vaciados += 1
+            self.filas_escritas += escritas
+
+    def __devolver(self, lotes):
+        '''Devolver lotes no confirmados al buffer, sin pisar los precios que hayan llegado mientras tanto'''
+        with self.__lock:
+            for es_stock, lote in lotes:
+                for codigo, valor in lote.items():
+                    if es_stock:
+                        self.__stock[codigo] = self.__stock.get(codigo, 0) + valor
+                    else:
+                        self.__precios.setdefault(codigo, valor)
+
+    def __registrar_descartes(self, resumen, que):
+        # Los cambios que la base no aplicó (stock o precio negativo, código inexistente) no se reintentan,
+        # pero se cuentan y se avisan para que ninguno desaparezca sin rastro
+        rechazados, no_encontrados = resumen['rechazados'], resumen['no_encontrados'] + len(resumen['invalidos'])
+        self.rechazados += rechazados
+        self.no_encontrados += no_encontrados
+        if rechazados or no_encontrados:
+            print(f'Buffer de escrituras: {rechazados} cambios de {que} rechazados y {no_encontrados} códigos no encontrados')
+
+    def cerrar(self):
+        '''Vaciar lo pendiente y detener el hilo. Se llama sola con gestion.cerrar() y al salir si registrar_salida es True'''
+        with self.__lock:
+            if self.__cerrado:
+                return
+            self.__cerrado = True
+        self.__hay_trabajo.set()
+        self.__hilo.join()
+        self.flush()
+        if self.__registrado:
+            atexit.unregister(self.cerrar)
+        self.gestion.desregistrar_al_cerrar(self.cerrar)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    # Métricas
+
+    def estadisticas(self):
+        latencias = sorted(self.__latencias)
+        tamaños = list(self.__tamaños)
+        return {
+            'operaciones': self.operaciones,
+            'vaciados': self.vaciados,
+            'filas_escritas': self.filas_escritas,
+            'pendientes': self.pendientes(),
+            'errores': self.errores,
+            'rechazados': self.rechazados,
+            'no_encontrados': self.no_encontrados,
+            'operaciones_por_vaciado': self.operaciones / self.vaciados if self.vaciados else 0.0,
+            'lote_promedio': sum(tamaños) / len(tamaños) if tamaños else 0.0,
+            'lote_maximo': max(tamaños, default=0),
+            'latencia_promedio_ms': 1000 * sum(latencias) / len(latencias) if latencias else 0.0,
+            'latencia_p99_ms': 1000 * latencias[int(0.99 * (len(latencias) - 1))] if latencias else 0.0,
+            'latencia_maxima_ms': 1000 * latencias[-1] if latencias else 0.0
+        }
@@ -0,0 +1,155 @@
+# Esquema versionado de la base de datos
+# Cada versión es una lista de pasos: sentencias SQL o funciones que reciben el cursor (para los
+# cambios que dependen de lo que ya existe en la base). La tabla esquema_version guarda las
+# versiones aplicadas y BackendSQL.migrar() aplica las que falten, en orden.
+#   1: tablas producto, productoelectronico y productoalimenticio con sus claves primarias
+#   2: claves foráneas con ON DELETE CASCADE e índices sobre tipo, nombre y fechaVencimiento
+#      (en MySQL borra las filas de los subtipos que no tienen producto y reemplaza las claves foráneas)
+# Producto.sql tiene el mismo esquema (última versión) para crearlo a mano en MySQL.
+# Al iniciar, GestionProducto solo verifica la versión (y crea el esquema en una base vacía): una base
+# desactualizada se migra a pedido con este script o con la opción Db_auto_migrate=True.
+#
+# Uso: python esquema.py [--aplicar] [--backend mysql|sqlite]
+
+TABLAS_SUBTIPO = ('productoelectronico', 'productoalimenticio')
+
+INDICES = (
+    ('producto', 'idx_producto_tipo', 'tipo'),
+    ('producto', 'idx_producto_nombre', 'nombre'),
+    ('productoalimenticio', 'idx_productoalimenticio_vencimiento', 'fechaVencimiento'),
+)
+
+
+# MySQL
+
+def _existe_indice(cursor, tabla, indice):
+    cursor.execute('''
+    SELECT COUNT(*) AS cantidad FROM information_schema.STATISTICS
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+    ''', (tabla, indice))
+    return cursor.fetchone()['cantidad'] > 0
+
+
+def asegurar_claves_primarias(cursor):
+    '''Las tablas creadas a mano antes de este esquema pueden no tener clave primaria en codigo'''
+    for tabla in ('producto',) + TABLAS_SUBTIPO:
+        if not _existe_indice(cursor, tabla, 'PRIMARY'):
+            cursor.execute(f'ALTER TABLE {tabla} ADD PRIMARY KEY (codigo)')
+
+
+def asegurar_borrado_en_cascada(cursor):
+    '''Reemplazar las claves foráneas de los subtipos por unas con ON DELETE CASCADE'''
+    for tabla in TABLAS_SUBTIPO:
+        cursor.execute('''
+        SELECT CONSTRAINT_NAME AS nombre, DELETE_RULE AS regla FROM information_schema.REFERENTIAL_CONSTRAINTS
+        WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = %s AND REFERENCED_TABLE_NAME = 'producto'
+        ''', (tabla,))
+        claves = cursor.fetchall()
+        if any(clave['regla'] == 'CASCADE' for clave in claves):
+            continue
+        for clave in claves:
+            cursor.execute(f"ALTER TABLE {tabla} DROP FOREIGN KEY `{clave['nombre']}`")
+        # Las filas huérfanas impedirían crear la clave foránea
+        cursor.execute(f'DELETE s FROM {tabla} s LEFT JOIN producto p ON p.codigo = s.codigo WHERE p.codigo IS NULL')
+        cursor.execute(f'''
+        ALTER TABLE {tabla} ADD CONSTRAINT fk_{tabla}_producto
+        FOREIGN KEY (codigo) REFERENCES producto (codigo) ON DELETE CASCADE
+        ''')
+
+
+def crear_indices(cursor):
+    # MySQL no tiene CREATE INDEX IF NOT EXISTS
+    for tabla, indice, columna in INDICES:
+        if not _existe_indice(cursor, tabla, indice):
+            cursor.execute(f'CREATE INDEX {indice} ON {tabla} ({columna})')
+
+
+MIGRACIONES_MYSQL = {
+    1: [
+        '''
+        CREATE TABLE IF NOT EXISTS producto (
+            codigo INT NOT NULL PRIMARY KEY,
+            tipo VARCHAR(20) NOT NULL,
+            nombre VARCHAR(100) NOT NULL,
+            precio DECIMAL(14, 2) NOT NULL CHECK (precio >= 0),
+            cantidad INT NOT NULL CHECK (cantidad >= 0)
+        ) ENGINE=InnoDB
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS productoelectronico (
+            codigo INT NOT NULL PRIMARY KEY,
+            añosGarantia INT NOT NULL,
+            CONSTRAINT fk_productoelectronico_producto
+                FOREIGN KEY (codigo) REFERENCES producto (codigo) ON DELETE CASCADE
+        ) ENGINE=InnoDB
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS productoalimenticio (
+            codigo INT NOT NULL PRIMARY KEY,
+            fechaVencimiento DATE NOT NULL,
+            CONSTRAINT fk_productoalimenticio_producto
+                FOREIGN KEY (codigo) REFERENCES producto (codigo) ON DELETE CASCADE
+        ) ENGINE=InnoDB
+        ''',
+        asegurar_claves_primarias,
+    ],
+    2: [
+        asegurar_borrado_en_cascada,
+        crear_indices,
+    ],
+}
+
+
+# SQLite
+
+MIGRACIONES_SQLITE = {
+    1: [
+        '''
+        CREATE TABLE IF NOT EXISTS producto (
+            codigo INTEGER PRIMARY KEY,
+            tipo TEXT NOT NULL,
+            nombre TEXT NOT NULL,
+            precio REAL NOT NULL CHECK (precio >= 0),
+            cantidad INTEGER NOT NULL CHECK (cantidad >= 0)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS productoelectronico (
+            codigo INTEGER PRIMARY KEY REFERENCES producto (codigo) ON DELETE CASCADE,
+            añosGarantia INTEGER NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS productoalimenticio (
+            codigo INTEGER PRIMARY KEY REFERENCES producto (codigo) ON DELETE CASCADE,
+            fechaVencimiento TEXT NOT NULL
+        )
+        ''',
+    ],
+    2: [f'CREATE INDEX IF NOT EXISTS {indice} ON {tabla} ({columna})' for tabla, indice, columna in INDICES],
+}
+
+
+def main():
+    import argparse
+    from backends import crear_backend
+
+    parser = argparse.ArgumentParser(description='Verificar o migrar el esquema de la base de datos')
+    parser.add_argument('--aplicar', action='store_true', help='aplicar las migraciones pendientes (sin esto solo verifica)')
+    parser.add_argument('--backend', help='mysql o sqlite (por defecto, Db_backend)')
+    args = parser.parse_args()
+
+    backend = crear_backend(args.backend)
+    try:
+        print(f'Esquema en la versión {backend.migrar(aplicar=args.aplicar)}')
+    except RuntimeError as error:
+        print(error)
+        return 1
+    finally:
+        backend.cerrar()
+    return 0
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(main())
@@ -0,0 +1,123 @@
+# Foto binaria de productos
+# Para arrancar un proceso con el cache caliente hay que guardar y volver a leer miles de productos.
+# Con JSON cada producto es un diccionario que se parsea campo por campo; acá cada atributo se guarda
+# como una columna de valores de tamaño fijo (módulo array) y los nombres como un único bloque UTF-8,
+# así que leer la foto son unas pocas lecturas en bloque y lo único que cuesta es construir los objetos.
+#
+# Formato (enteros little-endian):
+#   encabezado   'PRDF', versión (2 bytes), largo de los metadatos (4 bytes)
+#   metadatos    JSON: cantidad de productos, fecha de creación y tabla de tipos
+#   columnas     codigo, cantidad y extra (8 bytes c/u), precio (double), clase y tipo (1 byte c/u)
+#                extra es añosGarantia en los electrónicos y el ordinal de fechaVencimiento en los alimenticios
+#   nombres      separados por \0
+#   CRC32 de todo lo anterior (4 bytes): una foto truncada o dañada no se carga
+
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+from datetime import date
+
+from Laboratorio_1 import Producto, ProductoElectronico, ProductoAlimenticio
+
+MAGICO = b'PRDF'
+VERSION = 1
+ENCABEZADO = struct.Struct('<4sHI')
+CRC = struct.Struct('<I')
+
+BASE, ELECTRONICO, ALIMENTICIO = 0, 1, 2
+
+# Columnas en el orden en que se escriben: (nombre, tipo de array)
+COLUMNAS = (('codigo', 'q'), ('cantidad', 'q'), ('extra', 'q'), ('precio', 'd'), ('clase', 'B'), ('tipo', 'B'))
+
+
+def escribir_foto(ruta, productos):
+    '''Guardar productos (objetos Producto) en una foto binaria, con un rename atómico. Devuelve la cantidad'''
+    columnas = {nombre: array(tipo) for nombre, tipo in COLUMNAS}
+    tipos = {}
+    nombres = []
+    for producto in productos:
+        if isinstance(producto, ProductoElectronico):
+            clase, extra = ELECTRONICO, int(producto.añosGarantia)
+        elif isinstance(producto, ProductoAlimenticio):
+            clase, extra = ALIMENTICIO, date.fromisoformat(producto.fechaVencimiento).toordinal()
+        else:
+            clase, extra = BASE, 0
+        columnas['codigo'].append(int(producto.codigo))
+        columnas['cantidad'].append(int(producto.cantidad))
+        columnas['extra'].append(extra)
+        columnas['precio'].append(float(producto.precio))
+        columnas['clase'].append(clase)
+        columnas['tipo'].append(tipos.setdefault(producto.tipo, len(tipos)))
+        nombres.append(producto.nombre)
+    if len(tipos) > 256:
+        raise ValueError('La foto admite hasta 256 tipos de producto distintos')
+
+    metadatos = json.dumps({'cantidad': len(nombres), 'creada': time.time(), 'tipos': list(tipos)}).encode('utf-8')
+    partes = [ENCABEZADO.pack(MAGICO, VERSION, len(metadatos)), metadatos]
+    for nombre, _ in COLUMNAS:
+        if sys.byteorder == 'big':
+            columnas[nombre].byteswap()
+        partes.append(columnas[nombre].tobytes())
+    partes.append('\0'.join(nombres).encode('utf-8'))
+
+    crc = 0
+    temporal = ruta + '.parcial'
+    with open(temporal, 'wb') as file:
+        for parte in partes:
+            crc = zlib.crc32(parte, crc)
+            file.write(parte)
+        file.write(CRC.pack(crc))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporal, ruta)
+    return len(nombres)
+
+
+def leer_foto(ruta):
+    '''Leer una foto binaria. Devuelve (metadatos, lista de productos). ValueError si la foto no es válida'''
+    with open(ruta, 'rb') as file:
+        contenido = memoryview(file.read())
+    if len(contenido) < ENCABEZADO.size + CRC.size or zlib.crc32(contenido[:-CRC.size]) != CRC.unpack(contenido[-CRC.size:])[0]:
+        raise ValueError(f'La foto {ruta} está incompleta o dañada')
+    magico, version, largo = ENCABEZADO.unpack_from(contenido)
+    if magico != MAGICO or version != VERSION:
+        raise ValueError(f'{ruta} no es una foto de productos (versión {VERSION})')
+
+    posicion = ENCABEZADO.size
+    metadatos = json.loads(bytes(contenido[posicion:posicion + largo]))
+    posicion += largo
+    cantidad = metadatos['cantidad']
+    columnas = {}
+    for nombre, tipo in COLUMNAS:
+        columna = array(tipo)
+        tamaño = columna.itemsize * cantidad
+        columna.frombytes(contenido[posicion:posicion + tamaño])
+        if sys.byteorder == 'big':
+            columna.byteswap()
+        columnas[nombre] = columna
+        posicion += tamaño
+    nombres = str(contenido[posicion:-CRC.size], 'utf-8').split('\0') if cantidad else []
+    if len(nombres) != cantidad:
+        raise ValueError(f'La foto {ruta} tiene {len(nombres)} nombres para {cantidad} productos')
+
+    # Las fechas se repiten mucho entre productos: cada ordinal se convierte a texto una sola vez
+    fechas = {}
+    tipos = metadatos['tipos']
+    productos = []
+    for codigo, cantidad_stock, extra, precio, clase, tipo, nombre in zip(
+            *(columnas[nombre] for nombre, _ in COLUMNAS), nombres):
+        if clase == ELECTRONICO:
+            producto = ProductoElectronico.desde_fila(codigo, tipos[tipo], nombre, precio, cantidad_stock, extra)
+        elif clase == ALIMENTICIO:
+            fecha = fechas.get(extra)
+            if fecha is None:
+                fecha = fechas[extra] = date.fromordinal(extra).isoformat()
+            producto = ProductoAlimenticio.desde_fila(codigo, tipos[tipo], nombre, precio, cantidad_stock, fecha)
+        else:
+            producto = Producto.desde_fila(codigo, tipos[tipo], nombre, precio, cantidad_stock)
+        productos.append(producto)
+    return metadatos, productos
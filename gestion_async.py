@@ -0,0 +1,111 @@
+# Interfaz asyncio para GestionProducto
+# Las operaciones de GestionProducto son bloqueantes. Acá se ejecutan en un pool de hilos propio,
+# limitado por un semáforo del mismo tamaño que el pool de conexiones, así un worker asíncrono
+# puede lanzar muchas búsquedas a la vez y que se superpongan en lugar de esperar una tras otra.
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from Laboratorio_1 import GestionProducto
+
+
+class AsyncGestionProducto:
+    def __init__(self, gestion=None, concurrencia=None, timeout=None):
+        '''
+        gestion: instancia de GestionProducto (o un reemplazo con los mismos métodos, por ejemplo para pruebas)
+        concurrencia: operaciones simultáneas como máximo (por defecto, las que admite el backend: el tamaño del pool en MySQL)
+        timeout: segundos máximos por operación (None para esperar sin límite)
+        '''
+        self.gestion = gestion if gestion is not None else GestionProducto()
+        # Sin concurrencia explícita hay que preguntarle al backend, y crearlo conecta y verifica el esquema:
+        # eso se hace recién en la primera operación y en un hilo, sin bloquear el event loop
+        self.concurrencia = None if concurrencia is None else int(concurrencia)
+        self.timeout = timeout
+        self.__ejecutor = None
+        self.__semaforo = None
+        self.__preparacion = None
+
+    def __concurrencia_del_backend(self):
+        backend = getattr(self.gestion, 'backend', None)
+        return int(getattr(backend, 'concurrencia', 5))
+
+    async def __preparar(self):
+        if self.concurrencia is None:
+            if self.__preparacion is None:
+                self.__preparacion = asyncio.ensure_future(asyncio.to_thread(self.__concurrencia_del_backend))
+            concurrencia = await asyncio.shield(self.__preparacion)
+            if self.concurrencia is None:
+                self.concurrencia = concurrencia
+        if self.__ejecutor is None:
+            self.__ejecutor = ThreadPoolExecutor(max_workers=self.concurrencia, thread_name_prefix='gestion')
+            self.__semaforo = asyncio.Semaphore(self.concurrencia)
+
+    async def ejecutar(self, funcion, *args, timeout=None, **kwargs):
+        '''
+        Ejecutar una función bloqueante en el pool de hilos.
+        El cupo del semáforo se devuelve cuando el hilo termina de verdad, aunque la espera se cancele
+        o venza el timeout, para no ocupar más conexiones de las que tiene el pool.
+        '''
+        loop = asyncio.get_running_loop()
+        if self.__ejecutor is None:
+            await self.__preparar()
+        semaforo = self.__semaforo
+
+        await semaforo.acquire()
+        try:
+            futuro = self.__ejecutor.submit(functools.partial(funcion, *args, **kwargs))
+        except BaseException:
+            semaforo.release()
+            raise
+        futuro.add_done_callback(lambda _: loop.call_soon_threadsafe(semaforo.release))
+
+        timeout = self.timeout if timeout is None else timeout
+        return await asyncio.wait_for(asyncio.wrap_future(futuro), timeout)
+
+    # Operaciones
+
+    async def crear_producto(self, producto, timeout=None):
+        return await self.ejecutar(self.gestion.crear_producto, producto, timeout=timeout)
+
+    async def buscar_producto(self, codigo, timeout=None):
+        return await self.ejecutar(self.gestion.buscar_producto, codigo, timeout=timeout)
+
+    async def actualizar_precio(self, codigo, nuevo_precio, timeout=None):
+        return await self.ejecutar(self.gestion.actualizar_precio, codigo, nuevo_precio, timeout=timeout)
+
+    async def eliminar_producto(self, codigo, timeout=None):
+        return await self.ejecutar(self.gestion.eliminar_producto, codigo, timeout=timeout)
+
+    async def leer_todos_los_productos(self, timeout=None):
+        return await self.ejecutar(self.gestion.leer_todos_los_productos, timeout=timeout)
+
+    # Varias operaciones a la vez
+
+    async def reunir(self, *corutinas, return_exceptions=False):
+        '''Esperar varias operaciones independientes que se ejecutan superpuestas (como asyncio.gather)'''
+        return await asyncio.gather(*corutinas, return_exceptions=return_exceptions)
+
+    async def buscar_productos(self, codigos, timeout=None, return_exceptions=False):
+        '''Buscar muchos códigos a la vez. Devuelve los productos en el mismo orden que los códigos'''
+        return await self.reunir(*(self.buscar_producto(codigo, timeout) for codigo in codigos),
+                                 return_exceptions=return_exceptions)
+
+    async def actualizar_precios(self, precios, timeout=None, return_exceptions=False):
+        '''Actualizar varios precios a la vez. precios: diccionario codigo -> nuevo precio'''
+        return await self.reunir(*(self.actualizar_precio(codigo, precio, timeout) for codigo, precio in precios.items()),
+                                 return_exceptions=return_exceptions)
+
+    # Cierre
+
+    async def cerrar(self):
+        '''Esperar las operaciones en curso y cerrar el pool de hilos y las conexiones'''
+        if self.__ejecutor is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.__ejecutor.shutdown)
+        self.gestion.cerrar()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.cerrar()
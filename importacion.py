@@ -0,0 +1,47 @@
+# Lectores de archivos de productos para la carga masiva (GestionProducto.crear_productos)
+# Todos devuelven generadores de diccionarios con las mismas claves que Producto.to_dict,
+# así que el archivo se recorre de a una fila sin cargarlo completo en memoria.
+# Las filas que no se pueden leer se devuelven como excepciones (no se lanzan), para que la carga
+# siga con el resto y las informe entre los rechazados.
+
+import csv
+import json
+
+
+def leer_productos_csv(ruta, delimitador=','):
+    '''Leer un CSV con encabezado codigo,tipo,nombre,precio,cantidad,añosGarantia,fechaVencimiento'''
+    with open(ruta, 'r', encoding='utf-8', newline='') as file:
+        for fila in csv.DictReader(file, delimiter=delimitador):
+            yield {clave.strip(): valor.strip() for clave, valor in fila.items() if clave and valor is not None}
+
+
+def leer_productos_jsonl(ruta):
+    '''
+    Leer un archivo JSONL: un producto (objeto JSON) por línea.
+    Una línea inválida se devuelve como ValueError (con el número de línea) para que se informe como rechazada
+    '''
+    with open(ruta, 'r', encoding='utf-8') as file:
+        for numero, linea in enumerate(file, start=1):
+            linea = linea.strip()
+            if not linea:
+                continue
+            try:
+                yield json.loads(linea)
+            except json.JSONDecodeError as error:
+                yield ValueError(f'Línea {numero} inválida en {ruta}: {error}')
+
+
+def leer_productos_store(ruta):
+    '''Leer un archivo con el formato de productos_store.json (diccionario indexado por código)'''
+    with open(ruta, 'r', encoding='utf-8') as file:
+        datos = json.load(file)
+    yield from datos.values()
+
+
+def leer_productos(ruta):
+    '''Elegir el lector según la extensión del archivo'''
+    if ruta.endswith('.csv'):
+        return leer_productos_csv(ruta)
+    if ruta.endswith('.jsonl'):
+        return leer_productos_jsonl(ruta)
+    return leer_productos_store(ruta)
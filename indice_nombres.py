@@ -0,0 +1,179 @@
+# Índice de búsqueda por nombre
+# El único acceso directo a un producto era el código. Un LIKE '%texto%' en la base recorre la
+# tabla completa, así que el índice vive en memoria y responde prefijos y subcadenas del nombre:
+#   - nombres: lista ordenada de (nombre normalizado, codigo); los nombres que empiezan con el texto
+#     se encuentran con búsqueda binaria (bisect), O(log n + k)
+#   - palabras: para cada palabra distinta, la lista ordenada de los (nombre, codigo) que la usan,
+#     y un vocabulario ordenado para los prefijos de palabra
+#   - trigramas: para cada grupo de tres letras, las palabras del vocabulario que lo contienen
+#     (el vocabulario es mucho más chico que el catálogo, por eso el n-grama se arma sobre él)
+# La normalización ignora mayúsculas y acentos, igual que Producto.nombre con capitalize().
+# GestionProducto lo mantiene al día en las altas, bajas y cargas masivas (activar_indice_nombres).
+
+import bisect
+import heapq
+import threading
+import unicodedata
+
+
+def normalizar_nombre(texto):
+    '''Minúsculas, sin acentos y con un solo espacio entre palabras'''
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(caracter for caracter in texto if not unicodedata.combining(caracter))
+    return ' '.join(texto.casefold().split())
+
+
+def trigramas(palabra):
+    return {palabra[i:i + 3] for i in range(len(palabra) - 2)}
+
+
+# Orden de los resultados: primero los nombres que empiezan con el texto, después los que tienen
+# una palabra que empieza con el texto y al final los que lo contienen en cualquier lugar.
+# Dentro de cada grupo, por nombre y código.
+EMPIEZA, PALABRA, CONTIENE = 0, 1, 2
+
+
+class IndiceNombres:
+    def __init__(self, pares=()):
+        '''pares: iterable de (codigo, nombre)'''
+        self.__por_codigo = {}      # codigo -> (nombre original, nombre normalizado)
+        self.__nombres = []
+        self.__palabras = {}        # palabra -> lista ordenada de (nombre normalizado, codigo)
+        self.__vocabulario = []     # palabras ordenadas
+        self.__trigramas = {}       # trigrama -> set de palabras
+        self.__lock = threading.Lock()
+        for codigo, nombre in pares:
+            self.__por_codigo[int(codigo)] = (nombre, normalizar_nombre(nombre))
+        self.__nombres = sorted((normalizado, codigo) for codigo, (_, normalizado) in self.__por_codigo.items())
+        for par in self.__nombres:
+            # Recorriendo los nombres en orden, las listas de cada palabra ya quedan ordenadas
+            for palabra in set(par[0].split()):
+                self.__palabras.setdefault(palabra, []).append(par)
+        self.__vocabulario = sorted(self.__palabras)
+        for palabra in self.__vocabulario:
+            for trigrama in trigramas(palabra):
+                self.__trigramas.setdefault(trigrama, set()).add(palabra)
+
+    @classmethod
+    def desde_filas(cls, filas):
+        '''Armar el índice desde filas (diccionarios) con codigo y nombre'''
+        return cls((fila['codigo'], fila['nombre']) for fila in filas)
+
+    def __len__(self):
+        return len(self.__por_codigo)
+
+    def nombre(self, codigo):
+        par = self.__por_codigo.get(int(codigo))
+        return par[0] if par else None
+
+    # Mantenimiento
+
+    def agregar(self, codigo, nombre):
+        '''Agregar un producto o cambiar su nombre'''
+        codigo, normalizado = int(codigo), normalizar_nombre(nombre)
+        with self.__lock:
+            self.__quitar(codigo)
+            self.__por_codigo[codigo] = (nombre, normalizado)
+            par = (normalizado, codigo)
+            bisect.insort(self.__nombres, par)
+            for palabra in set(normalizado.split()):
+                pares = self.__palabras.get(palabra)
+                if pares is None:
+                    pares = self.__palabras[palabra] = []
+                    bisect.insort(self.__vocabulario, palabra)
+                    for trigrama in trigramas(palabra):
+                        self.__trigramas.setdefault(trigrama, set()).add(palabra)
+                bisect.insort(pares, par)
+
+    def quitar(self, codigo):
+        with self.__lock:
+            self.__quitar(int(codigo))
+
+    def __quitar(self, codigo):
+        par = self.__por_codigo.pop(codigo, None)
+        if par is None:
+            return
+        par = (par[1], codigo)
+        del self.__nombres[bisect.bisect_left(self.__nombres, par)]
+        for palabra in set(par[0].split()):
+            pares = self.__palabras[palabra]
+            del pares[bisect.bisect_left(pares, par)]
+            if not pares:
+                # La palabra ya no la usa ningún producto: sale del vocabulario y de los trigramas
+                del self.__palabras[palabra]
+                del self.__vocabulario[bisect.bisect_left(self.__vocabulario, palabra)]
+                for trigrama in trigramas(palabra):
+                    palabras = self.__trigramas[trigrama]
+                    palabras.discard(palabra)
+                    if not palabras:
+                        del self.__trigramas[trigrama]
+
+    # Consultas
+
+    def __rango(self, lista, prefijo):
+        '''Posiciones de la lista ordenada cuyos elementos empiezan con el prefijo'''
+        inicio = bisect.bisect_left(lista, prefijo)
+        fin = bisect.bisect_left(lista, prefijo + '\U0010ffff', inicio)
+        return inicio, fin
+
+    def __palabras_con(self, fragmento):
+        '''Palabras del vocabulario que contienen el fragmento, separadas en (empiezan, contienen)'''
+        inicio, fin = self.__rango(self.__vocabulario, fragmento)
+        empiezan = self.__vocabulario[inicio:fin]
+        if len(fragmento) < 3:
+            # Sin trigramas posibles: alcanza con los prefijos de palabra (fragmentos muy cortos)
+            return empiezan, []
+        grupos = sorted((self.__trigramas.get(trigrama, ()) for trigrama in trigramas(fragmento)), key=len)
+        candidatas = set(grupos[0]).intersection(*grupos[1:])
+        contienen = [palabra for palabra in candidatas if fragmento in palabra and not palabra.startswith(fragmento)]
+        return empiezan, contienen
+
+    def buscar(self, texto, limite=10):
+        '''
+        Los mejores resultados para el texto, como lista de (codigo, nombre).
+        Solo se revisan los grupos siguientes (PALABRA, CONTIENE) si el anterior no llenó el límite.
+        '''
+        texto = normalizar_nombre(texto)
+        if not texto or limite <= 0:
+            return []
+        with self.__lock:
+            inicio = bisect.bisect_left(self.__nombres, (texto,))
+            fin = bisect.bisect_left(self.__nombres, (texto + '\U0010ffff',), inicio)
+            encontrados = [codigo for _, codigo in self.__nombres[inicio:min(fin, inicio + limite)]]
+            if len(encontrados) < limite:
+                encontrados += self.__buscar_en_palabras(texto, limite - len(encontrados), set(encontrados))
+            return [(codigo, self.__por_codigo[codigo][0]) for codigo in encontrados]
+
+    def __buscar_en_palabras(self, texto, limite, vistos):
+        # Los candidatos salen de la palabra más larga del texto (la más selectiva)
+        clave = max(texto.split(), key=len)
+        empiezan, contienen = self.__palabras_con(clave)
+        if clave != texto:
+            # Con varias palabras, la clave puede empezar una palabra y el texto completo quedar en el medio
+            contienen = empiezan + contienen
+        encontrados = []
+        for grupo, palabras in ((PALABRA, empiezan), (CONTIENE, contienen)):
+            encontrados += self.__mejores([self.__palabras[palabra] for palabra in palabras], texto, grupo,
+                                          limite - len(encontrados), vistos.union(encontrados))
+            if len(encontrados) >= limite:
+                break
+        return encontrados
+
+    def __mejores(self, listas, texto, grupo, limite, vistos):
+        '''Los primeros nombres (mezclando las listas ordenadas de cada palabra) que coinciden con el texto completo'''
+        if grupo == PALABRA:
+            coincide = lambda normalizado: (' ' + texto) in (' ' + normalizado)
+        else:
+            coincide = lambda normalizado: texto in normalizado
+        resultados = []
+        anterior = None
+        # heapq.merge devuelve los pares en orden sin ordenar todos los candidatos: se corta al llegar al límite
+        for normalizado, codigo in heapq.merge(*listas):
+            if codigo == anterior or codigo in vistos:
+                continue    # el mismo nombre puede venir de dos palabras que coinciden
+            anterior = codigo
+            if coincide(normalizado):
+                resultados.append(codigo)
+                if len(resultados) == limite:
+                    break
+        return resultados
@@ -0,0 +1,365 @@
+# Instrumentación de GestionProducto
+# Hasta ahora lo único que quedaba de una operación era un print. Este módulo mide, sin cambiar el código
+# de las operaciones:
+#   - la latencia de cada método público de GestionProducto (histograma por método) y sus errores;
+#     los que devuelven un generador se miden mientras se consume y sesion, durante todo el bloque with
+#   - cada execute de los cursores: latencia por tipo de sentencia (select, insert, ...) y cuántas
+#     consultas hizo cada método
+#   - el tiempo de espera para obtener una conexión (pool de MySQL o lock de SQLite)
+# Se activa por objeto con GestionProducto.activar_instrumentacion() (o con Metrics_enabled=True):
+# recién ahí se reemplazan los métodos del objeto por versiones que miden, así que desactivada no
+# agrega ningún costo. Cualquier objeto con los mismos métodos registrar_* puede reemplazar a Instrumentacion.
+#
+# Los datos se consultan con estadisticas() o en formato de texto de Prometheus con exportar_prometheus();
+# servir_prometheus() los publica en http://host:puerto/metrics.
+
+import bisect
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+
+# Límites (en segundos) de los intervalos de los histogramas
+LIMITES = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# Métodos de GestionProducto que no se reemplazan
+NO_MEDIDOS = ('activar_instrumentacion', 'desactivar_instrumentacion', 'estadisticas', 'hidratar_producto')
+
+
+class Histograma:
+    __slots__ = ('cuentas', 'cantidad', 'suma', 'maximo')
+
+    def __init__(self):
+        self.cuentas = [0] * (len(LIMITES) + 1)    # el último intervalo es "más de 10 s"
+        self.cantidad = 0
+        self.suma = 0.0
+        self.maximo = 0.0
+
+    def registrar(self, segundos):
+        self.cuentas[bisect.bisect_left(LIMITES, segundos)] += 1
+        self.cantidad += 1
+        self.suma += segundos
+        if segundos > self.maximo:
+            self.maximo = segundos
+
+    def percentil(self, p):
+        '''Límite superior del intervalo donde cae el percentil p (0 a 1)'''
+        if not self.cantidad:
+            return 0.0
+        objetivo = p * self.cantidad
+        acumulado = 0
+        for limite, cuenta in zip(LIMITES, self.cuentas):
+            acumulado += cuenta
+            if acumulado >= objetivo:
+                return min(limite, self.maximo)
+        return self.maximo
+
+    def resumen(self):
+        return {
+            'cantidad': self.cantidad,
+            'segundos': round(self.suma, 6),
+            'p50_ms': round(self.percentil(0.50) * 1000, 3),
+            'p99_ms': round(self.percentil(0.99) * 1000, 3),
+            'max_ms': round(self.maximo * 1000, 3)
+        }
+
+
+class Instrumentacion:
+    def __init__(self, prefijo='productos'):
+        self.prefijo = prefijo
+        self.__lock = threading.Lock()
+        self.__activas = threading.local()     # pila de operaciones en curso de cada hilo
+        self.__operaciones = {}     # nombre -> [Histograma, errores, consultas]
+        self.__consultas = {}       # tipo de sentencia -> [Histograma, errores]
+        self.__conexiones = Histograma()
+
+    # Registro
+
+    def en_curso(self):
+        '''Operaciones en curso del hilo actual: listas [nombre, consultas, hubo error]'''
+        pila = getattr(self.__activas, 'pila', None)
+        if pila is None:
+            pila = self.__activas.pila = []
+        return pila
+
+    @contextmanager
+    def operacion(self, nombre):
+        '''Medir una operación. Las consultas y errores que ocurren adentro se le atribuyen (y a las que la contienen)'''
+        pila = self.en_curso()
+        activa = [nombre, 0, False]     # nombre, consultas, hubo error
+        pila.append(activa)
+        inicio = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            activa[2] = True
+            raise
+        finally:
+            segundos = time.perf_counter() - inicio
+            pila.pop()
+            self.registrar_operacion(nombre, segundos, activa[1], activa[2])
+
+    def registrar_operacion(self, nombre, segundos, consultas=0, error=False):
+        with self.__lock:
+            datos = self.__operaciones.get(nombre)
+            if datos is None:
+                datos = self.__operaciones[nombre] = [Histograma(), 0, 0]
+            datos[0].registrar(segundos)
+            datos[1] += bool(error)
+            datos[2] += consultas
+
+    def registrar_consulta(self, sentencia, segundos, error=False):
+        tipo = tipo_de_sentencia(sentencia)
+        for activa in self.en_curso():
+            activa[1] += 1
+            if error:
+                # Los métodos de GestionProducto atrapan los errores e imprimen un mensaje:
+                # la operación cuenta como fallida aunque la excepción no llegue hasta acá
+                activa[2] = True
+        with self.__lock:
+            datos = self.__consultas.get(tipo)
+            if datos is None:
+                datos = self.__consultas[tipo] = [Histograma(), 0]
+            datos[0].registrar(segundos)
+            datos[1] += bool(error)
+
+    def registrar_conexion(self, segundos):
+        with self.__lock:
+            self.__conexiones.registrar(segundos)
+
+    def reiniciar(self):
+        with self.__lock:
+            self.__operaciones.clear()
+            self.__consultas.clear()
+            self.__conexiones = Histograma()
+
+    # Consulta
+
+    def estadisticas(self):
+        with self.__lock:
+            return {
+                'operaciones': {
+                    nombre: dict(histograma.resumen(), errores=errores, consultas=consultas)
+                    for nombre, (histograma, errores, consultas) in sorted(self.__operaciones.items())
+                },
+                'consultas': {
+                    tipo: dict(histograma.resumen(), errores=errores)
+                    for tipo, (histograma, errores) in sorted(self.__consultas.items())
+                },
+                'conexiones': self.__conexiones.resumen()
+            }
+
+    def exportar_prometheus(self):
+        '''Las métricas en el formato de texto de Prometheus'''
+        p = self.prefijo
+        lineas = []
+        with self.__lock:
+            lineas += encabezado(f'{p}_operacion_segundos', 'histogram', 'Latencia de los métodos de GestionProducto')
+            for nombre, (histograma, _, _) in sorted(self.__operaciones.items()):
+                lineas += lineas_histograma(f'{p}_operacion_segundos', histograma, f'operacion="{nombre}"')
+            lineas += encabezado(f'{p}_operacion_errores_total', 'counter', 'Operaciones que fallaron')
+            lineas += [f'{p}_operacion_errores_total{{operacion="{nombre}"}} {errores}'
+                       for nombre, (_, errores, _) in sorted(self.__operaciones.items())]
+            lineas += encabezado(f'{p}_operacion_consultas_total', 'counter', 'Consultas a la base hechas por cada operación')
+            lineas += [f'{p}_operacion_consultas_total{{operacion="{nombre}"}} {consultas}'
+                       for nombre, (_, _, consultas) in sorted(self.__operaciones.items())]
+            lineas += encabezado(f'{p}_consulta_segundos', 'histogram', 'Latencia de las consultas por tipo de sentencia')
+            for tipo, (histograma, _) in sorted(self.__consultas.items()):
+                lineas += lineas_histograma(f'{p}_consulta_segundos', histograma, f'sentencia="{tipo}"')
+            lineas += encabezado(f'{p}_consulta_errores_total', 'counter', 'Consultas que fallaron')
+            lineas += [f'{p}_consulta_errores_total{{sentencia="{tipo}"}} {errores}'
+                       for tipo, (_, errores) in sorted(self.__consultas.items())]
+            lineas += encabezado(f'{p}_conexion_espera_segundos', 'histogram', 'Espera para obtener una conexión')
+            lineas += lineas_histograma(f'{p}_conexion_espera_segundos', self.__conexiones, '')
+        return '\n'.join(lineas) + '\n'
+
+    # Instalación sobre los objetos
+
+    def instrumentar_gestion(self, gestion):
+        '''Reemplazar los métodos públicos del objeto por versiones medidas (atributos del objeto, no de la clase)'''
+        for nombre, metodo in inspect.getmembers(type(gestion), inspect.isfunction):
+            # hidratar_producto se llama una vez por fila: se mide como parte de la operación que la usa
+            if nombre.startswith('_') or nombre in NO_MEDIDOS:
+                continue
+            if inspect.isgeneratorfunction(metodo):
+                medido = medir_generador
+            elif inspect.isgeneratorfunction(getattr(metodo, '__wrapped__', None)):
+                medido = medir_contexto     # @contextmanager (sesion)
+            else:
+                medido = medir_funcion
+            setattr(gestion, nombre, medido(self, nombre, getattr(gestion, nombre)))
+
+    def instrumentar_backend(self, backend):
+        '''Medir la espera de conexiones (sesion) y cada execute de los cursores del backend'''
+        sesion, abrir_cursor = backend.sesion, backend.abrir_cursor
+
+        @contextmanager
+        def sesion_medida(*args, **kwargs):
+            inicio = time.perf_counter()
+            with sesion(*args, **kwargs) as connection:
+                self.registrar_conexion(time.perf_counter() - inicio)
+                yield connection
+
+        def abrir_cursor_medido(*args, **kwargs):
+            return CursorMedido(abrir_cursor(*args, **kwargs), self)
+
+        sesion_medida.medido = abrir_cursor_medido.medido = True
+        backend.sesion = sesion_medida
+        backend.abrir_cursor = abrir_cursor_medido
+
+
+def desinstrumentar(objeto):
+    '''Quitar los atributos agregados por instrumentar_*: vuelven a usarse los métodos de la clase'''
+    for nombre, valor in list(vars(objeto).items()):
+        if getattr(valor, 'medido', False):
+            delattr(objeto, nombre)
+
+
+def medir_funcion(instrumentacion, nombre, metodo):
+    @functools.wraps(metodo)
+    def medido(*args, **kwargs):
+        pila = instrumentacion.en_curso()
+        activa = [nombre, 0, False]     # nombre, consultas, hubo error
+        pila.append(activa)
+        inicio = time.perf_counter()
+        resultado = None
+        try:
+            resultado = metodo(*args, **kwargs)
+        except BaseException:
+            activa[2] = True
+            raise
+        finally:
+            segundos = time.perf_counter() - inicio
+            pila.pop()
+            if not inspect.isgenerator(resultado):
+                instrumentacion.registrar_operacion(nombre, segundos, activa[1], activa[2])
+        if not inspect.isgenerator(resultado):
+            return resultado
+        # Devolvió un generador de otro objeto (iter_lotes_filas devuelve el del backend):
+        # la operación se termina de medir mientras se consume
+        return medir_iteracion(instrumentacion, activa, resultado, segundos)
+    medido.medido = True
+    return medido
+
+
+def medir_generador(instrumentacion, nombre, metodo):
+    @functools.wraps(metodo)
+    def medido(*args, **kwargs):
+        return medir_iteracion(instrumentacion, [nombre, 0, False], metodo(*args, **kwargs))
+    medido.medido = True
+    return medido
+
+
+def medir_iteracion(instrumentacion, activa, generador, segundos=0.0):
+    # Solo se mide el tiempo dentro del generador, no el del código que lo consume entre un valor y otro
+    try:
+        while True:
+            pila = instrumentacion.en_curso()
+            pila.append(activa)
+            inicio = time.perf_counter()
+            try:
+                valor = next(generador)
+            except StopIteration:
+                return
+            except BaseException:
+                activa[2] = True
+                raise
+            finally:
+                segundos += time.perf_counter() - inicio
+                pila.pop()
+            yield valor
+    finally:
+        generador.close()
+        instrumentacion.registrar_operacion(activa[0], segundos, activa[1], activa[2])
+
+
+def medir_contexto(instrumentacion, nombre, metodo):
+    # Se mide todo el bloque with (para sesion, el tiempo que se tuvo la conexión)
+    # y se le atribuyen las consultas hechas adentro
+    @functools.wraps(metodo)
+    @contextmanager
+    def medido(*args, **kwargs):
+        with instrumentacion.operacion(nombre), metodo(*args, **kwargs) as valor:
+            yield valor
+    medido.medido = True
+    return medido
+
+
+class CursorMedido:
+    '''Envoltorio de un cursor que mide execute y executemany; el resto se delega al cursor original'''
+
+    def __init__(self, cursor, instrumentacion):
+        self.__cursor = cursor
+        self.__instrumentacion = instrumentacion
+
+    def __getattr__(self, nombre):
+        return getattr(self.__cursor, nombre)
+
+    def __iter__(self):
+        return iter(self.__cursor)
+
+    def __medir(self, metodo, sentencia, *args):
+        inicio = time.perf_counter()
+        try:
+            resultado = metodo(sentencia, *args)
+        except Exception:
+            self.__instrumentacion.registrar_consulta(sentencia, time.perf_counter() - inicio, error=True)
+            raise
+        self.__instrumentacion.registrar_consulta(sentencia, time.perf_counter() - inicio)
+        return resultado
+
+    def execute(self, sentencia, *args):
+        return self.__medir(self.__cursor.execute, sentencia, *args)
+
+    def executemany(self, sentencia, *args):
+        return self.__medir(self.__cursor.executemany, sentencia, *args)
+
+
+def tipo_de_sentencia(sentencia):
+    '''Primera palabra de la sentencia en minúsculas (select, insert, update, ...)'''
+    partes = sentencia.split(None, 1)
+    return partes[0].lower() if partes else ''
+
+
+def encabezado(metrica, tipo, ayuda):
+    return [f'# HELP {metrica} {ayuda}', f'# TYPE {metrica} {tipo}']
+
+
+def lineas_histograma(metrica, histograma, etiquetas):
+    separador = ',' if etiquetas else ''
+    lineas = []
+    acumulado = 0
+    for limite, cuenta in zip(LIMITES, histograma.cuentas):
+        acumulado += cuenta
+        lineas.append(f'{metrica}_bucket{{{etiquetas}{separador}le="{limite}"}} {acumulado}')
+    lineas.append(f'{metrica}_bucket{{{etiquetas}{separador}le="+Inf"}} {histograma.cantidad}')
+    llaves = f'{{{etiquetas}}}' if etiquetas else ''
+    lineas.append(f'{metrica}_sum{llaves} {histograma.suma}')
+    lineas.append(f'{metrica}_count{llaves} {histograma.cantidad}')
+    return lineas
+
+
+def servir_prometheus(instrumentacion, puerto=9100, host='127.0.0.1'):
+    '''Publicar las métricas en http://host:puerto/metrics desde un hilo en segundo plano. Devuelve el servidor'''
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Manejador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip('/') != '/metrics':
+                self.send_error(404)
+                return
+            cuerpo = instrumentacion.exportar_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer((host, puerto), Manejador)
+    threading.Thread(target=servidor.serve_forever, name='metricas-prometheus', daemon=True).start()
+    return servidor
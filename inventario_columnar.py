@@ -0,0 +1,150 @@
+# Vista columnar del inventario
+# Para responder preguntas sobre todo el inventario (valorización, stock bajo, precios, vencimientos)
+# no hace falta construir un objeto por producto: guardamos cada atributo en un arreglo de NumPy
+# y las consultas se resuelven con operaciones vectorizadas sobre millones de filas.
+
+import json
+from datetime import date
+
+import numpy as np
+
+
+class InventarioColumnar:
+    TIPOS = ('electronico', 'alimenticio')
+    SIN_GARANTIA = 0    # valor de añosGarantia para los productos que no son electrónicos
+
+    def __init__(self, codigo, tipo, precio, cantidad, añosGarantia, fechaVencimiento, tipos=TIPOS):
+        '''
+        Recibe los arreglos ya armados. tipo es un arreglo de índices dentro de tipos.
+        Normalmente se usan los constructores desde_lotes, desde_productos o desde_store.
+        '''
+        self.codigo = np.asarray(codigo, dtype=np.int64)
+        self.tipo = np.asarray(tipo, dtype=np.int8)
+        self.precio = np.asarray(precio, dtype=np.float64)
+        self.cantidad = np.asarray(cantidad, dtype=np.int64)
+        self.añosGarantia = np.asarray(añosGarantia, dtype=np.int16)
+        self.fechaVencimiento = np.asarray(fechaVencimiento, dtype='datetime64[D]')
+        self.tipos = tuple(tipos)
+        if not (len(self.codigo) == len(self.tipo) == len(self.precio) == len(self.cantidad)
+                == len(self.añosGarantia) == len(self.fechaVencimiento)):
+            raise ValueError('Todas las columnas deben tener la misma cantidad de filas')
+
+    def __len__(self):
+        return len(self.codigo)
+
+    # Constructores
+
+    @classmethod
+    def desde_lotes(cls, lotes):
+        '''
+        Armar la vista a partir de lotes de filas (diccionarios con las claves de to_dict),
+        por ejemplo GestionProducto.iter_lotes_filas(). Cada lote se convierte a arreglos
+        y al final se concatenan, así nunca hay una lista de objetos con todo el catálogo.
+        '''
+        tipos = list(cls.TIPOS)
+        indices = {tipo: i for i, tipo in enumerate(tipos)}
+        columnas = {nombre: [] for nombre in ('codigo', 'tipo', 'precio', 'cantidad', 'añosGarantia', 'fechaVencimiento')}
+
+        for filas in lotes:
+            tipo_lote = []
+            for fila in filas:
+                tipo = fila['tipo']
+                if tipo not in indices:
+                    indices[tipo] = len(tipos)
+                    tipos.append(tipo)
+                tipo_lote.append(indices[tipo])
+            columnas['codigo'].append(np.fromiter((fila['codigo'] for fila in filas), dtype=np.int64, count=len(filas)))
+            columnas['tipo'].append(np.array(tipo_lote, dtype=np.int8))
+            columnas['precio'].append(np.fromiter((fila['precio'] for fila in filas), dtype=np.float64, count=len(filas)))
+            columnas['cantidad'].append(np.fromiter((fila['cantidad'] for fila in filas), dtype=np.int64, count=len(filas)))
+            columnas['añosGarantia'].append(np.fromiter(
+                (fila.get('añosGarantia') or cls.SIN_GARANTIA for fila in filas), dtype=np.int16, count=len(filas)))
+            # None se convierte en NaT (sin fecha); acepta tanto date como texto AAAA-MM-DD
+            columnas['fechaVencimiento'].append(np.array(
+                [fila.get('fechaVencimiento') or 'NaT' for fila in filas], dtype='datetime64[D]'))
+
+        if not columnas['codigo']:
+            return cls.vacio()
+        return cls(*(np.concatenate(columnas[nombre]) for nombre in columnas), tipos=tipos)
+
+    @classmethod
+    def desde_productos(cls, productos, tamaño_lote=10000):
+        '''Armar la vista a partir de objetos Producto (por ejemplo GestionProducto.iter_productos())'''
+        def lotes():
+            lote = []
+            for producto in productos:
+                lote.append(producto.to_dict())
+                if len(lote) >= tamaño_lote:
+                    yield lote
+                    lote = []
+            if lote:
+                yield lote
+        return cls.desde_lotes(lotes())
+
+    @classmethod
+    def desde_base(cls, gestion, tamaño_lote=None):
+        '''Armar la vista leyendo la base de datos en lotes, sin construir objetos Producto'''
+        return cls.desde_lotes(gestion.iter_lotes_filas(tamaño_lote))
+
+    @classmethod
+    def desde_store(cls, ruta):
+        '''Armar la vista desde un archivo con el formato de productos_store.json'''
+        with open(ruta, 'r', encoding='utf-8') as file:
+            datos = json.load(file)
+        return cls.desde_lotes([list(datos.values())])
+
+    @classmethod
+    def vacio(cls):
+        return cls([], [], [], [], [], [])
+
+    # Consultas
+
+    def mascara_tipo(self, tipo):
+        if tipo not in self.tipos:
+            return np.zeros(len(self), dtype=bool)
+        return self.tipo == self.tipos.index(tipo)
+
+    def valorizacion(self):
+        '''Valor del stock de cada producto (precio * cantidad)'''
+        return self.precio * self.cantidad
+
+    def valorizacion_por_tipo(self):
+        '''Valor total del stock agrupado por tipo'''
+        totales = np.bincount(self.tipo, weights=self.valorizacion(), minlength=len(self.tipos))
+        return {tipo: float(totales[i]) for i, tipo in enumerate(self.tipos)}
+
+    def stock_bajo(self, umbral, tipo=None):
+        '''Máscara de los productos con cantidad menor al umbral'''
+        mascara = self.cantidad < umbral
+        if tipo is not None:
+            mascara &= self.mascara_tipo(tipo)
+        return mascara
+
+    def percentiles_precio(self, percentiles=(25, 50, 75, 90, 99), tipo=None):
+        '''Percentiles del precio, de todo el inventario o de un tipo'''
+        precios = self.precio if tipo is None else self.precio[self.mascara_tipo(tipo)]
+        if len(precios) == 0:
+            return {p: None for p in percentiles}
+        valores = np.percentile(precios, percentiles)
+        return {p: float(v) for p, v in zip(percentiles, valores)}
+
+    def por_vencer(self, dias, hoy=None):
+        '''Máscara de los productos que vencen entre hoy y dentro de N días (inclusive)'''
+        hoy = np.datetime64(hoy or date.today(), 'D')
+        # Las comparaciones con NaT dan False, así que los productos sin fecha quedan afuera
+        return (self.fechaVencimiento >= hoy) & (self.fechaVencimiento <= hoy + np.timedelta64(int(dias), 'D'))
+
+    def vencidos(self, hoy=None):
+        '''Máscara de los productos con fecha de vencimiento anterior a hoy'''
+        hoy = np.datetime64(hoy or date.today(), 'D')
+        return self.fechaVencimiento < hoy
+
+    def codigos(self, mascara):
+        '''Códigos de los productos seleccionados por una máscara'''
+        return self.codigo[mascara]
+
+    def filtrar(self, mascara):
+        '''Nueva vista con solo las filas seleccionadas'''
+        return InventarioColumnar(self.codigo[mascara], self.tipo[mascara], self.precio[mascara],
+                                  self.cantidad[mascara], self.añosGarantia[mascara],
+                                  self.fechaVencimiento[mascara], tipos=self.tipos)
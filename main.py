@@ -1,12 +1,13 @@
-from datetime import datetime
 import os
 import platform
+import sys
 
 
 from Laboratorio_1 import(
     ProductoElectronico,
     ProductoAlimenticio,
-    GestionProducto
+    GestionProducto,
+    validar_vencimiento_futuro
 )
 
 def limpiar_pantalla():   # Para limpiar la pantalla
@@ -52,9 +53,7 @@ def agregar_producto(gestion, tipo_producto):
             while True:
                 fechaVencimiento = input('Por favor ingrese Fecha de Vencimiento en el formato AAAA-MM-DD: ')
                 try:
-                    date = datetime.strptime(fechaVencimiento, '%Y-%m-%d')
-                    if date <= datetime.now():
-                        raise ValueError("La fecha de vencimiento debe ser mayor a la fecha actual")
+                    validar_vencimiento_futuro(fechaVencimiento)
                 except ValueError as e:
                     print(f'Entrada no válida: {e}. Inténtalo de nuevo')
                 else:
@@ -98,19 +97,28 @@ def eliminar_producto(gestion):
     print()
     input('Presione enter para continuar')
 
+PRODUCTOS_POR_PAGINA = 20
+
 def mostrar_todos_los_productos(gestion):
     print()
     print('**************************** Listado De Productos *****************************')
     print()
     try:
-        productos = gestion.leer_todos_los_productos()
-        for producto in productos:
-            if isinstance(producto, ProductoAlimenticio):
+        # Cada página es una sola consulta indexada: no se carga el catálogo completo
+        for numero, pagina in enumerate(gestion.iter_paginas(PRODUCTOS_POR_PAGINA), start=1):
+            if numero > 1:
                 print()
-                print(f'Producto Tipo -> {producto.tipo}  Codigo -> {producto.codigo}  Nombre -> {producto.nombre}')
-            elif isinstance(producto, ProductoElectronico):
+                if input('Presione enter para ver la página siguiente (s para salir): ').strip().lower() == 's':
+                    break
                 print()
-                print(f'Producto Tipo -> {producto.tipo}  Codigo -> {producto.codigo}  Nombre -> {producto.nombre}') 
+                print(f'----------------------------------- Página {numero} -----------------------------------')
+            for producto in pagina:
+                if isinstance(producto, ProductoAlimenticio):
+                    print()
+                    print(f'Producto Tipo -> {producto.tipo}  Codigo -> {producto.codigo}  Nombre -> {producto.nombre}')
+                elif isinstance(producto, ProductoElectronico):
+                    print()
+                    print(f'Producto Tipo -> {producto.tipo}  Codigo -> {producto.codigo}  Nombre -> {producto.nombre}') 
         print()
         print('******************************************************************************')
         print()      
@@ -123,8 +131,14 @@ def mostrar_todos_los_productos(gestion):
 
 if __name__ == "__main__":
 
+    # Con argumentos se ejecuta el modo por lotes (ver modo_lote.py): python main.py comandos.jsonl
+    if len(sys.argv) > 1:
+        import modo_lote
+        sys.exit(modo_lote.main(sys.argv[1:]))
     
     gestion_productos = GestionProducto()
+    # Con la opción Cache_snapshot_file el cache arranca con los productos de la sesión anterior
+    gestion_productos.cargar_foto_cache()
 
     while True:     # Esta parte del código va a mostrar el menú y va a capturar
                     # la opción que elija el usuario
@@ -151,6 +165,8 @@ if __name__ == "__main__":
         
         elif opcion == '7':
             print('Saliendo del programa...')
+            gestion_productos.guardar_foto_cache()
+            gestion_productos.cerrar()
             break
 
         else:
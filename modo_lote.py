@@ -0,0 +1,152 @@
+# Modo por lotes (sin menú)
+# El menú de main.py limpia la pantalla antes de cada opción (os.system abre un shell) y espera
+# "Presione enter" después de cada una: no sirve para cargar miles de operaciones desde un script.
+# Este modo lee comandos de un archivo o de la entrada estándar, los ejecuta todos con un único
+# GestionProducto (las conexiones se reutilizan desde el pool) y escribe un resultado JSON por línea.
+#
+# Comandos (JSONL: un objeto por línea; CSV: con encabezado y las mismas columnas):
+#   {"op": "add", "codigo": 12345678, "tipo": "electronico", "nombre": "Tv", "precio": 100, "cantidad": 5, "añosGarantia": 2}
+#   {"op": "lookup", "codigo": 12345678}
+#   {"op": "update-price", "codigo": 12345678, "precio": 150}
+#   {"op": "delete", "codigo": 12345678}
+#   {"op": "list", "tamaño": 100, "tipo": "alimenticio", "precio_min": 10, "precio_max": 500}
+#
+# Los resultados van a la salida estándar; los mensajes de GestionProducto y el resumen final
+# (comandos por segundo) van a la salida de errores, así la salida se puede procesar con otro programa.
+#
+# Uso: python main.py comandos.jsonl | python main.py --formato csv comandos.csv | ... | python main.py -
+
+import argparse
+import csv
+import json
+import sys
+import time
+from contextlib import redirect_stdout
+
+from Laboratorio_1 import GestionProducto, ProductoAlimenticio, producto_desde_dict, validar_vencimiento_futuro
+
+# Estados de cada resultado
+OK, EXISTE, NO_ENCONTRADO, ERROR = 'ok', 'existe', 'no_encontrado', 'error'
+
+
+def leer_comandos_jsonl(archivo):
+    '''Pares (número de línea, comando). Una línea inválida se devuelve como ValueError para informarla'''
+    for numero, linea in enumerate(archivo, start=1):
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            yield numero, json.loads(linea)
+        except json.JSONDecodeError as error:
+            yield numero, ValueError(f'JSON inválido: {error}')
+
+
+def leer_comandos_csv(archivo):
+    # La línea 1 es el encabezado
+    for numero, fila in enumerate(csv.DictReader(archivo), start=2):
+        yield numero, {clave.strip(): valor.strip() for clave, valor in fila.items() if clave and valor}
+
+
+def estado_de(resultado, si_falso):
+    '''Traducir el resultado de un método de GestionProducto (True / False / None si hubo un error)'''
+    if resultado is None:
+        return ERROR
+    return OK if resultado else si_falso
+
+
+def ejecutar_comando(gestion, comando):
+    '''Ejecutar un comando y devolver sus resultados (diccionarios); list devuelve uno por página'''
+    operacion = comando.get('op')
+
+    if operacion == 'add':
+        producto = producto_desde_dict({clave: valor for clave, valor in comando.items() if clave != 'op'})
+        if isinstance(producto, ProductoAlimenticio):
+            validar_vencimiento_futuro(producto.fechaVencimiento)     # igual que el alta desde el menú
+        yield {'codigo': producto.codigo, 'estado': estado_de(gestion.crear_producto(producto), EXISTE)}
+
+    elif operacion == 'lookup':
+        producto = gestion.buscar_producto(int(comando['codigo']))
+        if producto:
+            yield {'codigo': producto.codigo, 'estado': OK, 'producto': producto.to_dict()}
+        else:
+            yield {'codigo': int(comando['codigo']), 'estado': NO_ENCONTRADO}
+
+    elif operacion == 'update-price':
+        codigo = int(comando['codigo'])
+        yield {'codigo': codigo, 'estado': estado_de(gestion.actualizar_precio(codigo, float(comando['precio'])), NO_ENCONTRADO)}
+
+    elif operacion == 'delete':
+        codigo = int(comando['codigo'])
+        yield {'codigo': codigo, 'estado': estado_de(gestion.eliminar_producto(codigo), NO_ENCONTRADO)}
+
+    elif operacion == 'list':
+        precio_min, precio_max = comando.get('precio_min'), comando.get('precio_max')
+        paginas = gestion.iter_paginas(
+            int(comando.get('tamaño', 100)),
+            comando.get('tipo'),
+            None if precio_min is None else float(precio_min),
+            None if precio_max is None else float(precio_max)
+        )
+        for numero, pagina in enumerate(paginas, start=1):
+            yield {'estado': OK, 'pagina': numero, 'productos': [producto.to_dict() for producto in pagina]}
+
+    else:
+        raise ValueError(f'Operación desconocida: {operacion}')
+
+
+def ejecutar_lote(gestion, comandos, salida=None, mensajes=None):
+    '''
+    Ejecutar los comandos (pares número de línea, comando) y escribir un resultado JSON por línea en salida.
+    Los mensajes que imprime GestionProducto se desvían a mensajes (por defecto, la salida de errores).
+    Devuelve el resumen: cantidad de comandos, segundos, comandos por segundo y cantidad por estado.
+    '''
+    salida = salida or sys.stdout
+    estados = {}
+    cantidad = 0
+    inicio = time.perf_counter()
+    with redirect_stdout(mensajes or sys.stderr):
+        for numero, comando in comandos:
+            cantidad += 1
+            operacion = comando.get('op') if isinstance(comando, dict) else None
+            try:
+                if isinstance(comando, Exception):
+                    raise comando
+                for resultado in ejecutar_comando(gestion, comando):
+                    estados[resultado['estado']] = estados.get(resultado['estado'], 0) + 1
+                    salida.write(json.dumps({'linea': numero, 'op': operacion, **resultado}, ensure_ascii=False, default=str) + '\n')
+            except Exception as error:
+                estados[ERROR] = estados.get(ERROR, 0) + 1
+                salida.write(json.dumps({'linea': numero, 'op': operacion, 'estado': ERROR, 'error': str(error)}, ensure_ascii=False) + '\n')
+    salida.flush()
+    segundos = time.perf_counter() - inicio
+    return {
+        'comandos': cantidad,
+        'segundos': round(segundos, 3),
+        'por_segundo': round(cantidad / segundos, 1) if segundos else None,
+        'estados': estados
+    }
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description='Ejecutar comandos de productos por lotes (sin menú)')
+    parser.add_argument('archivo', help='archivo de comandos, o - para leerlos de la entrada estándar')
+    parser.add_argument('--formato', choices=('jsonl', 'csv'), help='por defecto según la extensión (jsonl para -)')
+    args = parser.parse_args(argumentos)
+
+    formato = args.formato or ('csv' if args.archivo.endswith('.csv') else 'jsonl')
+    archivo = sys.stdin if args.archivo == '-' else open(args.archivo, 'r', encoding='utf-8', newline='')
+    leer = leer_comandos_csv if formato == 'csv' else leer_comandos_jsonl
+    try:
+        with GestionProducto() as gestion:
+            resumen = ejecutar_lote(gestion, leer(archivo))
+    finally:
+        if archivo is not sys.stdin:
+            archivo.close()
+
+    estados = ', '.join(f'{estado}: {cantidad}' for estado, cantidad in sorted(resumen['estados'].items()))
+    print(f"{resumen['comandos']} comandos en {resumen['segundos']} s ({resumen['por_segundo']} comandos/s) - {estados}", file=sys.stderr)
+    return 1 if resumen['estados'].get(ERROR) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
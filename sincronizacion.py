@@ -0,0 +1,270 @@
+# Sincronización incremental entre productos_store.json y la base de datos
+# Para saber en qué difieren el almacén local y la base había que traer el catálogo completo y
+# comparar producto por producto. Acá se compara por rangos de códigos, como un árbol de Merkle:
+#   - cada producto tiene una huella (CRC32 de todos sus campos, ver backends.huella_producto)
+#   - cada rango de códigos se resume con (cantidad de productos, suma de sus huellas), calculado en SQL
+#     con un GROUP BY en la base y con sumas acumuladas sobre la lista ordenada de códigos en local
+#   - los rangos iguales se descartan; los distintos se parten en `ramas` subrangos y se vuelve a comparar
+#   - cuando un rango distinto tiene pocos productos (`hoja`) se traen sus huellas y se compara por código
+# Si casi nada cambió, la base solo recorre el catálogo una vez (el primer nivel) y después lee unas
+# pocas filas por rango distinto. La suma de CRC32 puede coincidir por casualidad con otros datos
+# (una vez en ~4 mil millones por rango): es un resumen para encontrar diferencias, no una firma.
+#
+# Las diferencias se aplican en lotes hacia la base (crear_productos y eliminar_productos) o hacia
+# el almacén (una consulta por lote de códigos y escrituras en el journal).
+# Sin --hacia solo se informan las diferencias. Las bajas se rechazan si el origen está vacío (por
+# ejemplo, un almacén que no existe borraría todo el catálogo) o si superan el porcentaje
+# --max-eliminaciones del destino, salvo que se pase --forzar.
+#
+# Uso: python sincronizacion.py [--hacia base|almacen [--forzar] [--max-eliminaciones 10]]
+#                               [--archivo productos_store.json] [--ramas 16] [--hoja 64] [--lote 1000]
+
+import argparse
+import bisect
+import json
+import sys
+import time
+
+from backends import huella_producto
+from Laboratorio_1 import GestionProducto
+
+CODIGO_MAXIMO = 10 ** 8     # los códigos tienen 8 dígitos
+
+
+def huella_de_datos(datos):
+    '''Huella de una entrada de productos_store.json (las entradas incompletas también tienen una)'''
+    try:
+        return huella_producto(datos['codigo'], datos['tipo'], datos['nombre'], datos['precio'], datos['cantidad'],
+                               datos.get('añosGarantia'), datos.get('fechaVencimiento'))
+    except (KeyError, TypeError, ValueError, AttributeError):
+        # Nunca coincide con la de la base: el producto se informa como distinto y se valida al aplicarlo
+        return huella_producto(0, 'invalido', json.dumps(datos, sort_keys=True, default=str), 0, 0)
+
+
+def fila_a_datos(fila):
+    '''Entrada de productos_store.json con los valores tal cual están en la base'''
+    datos = {'codigo': fila['codigo'], 'tipo': fila['tipo'], 'nombre': fila['nombre'],
+             'precio': float(fila['precio']), 'cantidad': fila['cantidad']}
+    if fila.get('añosGarantia') is not None:
+        datos['añosGarantia'] = fila['añosGarantia']
+    elif fila.get('fechaVencimiento') is not None:
+        fecha = fila['fechaVencimiento']
+        datos['fechaVencimiento'] = fecha if isinstance(fecha, str) else fecha.strftime('%Y-%m-%d')
+    return datos
+
+
+class ResumenLocal:
+    '''Huellas del almacén ordenadas por código, con sumas acumuladas para resumir cualquier rango en O(log n)'''
+
+    def __init__(self, datos):
+        huellas = sorted((int(codigo), huella_de_datos(producto)) for codigo, producto in datos.items())
+        self.codigos = [codigo for codigo, _ in huellas]
+        self.huellas = dict(huellas)
+        self.acumuladas = [0]
+        for _, huella in huellas:
+            self.acumuladas.append(self.acumuladas[-1] + huella)
+
+    def resumen(self, inicio, fin):
+        '''(cantidad, suma de huellas) de los códigos en [inicio, fin)'''
+        desde = bisect.bisect_left(self.codigos, inicio)
+        hasta = bisect.bisect_left(self.codigos, fin)
+        return hasta - desde, self.acumuladas[hasta] - self.acumuladas[desde]
+
+    def huellas_rango(self, inicio, fin):
+        desde = bisect.bisect_left(self.codigos, inicio)
+        hasta = bisect.bisect_left(self.codigos, fin)
+        return {codigo: self.huellas[codigo] for codigo in self.codigos[desde:hasta]}
+
+    @property
+    def maximo(self):
+        return self.codigos[-1] if self.codigos else 0
+
+
+class Sincronizador:
+    def __init__(self, gestion, ramas=16, hoja=64, tamaño_lote=None):
+        '''
+        gestion: GestionProducto (su backend y su almacén local)
+        ramas: subrangos en que se parte cada rango distinto
+        hoja: con esta cantidad de productos (o menos) un rango se compara código por código
+        '''
+        if ramas < 2:
+            raise ValueError('ramas debe ser al menos 2')
+        self.gestion = gestion
+        self.ramas = ramas
+        self.hoja = hoja
+        self.tamaño_lote = tamaño_lote or gestion.tamaño_lote
+        self.datos = None
+        self.estadisticas = {}
+
+    # Comparación
+
+    def diferencias(self, datos=None):
+        '''
+        Comparar el almacén (o el diccionario datos, con el formato de productos_store.json) con la base.
+        Devuelve un diccionario con las listas de códigos solo_local, solo_base y distintos
+        '''
+        inicio = time.perf_counter()
+        self.datos = self.gestion.leer_datos() if datos is None else datos
+        local = ResumenLocal(self.datos)
+        backend = self.gestion.backend
+        self.estadisticas = {'productos_locales': len(local.codigos), 'niveles': 0, 'consultas': 0,
+                             'rangos_comparados': 0, 'filas_leidas': 0}
+        diferencias = {'solo_local': [], 'solo_base': [], 'distintos': []}
+
+        # El primer nivel abarca todo el catálogo (también los códigos fuera de 8 dígitos que tenga la base)
+        ancho = 1
+        while ancho * self.ramas <= max(CODIGO_MAXIMO, local.maximo):
+            ancho *= self.ramas
+        rangos = None
+        while True:
+            self.estadisticas['niveles'] += 1
+            self.estadisticas['consultas'] += 1
+            en_base = backend.resumen_rangos(ancho, rangos)
+            if rangos is None:
+                candidatos = range(local.maximo // ancho + 1) if local.codigos else range(0)
+            else:
+                candidatos = (inicio // ancho + rama for inicio, _ in rangos for rama in range(self.ramas))
+            en_local = {}
+            for rango in candidatos:
+                cantidad, suma = local.resumen(rango * ancho, (rango + 1) * ancho)
+                if cantidad:
+                    en_local[rango] = (cantidad, suma)
+            self.estadisticas['rangos_comparados'] += len(en_base.keys() | en_local.keys())
+
+            hojas, siguientes = [], []
+            for rango in sorted(en_base.keys() | en_local.keys()):
+                base, propio = en_base.get(rango, (0, 0)), en_local.get(rango, (0, 0))
+                if base == propio:
+                    continue
+                intervalo = (rango * ancho, (rango + 1) * ancho)
+                if ancho == 1 or max(base[0], propio[0]) <= self.hoja:
+                    hojas.append(intervalo)
+                else:
+                    siguientes.append(intervalo)
+
+            if hojas:
+                self.__comparar_hojas(backend, local, hojas, diferencias)
+            if not siguientes:
+                break
+            rangos = siguientes
+            ancho //= self.ramas
+
+        self.estadisticas['segundos'] = round(time.perf_counter() - inicio, 3)
+        return diferencias
+
+    def __comparar_hojas(self, backend, local, hojas, diferencias):
+        self.estadisticas['consultas'] += 1
+        en_base = dict(backend.huellas_rangos(hojas))
+        self.estadisticas['filas_leidas'] += len(en_base)
+        en_local = {}
+        for inicio, fin in hojas:
+            en_local.update(local.huellas_rango(inicio, fin))
+        for codigo in sorted(en_base.keys() | en_local.keys()):
+            if codigo not in en_base:
+                diferencias['solo_local'].append(codigo)
+            elif codigo not in en_local:
+                diferencias['solo_base'].append(codigo)
+            elif en_base[codigo] != en_local[codigo]:
+                diferencias['distintos'].append(codigo)
+
+    # Aplicación
+
+    def sincronizar(self, hacia='base', simular=False, datos=None, forzar=False, max_eliminaciones=10.0):
+        '''
+        Dejar la base igual al almacén (hacia='base') o el almacén igual a la base (hacia='almacen'),
+        aplicando solo las diferencias en lotes. Con simular solo se comparan.
+        Sin forzar, lanza RuntimeError (antes de escribir nada) si el origen está vacío y habría bajas,
+        o si las bajas superan max_eliminaciones (%) de los productos del destino.
+        Devuelve un resumen con las diferencias encontradas y lo que se aplicó
+        '''
+        if hacia not in ('base', 'almacen'):
+            raise ValueError(f'Destino desconocido: {hacia}. Opciones: base, almacen')
+        diferencias = self.diferencias(datos)
+        resumen = {'hacia': hacia, 'diferencias': {clave: len(codigos) for clave, codigos in diferencias.items()},
+                   'comparacion': dict(self.estadisticas)}
+        if simular:
+            return resumen
+        if not forzar:
+            self.__controlar_eliminaciones(hacia, diferencias, max_eliminaciones)
+        inicio = time.perf_counter()
+        if hacia == 'base':
+            resumen['aplicado'] = self.__aplicar_en_base(diferencias)
+        else:
+            resumen['aplicado'] = self.__aplicar_en_almacen(diferencias)
+        resumen['aplicado']['segundos'] = round(time.perf_counter() - inicio, 3)
+        return resumen
+
+    def __controlar_eliminaciones(self, hacia, diferencias, max_eliminaciones):
+        locales = self.estadisticas['productos_locales']
+        en_base = locales - len(diferencias['solo_local']) + len(diferencias['solo_base'])
+        if hacia == 'base':
+            bajas, origen, destino = len(diferencias['solo_base']), locales, en_base
+        else:
+            bajas, origen, destino = len(diferencias['solo_local']), en_base, locales
+        if not bajas:
+            return
+        if not origen:
+            raise RuntimeError(f'El origen está vacío: se eliminarían los {bajas} productos del destino (usar forzar para aplicarlo)')
+        if bajas > destino * max_eliminaciones / 100:
+            raise RuntimeError(f'Se eliminarían {bajas} de {destino} productos, más del {max_eliminaciones}% '
+                               f'(usar forzar para aplicarlo)')
+
+    def __aplicar_en_base(self, diferencias):
+        por_codigo = {int(codigo): producto for codigo, producto in self.datos.items()}
+        aplicado = {'insertados': 0, 'actualizados': 0, 'eliminados': 0, 'rechazados': []}
+        cambios = (por_codigo[codigo] for codigo in diferencias['solo_local'] + diferencias['distintos'])
+        for reporte in self.gestion.crear_productos(cambios, self.tamaño_lote):
+            aplicado['insertados'] += reporte['insertados']
+            aplicado['actualizados'] += reporte['actualizados']
+            aplicado['rechazados'].extend(reporte['rechazados'])
+        if diferencias['solo_base']:
+            aplicado['eliminados'] = self.gestion.eliminar_productos(diferencias['solo_base'], self.tamaño_lote)['eliminados']
+        return aplicado
+
+    def __aplicar_en_almacen(self, diferencias):
+        almacen = self.gestion.obtener_almacen()
+        aplicado = {'guardados': 0, 'eliminados': 0}
+        codigos = diferencias['solo_base'] + diferencias['distintos']
+        for inicio in range(0, len(codigos), self.tamaño_lote):
+            for fila in self.gestion.backend.buscar_lote(codigos[inicio:inicio + self.tamaño_lote]):
+                almacen.guardar(fila_a_datos(fila))
+                aplicado['guardados'] += 1
+        for codigo in diferencias['solo_local']:
+            aplicado['eliminados'] += almacen.eliminar(codigo)
+        almacen.sincronizar()
+        return aplicado
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sincronizar productos_store.json con la base de datos por rangos de códigos')
+    parser.add_argument('--hacia', choices=('base', 'almacen'),
+                        help='base: la base queda igual al almacén; almacen: el almacén queda igual a la base '
+                             '(sin --hacia solo se informan las diferencias)')
+    parser.add_argument('--forzar', action='store_true', help='aplicar las bajas aunque el origen esté vacío o sean muchas')
+    parser.add_argument('--max-eliminaciones', type=float, default=10.0,
+                        help='%% máximo de productos del destino que se pueden eliminar sin --forzar')
+    parser.add_argument('--archivo', help='archivo del almacén (por defecto, Store_file)')
+    parser.add_argument('--ramas', type=int, default=16, help='subrangos por rango distinto')
+    parser.add_argument('--hoja', type=int, default=64, help='productos por rango para comparar código por código')
+    parser.add_argument('--lote', type=int, help='productos por lote al aplicar (por defecto, Db_batch_size)')
+    args = parser.parse_args()
+
+    with GestionProducto() as gestion:
+        if args.archivo:
+            gestion.archivo = args.archivo
+        sincronizador = Sincronizador(gestion, args.ramas, args.hoja, args.lote)
+        try:
+            resumen = sincronizador.sincronizar(args.hacia or 'base', simular=args.hacia is None,
+                                                forzar=args.forzar, max_eliminaciones=args.max_eliminaciones)
+        except RuntimeError as error:
+            print(f'No se aplicaron cambios: {error}', file=sys.stderr)
+            return 1
+    if args.hacia is None:
+        resumen['hacia'] = None
+    json.dump(resumen, sys.stdout, indent=2, ensure_ascii=False, default=str)
+    print()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+# Prueba de concurrencia de las reservas de stock
+# Varios procesos reservan (de a un producto y pedidos de varias líneas) sobre pocos productos
+# con poco stock, compitiendo por las mismas filas. Al final se verifica que:
+#   - ningún producto quedó con stock negativo
+#   - stock inicial - stock final == unidades que los procesos informan como reservadas
+# Por defecto usa una base SQLite temporal; con --backend mysql usa la configuración Db_*.
+#
+# Uso: python stress_reservas.py [--procesos 8] [--operaciones 2000] [--productos 20] [--stock 500]
+
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from Laboratorio_1 import GestionProducto, ProductoElectronico
+from backends import BackendSQLite, crear_backend
+
+
+def abrir_gestion(backend, ruta_sqlite):
+    return GestionProducto(BackendSQLite(ruta_sqlite) if backend == 'sqlite' else crear_backend(backend))
+
+
+def trabajador(backend, ruta_sqlite, codigos, operaciones, semilla, resultados):
+    azar = random.Random(semilla)
+    reservado = {codigo: 0 for codigo in codigos}
+    exitos = fallos = 0
+    with abrir_gestion(backend, ruta_sqlite) as gestion:
+        for _ in range(operaciones):
+            if azar.random() < 0.5:
+                codigo, cantidad = azar.choice(codigos), azar.randint(1, 5)
+                if gestion.reservar_stock(codigo, cantidad):
+                    reservado[codigo] += cantidad
+                    exitos += 1
+                else:
+                    fallos += 1
+            else:
+                lineas = {codigo: azar.randint(1, 5) for codigo in azar.sample(codigos, azar.randint(2, 4))}
+                if gestion.reservar_pedido(lineas) is None:
+                    for codigo, cantidad in lineas.items():
+                        reservado[codigo] += cantidad
+                    exitos += 1
+                else:
+                    fallos += 1
+    resultados.put((reservado, exitos, fallos))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de concurrencia de reservar_stock / reservar_pedido')
+    parser.add_argument('--backend', default='sqlite', help='sqlite (base temporal) o mysql')
+    parser.add_argument('--procesos', type=int, default=8)
+    parser.add_argument('--operaciones', type=int, default=2000, help='operaciones por proceso')
+    parser.add_argument('--productos', type=int, default=20)
+    parser.add_argument('--stock', type=int, default=500, help='stock inicial de cada producto')
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp()
+    ruta_sqlite = os.path.join(directorio, 'stress.db')
+    codigos = [90000000 + i for i in range(args.productos)]
+
+    with abrir_gestion(args.backend, ruta_sqlite) as gestion:
+        gestion.crear_productos(ProductoElectronico(codigo, 'electronico', f'stress{codigo}', 1.0, args.stock, 1)
+                                for codigo in codigos)
+        # Si los productos ya existían (MySQL) se fija el stock inicial de cada uno
+        iniciales = {codigo: gestion.backend.buscar(codigo)['cantidad'] for codigo in codigos}
+
+    resultados = multiprocessing.Queue()
+    procesos = [multiprocessing.Process(target=trabajador,
+                                        args=(args.backend, ruta_sqlite, codigos, args.operaciones, semilla, resultados))
+                for semilla in range(args.procesos)]
+    inicio = time.perf_counter()
+    for proceso in procesos:
+        proceso.start()
+    totales = {codigo: 0 for codigo in codigos}
+    exitos = fallos = 0
+    for _ in procesos:
+        reservado, exitos_proceso, fallos_proceso = resultados.get()
+        for codigo, cantidad in reservado.items():
+            totales[codigo] += cantidad
+        exitos += exitos_proceso
+        fallos += fallos_proceso
+    for proceso in procesos:
+        proceso.join()
+    duracion = time.perf_counter() - inicio
+
+    with abrir_gestion(args.backend, ruta_sqlite) as gestion:
+        finales = {codigo: gestion.backend.buscar(codigo)['cantidad'] for codigo in codigos}
+
+    errores = []
+    for codigo in codigos:
+        if finales[codigo] < 0:
+            errores.append(f'{codigo}: stock negativo ({finales[codigo]})')
+        if iniciales[codigo] - finales[codigo] != totales[codigo]:
+            errores.append(f'{codigo}: se descontaron {iniciales[codigo] - finales[codigo]} pero se reservaron {totales[codigo]}')
+
+    operaciones = args.procesos * args.operaciones
+    print(f'{operaciones} operaciones en {duracion:.2f} s ({operaciones / duracion:,.0f} op/s) '
+          f'- reservas exitosas: {exitos}, sin stock: {fallos}')
+    print(f'Stock final total: {sum(finales.values())} de {sum(iniciales.values())}')
+    if errores:
+        print('SOBREVENTA DETECTADA:')
+        for error in errores:
+            print(f'  {error}')
+        raise SystemExit(1)
+    print('OK: sin sobreventa')
+
+
+if __name__ == '__main__':
+    main()
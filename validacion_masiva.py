@@ -0,0 +1,294 @@
+# Validación masiva de archivos de productos
+# Las validaciones de las clases (validar_codigo, validar_precio, ...) construyen un objeto por fila y
+# se detienen en el primer error: un archivo de un proveedor con un millón de filas se valida en un
+# solo núcleo y sin un reporte completo. Acá las filas se validan por bloques:
+#   - cada bloque se convierte en columnas y se revisa con operaciones vectorizadas de NumPy
+#     (código de 8 dígitos, precio y cantidad no negativos, añosGarantia >= 1, fechaVencimiento futura)
+#   - los bloques se reparten entre varios procesos (ProcessPoolExecutor)
+#   - los códigos repetidos se detectan en todo el archivo: vale la primera aparición y las siguientes se rechazan
+# Cada fila puede tener varios errores y se informan todos. Las filas válidas salen como objetos Producto
+# construidos con desde_fila (ya validados), listos para GestionProducto.crear_productos.
+#
+# Uso: python validacion_masiva.py proveedor.csv [--errores errores.jsonl] [--salida limpio.jsonl] [--importar]
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import numpy as np
+
+from Laboratorio_1 import ProductoElectronico, ProductoAlimenticio, VENCIMIENTO_PASADO
+from importacion import leer_productos
+
+OBLIGATORIOS = ('codigo', 'tipo', 'nombre', 'precio', 'cantidad')
+MAXIMO_CODIGO = 10 ** 8     # los códigos tienen 8 dígitos
+
+
+# Conversión de columnas
+
+def columna(filas, campo):
+    return [fila.get(campo) for fila in filas]
+
+
+def presentes(valores):
+    return np.fromiter((valor is not None and valor != '' for valor in valores), dtype=bool, count=len(valores))
+
+
+def a_numeros(valores):
+    '''Arreglo float64 y máscara de los valores que son números finitos (acepta números y textos numéricos)'''
+    try:
+        numeros = np.array(valores, dtype=np.float64)     # None queda como NaN
+    except (TypeError, ValueError):
+        # Algún valor no es numérico: se convierte de a uno solo en este bloque
+        numeros = np.full(len(valores), np.nan)
+        for i, valor in enumerate(valores):
+            try:
+                numeros[i] = float(valor)
+            except (TypeError, ValueError):
+                pass
+    return numeros, np.isfinite(numeros)
+
+
+def a_fechas(valores):
+    '''Arreglo datetime64[D] (NaT si no es una fecha AAAA-MM-DD) a partir de textos o date'''
+    textos = np.array(['' if valor is None else str(valor) for valor in valores])
+    formato = np.char.str_len(textos) == 10 if len(textos) else np.zeros(0, dtype=bool)
+    textos = np.where(formato, textos, 'NaT')
+    try:
+        return np.array(textos, dtype='datetime64[D]')
+    except ValueError:
+        fechas = np.full(len(textos), np.datetime64('NaT'), dtype='datetime64[D]')
+        for i, texto in enumerate(textos):
+            try:
+                fechas[i] = np.datetime64(texto, 'D')
+            except ValueError:
+                pass
+        return fechas
+
+
+# Validación de un bloque (corre en los procesos del pool: recibe y devuelve datos simples)
+
+def validar_bloque(trabajo):
+    '''
+    trabajo: (número de la primera fila, filas, hoy como AAAA-MM-DD)
+    Devuelve las columnas normalizadas, la máscara de filas válidas y los errores como (fila, campo, error).
+    '''
+    inicio, filas, hoy = trabajo
+    cantidad_filas = len(filas)
+    numeros_fila = np.arange(inicio, inicio + cantidad_filas)
+    errores = []
+    validas = np.ones(cantidad_filas, dtype=bool)
+
+    def rechazar(mascara, campo, mensaje):
+        for fila in numeros_fila[mascara]:
+            errores.append((int(fila), campo, mensaje))
+        validas[mascara] = False
+
+    # Cada columna se extrae una sola vez
+    valores = {campo: columna(filas, campo) for campo in OBLIGATORIOS + ('añosGarantia', 'fechaVencimiento')}
+    hay = {campo: presentes(lista) for campo, lista in valores.items()}
+
+    for campo in OBLIGATORIOS:
+        rechazar(~hay[campo], campo, f'Falta el campo {campo}')
+
+    # codigo: exactamente 8 dígitos
+    textos = np.array(['' if valor is None else str(valor).strip() for valor in valores['codigo']])
+    codigo_valido = (np.char.str_len(textos) == 8) & np.char.isdigit(textos) if cantidad_filas else np.zeros(0, dtype=bool)
+    rechazar(~codigo_valido & hay['codigo'], 'codigo', 'El codigo debe ser numérico y estar compuesto por 8 dígitos')
+    codigos = np.where(codigo_valido, textos, '-1').astype(np.int64)
+
+    # precio y cantidad: no negativos (la cantidad además entera)
+    precios, precio_numerico = a_numeros(valores['precio'])
+    rechazar(~precio_numerico & hay['precio'], 'precio', 'El precio debe ser una cifra válida')
+    rechazar(precio_numerico & (precios < 0), 'precio', 'El precio debe ser un numero positivo')
+
+    cantidades, cantidad_numerica = a_numeros(valores['cantidad'])
+    cantidad_numerica &= cantidades == np.floor(np.where(cantidad_numerica, cantidades, 0))
+    rechazar(~cantidad_numerica & hay['cantidad'], 'cantidad', 'La cantidad debe ser una cifra válida')
+    rechazar(cantidad_numerica & (cantidades < 0), 'cantidad', 'La cantidad debe ser un número positivo')
+
+    # Subtipo: igual que producto_desde_dict, por la presencia de añosGarantia o fechaVencimiento
+    con_garantia = hay['añosGarantia']
+    con_fecha = hay['fechaVencimiento'] & ~con_garantia
+    rechazar(~con_garantia & ~con_fecha, 'tipo', 'El producto debe tener añosGarantia (electronico) o fechaVencimiento (alimenticio)')
+
+    garantias, garantia_numerica = a_numeros(valores['añosGarantia'])
+    garantia_numerica &= garantias == np.floor(np.where(garantia_numerica, garantias, 0))
+    rechazar(con_garantia & ~garantia_numerica, 'añosGarantia', 'Años de Garantía debe ser una cifra válida')
+    rechazar(con_garantia & garantia_numerica & (garantias < 1), 'añosGarantia', 'La garantía mínima es de un año')
+
+    fechas = a_fechas(valores['fechaVencimiento'])
+    fecha_valida = ~np.isnat(fechas)
+    rechazar(con_fecha & ~fecha_valida, 'fechaVencimiento', 'La fecha de vencimiento debe tener el formato AAAA-MM-DD')
+    # Misma regla que validar_vencimiento_futuro (Laboratorio_1), vectorizada
+    rechazar(con_fecha & fecha_valida & (fechas <= np.datetime64(hoy, 'D')), 'fechaVencimiento', VENCIMIENTO_PASADO)
+
+    return {
+        'codigo': codigos,
+        'precio': np.where(precio_numerico, precios, 0.0),
+        'cantidad': np.where(cantidad_numerica, cantidades, 0).astype(np.int64),
+        'añosGarantia': np.where(con_garantia & garantia_numerica, garantias, 0).astype(np.int64),
+        'fechaVencimiento': np.datetime_as_string(fechas, unit='D'),
+        'electronico': con_garantia,
+        'validas': validas,
+        'errores': sorted(errores)
+    }
+
+
+# Coordinación
+
+class ValidadorMasivo:
+    def __init__(self, procesos=None, tamaño_bloque=50000, hoy=None):
+        '''
+        procesos: procesos del pool (por defecto, la cantidad de núcleos; 1 valida en este mismo proceso)
+        tamaño_bloque: filas por bloque que se envía a un proceso
+        hoy: fecha contra la que se controla el vencimiento (por defecto, la fecha actual)
+        '''
+        self.procesos = procesos or os.cpu_count() or 1
+        self.tamaño_bloque = tamaño_bloque
+        self.hoy = (hoy or date.today()).isoformat()
+        self.errores = []       # {'fila', 'codigo', 'campo', 'error'}
+        self.filas = 0
+        self.validas = 0
+        self.__ilegibles = {}   # fila -> error de las filas que el lector no pudo interpretar
+        self.__vistos = np.zeros(MAXIMO_CODIGO // 8, dtype=np.uint8)     # un bit por código posible
+
+    def validar(self, filas, al_error=None):
+        '''
+        Validar un iterable de filas (diccionarios con las claves de to_dict) y devolver, a medida que se
+        validan, los productos correctos en el orden del archivo. Los errores se guardan en self.errores
+        o, si se indica, se pasan a al_error (para no acumularlos en memoria).
+        '''
+        registrar = al_error or self.errores.append
+        for bloque, resultado in self.__resultados(filas):
+            self.__marcar_repetidos(resultado)
+            codigos_originales = None
+            ilegibles = set()
+            for fila, campo, mensaje in resultado['errores']:
+                # Una fila ilegible se valida como vacía: se informa solo su error de lectura, una vez
+                if fila in ilegibles:
+                    continue
+                if fila in self.__ilegibles:
+                    ilegibles.add(fila)
+                    campo, mensaje = None, self.__ilegibles.pop(fila)
+                if codigos_originales is None:
+                    codigos_originales = [f.get('codigo') for f in bloque]
+                registrar({'fila': fila, 'codigo': codigos_originales[fila - resultado['inicio']], 'campo': campo, 'error': mensaje})
+            self.filas += len(bloque)
+            for i in np.flatnonzero(resultado['validas']):
+                self.validas += 1
+                yield self.__construir(bloque[i], resultado, i)
+
+    def __resultados(self, filas):
+        '''Pares (bloque, resultado) en el orden del archivo, con a lo sumo unos pocos bloques en vuelo por proceso'''
+        bloques = self.__bloques(filas)
+        if self.procesos == 1:
+            for inicio, bloque in bloques:
+                yield bloque, dict(validar_bloque((inicio, bloque, self.hoy)), inicio=inicio)
+            return
+        with ProcessPoolExecutor(self.procesos) as pool:
+            en_vuelo = deque()
+            for inicio, bloque in bloques:
+                en_vuelo.append((inicio, bloque, pool.submit(validar_bloque, (inicio, bloque, self.hoy))))
+                if len(en_vuelo) >= self.procesos * 2:
+                    inicio, bloque, futuro = en_vuelo.popleft()
+                    yield bloque, dict(futuro.result(), inicio=inicio)
+            while en_vuelo:
+                inicio, bloque, futuro = en_vuelo.popleft()
+                yield bloque, dict(futuro.result(), inicio=inicio)
+
+    def __bloques(self, filas):
+        bloque, inicio = [], 1
+        for fila in filas:
+            if isinstance(fila, Exception):
+                self.__ilegibles[inicio + len(bloque)] = str(fila)
+                fila = {}
+            bloque.append(fila)
+            if len(bloque) >= self.tamaño_bloque:
+                yield inicio, bloque
+                inicio += len(bloque)
+                bloque = []
+        if bloque:
+            yield inicio, bloque
+
+    def __marcar_repetidos(self, resultado):
+        '''Rechazar los códigos que ya aparecieron antes (en filas válidas), en este bloque o en los anteriores'''
+        posiciones = np.flatnonzero(resultado['validas'])
+        if not len(posiciones):
+            return
+        codigos = resultado['codigo'][posiciones]
+        byte, bit = codigos >> 3, (1 << (codigos & 7)).astype(np.uint8)
+        repetido = (self.__vistos[byte] & bit) != 0
+        # Repetidos dentro del mismo bloque: todas las apariciones salvo la primera
+        _, primeras = np.unique(codigos, return_index=True)
+        dentro = np.ones(len(codigos), dtype=bool)
+        dentro[primeras] = False
+        repetido |= dentro
+        np.bitwise_or.at(self.__vistos, byte, bit)
+
+        filas = posiciones[repetido]
+        resultado['validas'][filas] = False
+        resultado['errores'] = sorted(resultado['errores'] + [
+            (int(resultado['inicio'] + fila), 'codigo', 'Código repetido: ya apareció en una fila anterior') for fila in filas
+        ])
+
+    @staticmethod
+    def __construir(fila, resultado, i):
+        # Los valores ya están validados: se usa el constructor sin validaciones
+        datos = (int(resultado['codigo'][i]), fila['tipo'], fila['nombre'], float(resultado['precio'][i]), int(resultado['cantidad'][i]))
+        if resultado['electronico'][i]:
+            return ProductoElectronico.desde_fila(*datos, int(resultado['añosGarantia'][i]))
+        return ProductoAlimenticio.desde_fila(*datos, str(resultado['fechaVencimiento'][i]))
+
+    def resumen(self):
+        return {'filas': self.filas, 'validas': self.validas, 'rechazadas': self.filas - self.validas}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Validar un archivo de productos (CSV, JSONL o productos_store.json)')
+    parser.add_argument('archivo')
+    parser.add_argument('--procesos', type=int, help='procesos de validación (por defecto, uno por núcleo)')
+    parser.add_argument('--bloque', type=int, default=50000, help='filas por bloque')
+    parser.add_argument('--errores', help='guardar los errores en un archivo JSONL (por defecto se muestran)')
+    parser.add_argument('--salida', help='guardar las filas válidas en un archivo JSONL')
+    parser.add_argument('--importar', action='store_true', help='importar las filas válidas con GestionProducto.crear_productos')
+    args = parser.parse_args()
+
+    validador = ValidadorMasivo(args.procesos, args.bloque)
+    archivo_errores = open(args.errores, 'w', encoding='utf-8') if args.errores else None
+    al_error = (lambda error: archivo_errores.write(json.dumps(error, ensure_ascii=False, default=str) + '\n')) if archivo_errores else None
+    inicio = time.perf_counter()
+    try:
+        productos = validador.validar(leer_productos(args.archivo), al_error)
+        if args.importar:
+            from Laboratorio_1 import GestionProducto
+            with GestionProducto() as gestion:
+                reporte = gestion.crear_productos(productos)
+            print(f"Importados: {sum(lote['insertados'] for lote in reporte)} nuevos, {sum(lote['actualizados'] for lote in reporte)} actualizados")
+        elif args.salida:
+            with open(args.salida, 'w', encoding='utf-8') as salida:
+                for producto in productos:
+                    salida.write(json.dumps(producto.to_dict(), ensure_ascii=False) + '\n')
+        else:
+            for _ in productos:
+                pass
+    finally:
+        if archivo_errores:
+            archivo_errores.close()
+
+    segundos = time.perf_counter() - inicio
+    resumen = validador.resumen()
+    if not archivo_errores:
+        for error in validador.errores:
+            print(f"Fila {error['fila']} (codigo {error['codigo']}): {error['campo']} - {error['error']}")
+    print(f"{resumen['filas']} filas en {segundos:.2f} s: {resumen['validas']} válidas, {resumen['rechazadas']} rechazadas")
+    return 1 if resumen['rechazadas'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
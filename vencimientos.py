@@ -0,0 +1,156 @@
+# Índice de vencimientos de los productos alimenticios
+# Para saber qué vence esta semana había que cargar todo el catálogo. El índice guarda los pares
+# (fechaVencimiento, codigo) en una lista ordenada: con búsqueda binaria (bisect) una consulta por
+# rango de fechas cuesta O(log n + k), donde k es la cantidad de productos que devuelve.
+# GestionProducto lo mantiene al día en las altas, bajas y cargas masivas (activar_indice_vencimientos).
+#
+# EscanerVencimientos revisa periódicamente solo las fechas que entraron en la ventana desde la
+# revisión anterior, sin recorrer el catálogo completo, y avisa los lotes por vencer y vencidos.
+
+import bisect
+import threading
+from datetime import date, datetime, timedelta
+
+
+def convertir_fecha(fecha):
+    '''Aceptar date, datetime o texto AAAA-MM-DD'''
+    if isinstance(fecha, datetime):
+        return fecha.date()
+    if isinstance(fecha, date):
+        return fecha
+    return datetime.strptime(str(fecha), '%Y-%m-%d').date()
+
+
+class IndiceVencimientos:
+    def __init__(self, pares=()):
+        '''pares: iterable de (codigo, fechaVencimiento)'''
+        self.__por_codigo = {int(codigo): convertir_fecha(fecha) for codigo, fecha in pares}
+        self.__ordenados = sorted((fecha, codigo) for codigo, fecha in self.__por_codigo.items())
+        self.__lock = threading.Lock()
+        self.observadores = []      # funciones (codigo, fecha) que se llaman en cada alta o cambio
+
+    @classmethod
+    def desde_filas(cls, filas):
+        '''Armar el índice desde filas con codigo y fechaVencimiento (las que no tienen fecha se ignoran)'''
+        return cls((fila['codigo'], fila['fechaVencimiento']) for fila in filas if fila.get('fechaVencimiento'))
+
+    def __len__(self):
+        return len(self.__ordenados)
+
+    def agregar(self, codigo, fecha):
+        '''Agregar un producto o cambiar su fecha'''
+        codigo, fecha = int(codigo), convertir_fecha(fecha)
+        with self.__lock:
+            self.__quitar(codigo)
+            bisect.insort(self.__ordenados, (fecha, codigo))
+            self.__por_codigo[codigo] = fecha
+        for observador in self.observadores:
+            observador(codigo, fecha)
+
+    def quitar(self, codigo):
+        with self.__lock:
+            self.__quitar(int(codigo))
+
+    def __quitar(self, codigo):
+        fecha = self.__por_codigo.pop(codigo, None)
+        if fecha is not None:
+            posicion = bisect.bisect_left(self.__ordenados, (fecha, codigo))
+            del self.__ordenados[posicion]
+
+    def fecha(self, codigo):
+        return self.__por_codigo.get(int(codigo))
+
+    def vencen_entre(self, desde, hasta):
+        '''Lista de (fecha, codigo) con fecha entre desde y hasta (inclusive), ordenada por fecha'''
+        desde, hasta = convertir_fecha(desde), convertir_fecha(hasta)
+        with self.__lock:
+            inicio = bisect.bisect_left(self.__ordenados, (desde, -1))
+            fin = bisect.bisect_right(self.__ordenados, (hasta, float('inf')))
+            return self.__ordenados[inicio:fin]
+
+    def por_vencer(self, dias, hoy=None):
+        '''Productos que vencen entre hoy y dentro de N días'''
+        hoy = convertir_fecha(hoy or date.today())
+        return self.vencen_entre(hoy, hoy + timedelta(days=dias))
+
+    def vencidos(self, hoy=None):
+        '''Productos con fecha de vencimiento anterior a hoy'''
+        hoy = convertir_fecha(hoy or date.today())
+        with self.__lock:
+            return self.__ordenados[:bisect.bisect_left(self.__ordenados, (hoy, -1))]
+
+
+class EscanerVencimientos:
+    def __init__(self, consulta, dias=7, intervalo=3600.0, al_encontrar=None, indice=None):
+        '''
+        consulta: función (desde, hasta) -> lista de (fecha, codigo), por ejemplo IndiceVencimientos.vencen_entre
+                  o GestionProducto.vencimientos_entre (consulta indexada en la base de datos)
+        dias: ventana de "por vencer"
+        intervalo: segundos entre revisiones cuando corre en segundo plano
+        al_encontrar: función (por_vencer, vencidos) que recibe cada lote nuevo
+        indice: si se indica, también se avisan los productos agregados después con fecha ya revisada
+        '''
+        self.consulta = consulta
+        self.dias = dias
+        self.intervalo = intervalo
+        self.al_encontrar = al_encontrar
+        self.__horizonte = None     # última fecha de la ventana "por vencer" ya revisada
+        self.__ultimo_dia = None    # día de la revisión anterior
+        self.__tardios = []         # altas posteriores con fecha dentro de lo ya revisado
+        self.__lock = threading.Lock()
+        self.__detener = threading.Event()
+        self.__hilo = None
+        if indice is not None:
+            indice.observadores.append(self.__registrar_alta)
+
+    def __registrar_alta(self, codigo, fecha):
+        with self.__lock:
+            if self.__horizonte is not None and fecha <= self.__horizonte:
+                self.__tardios.append((fecha, codigo))
+
+    def escanear(self, hoy=None):
+        '''
+        Revisar solo las fechas nuevas desde la revisión anterior.
+        Devuelve (por_vencer, vencidos): listas de (fecha, codigo) que no se habían informado.
+        '''
+        hoy = convertir_fecha(hoy or date.today())
+        horizonte = hoy + timedelta(days=self.dias)
+        with self.__lock:
+            anterior_horizonte, anterior_dia = self.__horizonte, self.__ultimo_dia
+            tardios, self.__tardios = self.__tardios, []
+            self.__horizonte, self.__ultimo_dia = horizonte, hoy
+
+        if anterior_horizonte is None:
+            por_vencer = list(self.consulta(hoy, horizonte))
+            vencidos = list(self.consulta(date.min, hoy - timedelta(days=1)))
+        else:
+            # Solo los días que entraron en la ventana y los que pasaron a estar vencidos
+            por_vencer = list(self.consulta(anterior_horizonte + timedelta(days=1), horizonte)) if horizonte > anterior_horizonte else []
+            vencidos = list(self.consulta(anterior_dia, hoy - timedelta(days=1))) if hoy > anterior_dia else []
+            for fecha, codigo in tardios:
+                (vencidos if fecha < hoy else por_vencer).append((fecha, codigo))
+
+        if self.al_encontrar and (por_vencer or vencidos):
+            self.al_encontrar(por_vencer, vencidos)
+        return por_vencer, vencidos
+
+    # Ejecución periódica
+
+    def iniciar(self):
+        self.__detener.clear()
+        self.__hilo = threading.Thread(target=self.__trabajar, name='escaner-vencimientos', daemon=True)
+        self.__hilo.start()
+
+    def __trabajar(self):
+        while not self.__detener.is_set():
+            try:
+                self.escanear()
+            except Exception as error:
+                print(f'Error al revisar vencimientos: {error}')
+            self.__detener.wait(self.intervalo)
+
+    def detener(self):
+        self.__detener.set()
+        if self.__hilo is not None:
+            self.__hilo.join()
+            self.__hilo = None